@@ -0,0 +1,136 @@
+# Benchmark of the puzzle generation hot path, with fixed seeds (same seed, same words and puzzles)
+# Uses a synthetic dictionary (see `src/synthetic.py`) if the dictionary JSON is not available or with --scale
+# Example: python benchmark.py --rounds 200 --seed 0 --compare benchmarks/bench-20240404-120000.json
+import argparse, datetime, json, os, platform, random, sys, time, tracemalloc
+import pandas as pd
+import src.utils as utils
+from src.engine import DictEngine
+from src.synthetic import scale_dict
+from src import telemetry
+from src.telemetry import percentiles
+
+ROUND_STAGES = ['get_random_word', 'hint_buckets', 'pick_solutions', 'modify_def'] # Stages recorded by `telemetry.stage` in `DictEngine.new_puzzle`
+HINT_SUBSTAGES = ['words_with_word', 'add_commonness', 'bucket_solutions'] # Parts of `hint_buckets` (only when the buckets are not cached yet)
+
+def timed(fn, repeat=1):
+    """Result of the last call and timings of `repeat` calls."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = fn()
+        seconds.append(time.perf_counter() - start)
+    return res, seconds
+
+def peak_memory(fn):
+    """Peak memory (KiB) allocated while running `fn` (run apart from the timings, tracemalloc slows everything down)."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def run_rounds(engine, difficulty, rounds, seed):
+    """Generates `rounds` puzzles with `engine.new_puzzle` (a fixed seed each). Returns the telemetry record of each round (see `telemetry.Record.to_dict`); telemetry set up through the environment is off meanwhile."""
+    records = []
+    telemetry.configure(records=records)
+    try:
+        for i in range(rounds):
+            engine.new_puzzle(difficulty, rng=random.Random(f'{seed}:{difficulty}:{i}'))
+    finally:
+        telemetry.configure()
+    return records
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mide los tiempos y la memoria de la generación de puzles.')
+    parser.add_argument('-r', '--rounds', type=int, default=100, help='Rondas por dificultad.')
+    parser.add_argument('-d', '--difficulties', nargs='+', default=list(utils.HINT_TYPES), choices=list(utils.HINT_TYPES))
+    parser.add_argument('--seed', default=0, help='Semilla (también la del diccionario sintético).')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones de las etapas de carga y filtrado.')
+    parser.add_argument('--json', default='data/diccionario.json')
+    parser.add_argument('--csv', default='data/diccionario_df.csv')
+    parser.add_argument('--kind', default='sust')
+    parser.add_argument('--scale', type=float, default=1, help='Escala del diccionario sintético (p. ej. 10 o 100) para comprobar que los tiempos crecen linealmente.')
+    parser.add_argument('--no-memory', action='store_true', help='No medir la memoria (más rápido).')
+    parser.add_argument('-o', '--out', default='benchmarks', help='Carpeta donde guardar los resultados (JSON).')
+    parser.add_argument('--compare', help='Resultados anteriores (JSON) con los que comparar.')
+    args = parser.parse_args(argv)
+
+    results = {'meta': {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0], 'platform': platform.platform(),
+                        'seed': args.seed, 'rounds': args.rounds, 'kind': args.kind, 'scale': args.scale}, 'stages': {}, 'difficulties': {}}
+    memory = lambda fn: None if args.no_memory else peak_memory(fn)
+
+    # Loading
+    df, seconds = timed(lambda: pd.read_csv(args.csv), args.repeat)
+    results['stages']['read_csv'] = dict(percentiles(seconds), peak_kib=memory(lambda: pd.read_csv(args.csv)))
+    drae = None
+    if os.path.exists(args.json):
+        results['meta']['source'] = args.json
+        drae, seconds = timed(lambda: utils.load_dicts([args.json]), args.repeat)
+        results['stages']['load_dicts'] = dict(percentiles(seconds), peak_kib=memory(lambda: utils.load_dicts([args.json])))
+    if drae is None or args.scale != 1: # Synthetic dictionary (with the real distributions, if available), generated once and not measured
+        results['meta']['source'] = 'synthetic'
+        (drae, df), seconds = timed(lambda: scale_dict(df, scale=args.scale, seed=args.seed, drae=drae))
+        results['meta']['synthetic_seconds'] = seconds[0]
+    results['meta']['words'] = len(drae)
+
+    # Filtering and indexes
+    excl_group = {**utils.ABR_REG, **utils.ABR_TEMA, **utils.ABR_DESUS}
+    _, seconds = timed(lambda: utils.exclude_group(drae, excl_group, rebuild=True), args.repeat)
+    results['stages']['exclude_group'] = dict(percentiles(seconds), peak_kib=memory(lambda: utils.exclude_group(drae, excl_group, rebuild=True)))
+    engine, seconds = timed(lambda: DictEngine.build(drae, df, kind=args.kind), args.repeat)
+    results['stages']['build'] = dict(percentiles(seconds), peak_kib=memory(lambda: DictEngine.build(drae, df, kind=args.kind)))
+    results['meta']['targets'] = len(engine.df['word'])
+
+    # Rounds
+    for difficulty in args.difficulties:
+        if not engine.target_tables[difficulty]:
+            results['difficulties'][difficulty] = {'skipped': 'no viable target words'}
+            continue
+        utils.modify_def.cache_clear() # Every difficulty starts with the caches empty
+        engine.cache_clear()
+        records = run_rounds(engine, difficulty, args.rounds, args.seed)
+        utils.modify_def.cache_clear()
+        engine.cache_clear()
+        retries = [r['retries'] for r in records]
+        results['difficulties'][difficulty] = {
+            'round': percentiles([r['seconds'] for r in records]),
+            'stages': {stage: percentiles([r['stages'].get(stage, 0.0) for r in records]) for stage in ROUND_STAGES + HINT_SUBSTAGES},
+            'retries': {'mean': sum(retries) / len(retries), 'max': max(retries), 'total': sum(retries)},
+            'peak_kib': memory(lambda: run_rounds(engine, difficulty, args.rounds, args.seed))}
+
+    os.makedirs(args.out, exist_ok=True)
+    out = os.path.join(args.out, f"bench-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out, 'w', encoding='utf-8') as fp:
+        json.dump(results, fp, indent=1)
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fp:
+            previous = json.load(fp)
+    report(results, previous)
+    print(f'Resultados guardados en {out}')
+
+def report(results, previous=None):
+    """Prints the p50/p99 of every stage and round (and the p50 ratio against `previous`, if given)."""
+    rows = [(stage, res) for stage, res in results['stages'].items()]
+    rows += [(f'round {d}', dict(res['round'], peak_kib=res['peak_kib'])) for d, res in results['difficulties'].items() if 'round' in res]
+    old = {}
+    if previous:
+        old.update(previous['stages'])
+        old.update({f'round {d}': res['round'] for d, res in previous['difficulties'].items() if 'round' in res})
+    for name, res in rows:
+        line = f"{name:<20} p50 {res['p50']:9.3f} ms  p99 {res['p99']:9.3f} ms"
+        if res.get('peak_kib') is not None:
+            line += f"  peak {res['peak_kib'] / 1024:8.1f} MiB"
+        if name in old and old[name].get('p50'):
+            line += f"  x{res['p50'] / old[name]['p50']:.2f}"
+        print(line)
+    for d, res in results['difficulties'].items():
+        if 'skipped' in res:
+            print(f"{d:<20} skipped ({res['skipped']})")
+            continue
+        print(f"retries {d:<12} mean {res['retries']['mean']:.2f}  max {res['retries']['max']}")
+        print(f"stages {d:<13} " + '  '.join(f"{stage} {res['stages'][stage]['p50']:.3f}" for stage in ROUND_STAGES + HINT_SUBSTAGES if stage in res.get('stages', {})) + ' (p50 ms)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Batch puzzle generation (e.g. daily or offline puzzle packs)
+# Example: python generate.py -n 100 --seed 2024 --processes 4 --out puzzles.jsonl
+import argparse, json, multiprocessing, random, sys
+import src.utils as utils
+from src.engine import DictEngine
+from src.validate import AmbiguityChecker
+
+_engine = None # Engine of each worker process (loaded once per worker)
+_checker = None # Ambiguity checker of each worker process (if requested)
+_reject = False
+
+def init_worker(load_kwargs, ambiguous='keep'):
+    global _engine, _checker, _reject
+    _engine = DictEngine.load(**load_kwargs)
+    if ambiguous != 'keep':
+        _checker = AmbiguityChecker.from_engine(_engine)
+        _reject = ambiguous == 'reject'
+
+def task_seed(seed, difficulty, i):
+    """Seed of a single puzzle, so the output doesn't depend on which worker generates it."""
+    return f'{seed}:{difficulty}:{i}'
+
+def make_puzzle(task):
+    seed, difficulty, i = task
+    puzzle = _engine.new_puzzle(difficulty, rng=random.Random(task_seed(seed, difficulty, i)), checker=_checker, reject_ambiguous=_reject)
+    puzzle['index'] = i
+    puzzle['seed'] = seed
+    return json.dumps(puzzle, ensure_ascii=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Genera puzles en lote (JSONL), con las mismas reglas que el juego.')
+    parser.add_argument('-n', '--number', type=int, default=10, help='Puzles por dificultad.')
+    parser.add_argument('-d', '--difficulties', nargs='+', default=list(utils.HINT_TYPES), choices=list(utils.HINT_TYPES))
+    parser.add_argument('--seed', default=0, help='Semilla (misma semilla, mismos puzles).')
+    parser.add_argument('-p', '--processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('-o', '--out', default='-', help='Archivo JSONL de salida (`-` para la salida estándar).')
+    parser.add_argument('--json', default='data/diccionario.json')
+    parser.add_argument('--csv', default='data/diccionario_df.csv')
+    parser.add_argument('--compact', default='data/diccionario.bin')
+    parser.add_argument('--kind', default='sust')
+    parser.add_argument('--ambiguous', default='keep', choices=['keep', 'flag', 'reject'], help='Puzles con otras respuestas válidas: no comprobar, marcar (`alternatives`) o descartar.')
+    args = parser.parse_args(argv)
+
+    load_kwargs = dict(json_file=args.json, csv_file=args.csv, compact_file=args.compact, kind=args.kind)
+    tasks = [(args.seed, difficulty, i) for difficulty in args.difficulties for i in range(args.number)]
+    out = sys.stdout if args.out == '-' else open(args.out, 'w', encoding='utf-8')
+    try:
+        with multiprocessing.Pool(args.processes, initializer=init_worker, initargs=(load_kwargs, args.ambiguous)) as pool:
+            for line in pool.imap(make_puzzle, tasks, chunksize=max(1, len(tasks) // (4 * args.processes))): # Ordered, streamed as they are ready
+                out.write(line + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == '__main__':
+    main()
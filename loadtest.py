@@ -0,0 +1,176 @@
+# Load test of the game flow: N concurrent sessions playing like streamlit.py (pick a difficulty, start a round, reveal hints 2 and 3, answer, next round)
+# Uses a synthetic dictionary (see `src/synthetic.py`) if the dictionary files are not available
+# Example: python loadtest.py --sessions 1 8 32 128 --rounds 20 --mode threads
+import argparse, datetime, json, os, platform, random, sys, threading, time
+from concurrent.futures import ProcessPoolExecutor
+import src.utils as utils
+from src.engine import DictEngine
+from src.pool import PuzzlePool, available_difficulties
+from src.telemetry import percentiles
+
+MAX_SCORE = {'easy': 15, 'normal': 20, 'hard': 25, 'extreme': 35, 'impossible': 50} # Same as streamlit.py
+
+def rss_kib():
+    """Resident memory of this process (KiB)."""
+    try:
+        with open('/proc/self/status', encoding='ascii') as fp:
+            for line in fp:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError: # Not Linux: peak instead of current
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def load_engine(args):
+    """Engine from the dictionary files (or the on-disk snapshot), or from a synthetic dictionary if they are missing."""
+    if os.path.exists(args.json) or (args.compact and os.path.exists(args.compact)):
+        return DictEngine.load(args.json, args.csv, compact_file=args.compact, kind=args.kind)
+    import pandas as pd
+    from src.synthetic import scale_dict
+    drae, df = scale_dict(pd.read_csv(args.csv), scale=args.scale, seed=args.seed)
+    return DictEngine.build(drae, df, kind=args.kind)
+
+def play_session(get_puzzle, difficulty, rounds, rng, think=0.0, accuracy=0.5):
+    """One player going through `rounds` rounds of the game. Returns the round start and hint reveal timings (seconds)."""
+    hints = utils.HINT_TYPES[difficulty]
+    max_score = MAX_SCORE[difficulty]
+    score = 0
+    starts, reveals = [], []
+    for _ in range(rounds):
+        # New round: a puzzle from the pool (or generated on the spot)
+        t0 = time.perf_counter()
+        puzzle = get_puzzle(difficulty)
+        starts.append(time.perf_counter() - t0)
+        show_word = puzzle['show_word']
+        temp_score = max_score
+        letters = [l.upper() for l in show_word[1:-1]]
+        rng.shuffle(letters)
+        shuffled_letters = ' '.join([show_word[0].upper()] + letters + [show_word[-1].upper()]) # Anagram, built at round start as in streamlit.py
+        time.sleep(think)
+        # Hint 2 (last letter and one more definition) and hint 3 (anagram)
+        t0 = time.perf_counter()
+        _, hint_def, _ = puzzle['solutions'][len(hints) - 1]
+        hint_def = utils.modify_def(show_word, hint_def)
+        temp_score -= max_score // 3
+        temp_score -= max_score // 2 - max_score // 3
+        reveals.append(time.perf_counter() - t0)
+        time.sleep(think)
+        # Answer (right or give up) and next round
+        answer = show_word if rng.random() < accuracy else ''
+        if answer == show_word:
+            score += temp_score
+        if score >= 100: # Game over: a new game starts
+            score = 0
+    return starts, reveals
+
+def run_sessions(engine, sessions, args, seed, pool_size):
+    """Runs `sessions` concurrent sessions (threads) on one engine. Returns the raw timings, the wall time, the RSS before and after and the failed sessions."""
+    difficulties = available_difficulties(engine) # Only difficulties with target words (new_puzzle always fails on the rest)
+    if args.difficulty:
+        if args.difficulty not in difficulties:
+            raise Exception(f'No hay palabras objetivo viables para la dificultad {args.difficulty} ({engine.kind})')
+        difficulties = [args.difficulty]
+    pool = None if args.no_pool else PuzzlePool(engine, size=pool_size, difficulties=difficulties, workers=args.workers).start()
+    get_puzzle = engine.new_puzzle if pool is None else pool.get
+    if pool is not None:
+        time.sleep(args.warmup) # Let the queues fill, as in a running server
+    rss_before = rss_kib()
+    results = [None] * sessions
+    errors = [None] * sessions
+    def session(i):
+        rng = random.Random(f'{seed}:{i}')
+        difficulty = rng.choice(difficulties)
+        try:
+            results[i] = play_session(get_puzzle, difficulty, args.rounds, rng, think=args.think, accuracy=args.accuracy)
+        except Exception as e: # The session is counted as failed instead of its timings
+            errors[i] = f'{difficulty}: {e!r}'
+            print(f'Session {i} failed ({errors[i]})', file=sys.stderr)
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    rss_after = rss_kib()
+    misses = 0
+    if pool is not None:
+        misses = sum(m['misses'] for m in pool.metrics().values())
+        pool.stop()
+    done = [r for r in results if r is not None]
+    return {'starts': [s for r in done for s in r[0]], 'reveals': [s for r in done for s in r[1]], 'wall': wall,
+            'rss_before': rss_before, 'rss_after': rss_after, 'misses': misses, 'errors': [e for e in errors if e is not None]}
+
+def _process_sessions(args, sessions, seed, pool_size):
+    return run_sessions(load_engine(args), sessions, args, seed, pool_size)
+
+def measure(engine, sessions, args):
+    """Runs one load level (in threads or split over processes) and summarizes it."""
+    seed = f'{args.seed}:{sessions}'
+    if args.mode == 'threads':
+        parts = [run_sessions(engine, sessions, args, seed, args.pool_size)]
+    else: # Every process loads its own engine and pool, with its share of the sessions
+        shares = [n for n in (sessions // args.processes + (i < sessions % args.processes) for i in range(args.processes)) if n]
+        with ProcessPoolExecutor(len(shares)) as executor:
+            parts = list(executor.map(_process_sessions, [args] * len(shares), shares, [f'{seed}:{i}' for i in range(len(shares))], [args.pool_size] * len(shares)))
+    starts = [s for p in parts for s in p['starts']]
+    rounds = len(starts)
+    wall = max(p['wall'] for p in parts)
+    growth = sum(p['rss_after'] - p['rss_before'] for p in parts)
+    errors = [e for p in parts for e in p['errors']]
+    return {'sessions': sessions, 'mode': args.mode, 'processes': len(parts), 'rounds': rounds, 'wall_seconds': wall,
+            'rounds_per_second': rounds / wall if wall else None, 'round_start': percentiles(starts),
+            'hint_reveal': percentiles([s for p in parts for s in p['reveals']]), 'pool_misses': sum(p['misses'] for p in parts),
+            'rss_kib': sum(p['rss_after'] for p in parts), 'rss_growth_per_session_kib': growth / sessions,
+            'failed_sessions': len(errors), 'errors': errors}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prueba de carga: sesiones concurrentes jugando como en streamlit.py.')
+    parser.add_argument('-s', '--sessions', type=int, nargs='+', default=[1, 8, 32], help='Sesiones concurrentes (una prueba por valor).')
+    parser.add_argument('-r', '--rounds', type=int, default=20, help='Rondas por sesión.')
+    parser.add_argument('-d', '--difficulty', choices=list(utils.HINT_TYPES), help='Dificultad de todas las sesiones (por defecto, una al azar por sesión).')
+    parser.add_argument('--mode', choices=['threads', 'processes'], default='threads')
+    parser.add_argument('-p', '--processes', type=int, default=os.cpu_count(), help='Procesos (con --mode processes).')
+    parser.add_argument('--no-pool', action='store_true', help='Generar cada puzle al empezar la ronda, sin cola.')
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=1, help='Hilos de relleno de la cola.')
+    parser.add_argument('--warmup', type=float, default=1.0, help='Segundos para llenar la cola antes de empezar.')
+    parser.add_argument('--think', type=float, default=0.0, help='Segundos que piensa el jugador antes de cada acción.')
+    parser.add_argument('--accuracy', type=float, default=0.5, help='Proporción de rondas acertadas.')
+    parser.add_argument('--seed', default=0)
+    parser.add_argument('--json', default='data/diccionario.json')
+    parser.add_argument('--csv', default='data/diccionario_df.csv')
+    parser.add_argument('--compact', default='data/diccionario.bin')
+    parser.add_argument('--kind', default='sust')
+    parser.add_argument('--scale', type=float, default=1, help='Escala del diccionario sintético (si no están los archivos).')
+    parser.add_argument('-o', '--out', default='benchmarks', help='Carpeta donde guardar los resultados (JSON).')
+    args = parser.parse_args(argv)
+
+    results = {'meta': {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0], 'platform': platform.platform(),
+                        'cpus': os.cpu_count(), **{k: v for k, v in vars(args).items() if k != 'sessions'}}, 'levels': []}
+    engine = load_engine(args) if args.mode == 'threads' else None
+    for sessions in args.sessions:
+        level = measure(engine, sessions, args)
+        results['levels'].append(level)
+        report(level)
+
+    os.makedirs(args.out, exist_ok=True)
+    out = os.path.join(args.out, f"loadtest-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out, 'w', encoding='utf-8') as fp:
+        json.dump(results, fp, indent=1)
+    print(f'Resultados guardados en {out}')
+
+def report(level):
+    """Prints one load level."""
+    start, reveal = level['round_start'], level['hint_reveal']
+    if not start['n']: # Every session failed
+        print(f"{level['sessions']:>5} sessions ({level['mode']}, {level['processes']} proc)  all failed: {level['errors'][0]}")
+        return
+    print(f"{level['sessions']:>5} sessions ({level['mode']}, {level['processes']} proc)  {level['rounds_per_second']:9.1f} rounds/s  "
+          f"start p50 {start['p50']:8.3f} ms  p99 {start['p99']:8.3f} ms  reveal p99 {reveal['p99']:7.3f} ms  "
+          f"misses {level['pool_misses']:>5}  rss +{level['rss_growth_per_session_kib']:8.1f} KiB/session  failed {level['failed_sessions']:>3}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,460 @@
+import io, json, mmap, struct, sys
+from array import array
+from collections.abc import Mapping
+
+# Formato binario compacto del diccionario (`diccionario.json` + `diccionario_df.csv` en un solo archivo).
+# Crear: python -m src.compact data/diccionario.json data/diccionario_df.csv data/diccionario.bin
+#
+# Estructura: `MAGIC`, longitud de la cabecera (`<Q`), cabecera JSON y secciones alineadas a 8 bytes.
+# Cada sección es un array de enteros (`typecode` de `array`) o un blob UTF-8 (`B`).
+# Las cadenas se guardan como blob + array de offsets (`*_str` y `*_off`).
+
+MAGIC = b'RAEDICT1'
+VERSION = 1
+ALIGN = 8
+
+TABLE_COLUMNS = ('id', 'word', 'simple_word', 'kinds', 'num_defs', 'def_freq', 'commonness') # Columnas de `diccionario_df.csv` que se guardan
+
+def _string_section(values):
+    """Blob UTF-8 y offsets de una lista de cadenas."""
+    offsets = array('Q', [0])
+    parts = []
+    pos = 0
+    for v in values:
+        b = v.encode('utf-8')
+        parts.append(b)
+        pos += len(b)
+        offsets.append(pos)
+    return b''.join(parts), offsets
+
+def _intern(values, table, strings):
+    """Índice de cada valor en `strings` (añadiéndolo si no está)."""
+    res = array('I')
+    for v in values:
+        i = table.get(v)
+        if i is None:
+            i = table[v] = len(strings)
+            strings.append(v)
+        res.append(i)
+    return res
+
+def build_sections(drae, df):
+    """Secciones del formato compacto.
+
+    Args
+    ----------
+    drae : dict
+        Diccionario de la RAE.
+    df : pd.DataFrame or dict
+        DataFrame de palabras (o diccionario de columnas, ver `utils.df_to_dict`).
+
+    Returns
+    -------
+    dict
+        `{nombre: array o bytes}`.
+    """
+    ids, id_table = [], {}
+    abrevs, abrev_table = [], {}
+    words = list(drae)
+    word_id = _intern((drae[w]['id'] for w in words), id_table, ids)
+    acep_off, acep_abrev_off, acep_rel_off = array('I', [0]), array('I', [0]), array('I', [0])
+    acep_abrev, acep_rel = array('I'), array('I')
+    defs = []
+    for word in words:
+        entry = drae[word]
+        for definition, abrev, rel_ids in zip(entry['defs'], entry['abrev'], entry['rel_ids']):
+            defs.append(definition)
+            acep_abrev.extend(_intern(abrev, abrev_table, abrevs))
+            acep_abrev_off.append(len(acep_abrev))
+            acep_rel.extend(_intern(rel_ids, id_table, ids))
+            acep_rel_off.append(len(acep_rel))
+        acep_off.append(len(defs))
+    sections = {'word_id': word_id, 'acep_off': acep_off, 'acep_abrev_off': acep_abrev_off, 'acep_abrev': acep_abrev, 'acep_rel_off': acep_rel_off, 'acep_rel': acep_rel}
+    sections['def_str'], sections['def_off'] = _string_section(defs)
+    return finish_sections(sections, words, ids, id_table, abrevs, df)
+
+def _np_array(values, typecode='I'):
+    """Array de numpy como `array` (lo que guardan las secciones)."""
+    import numpy as np
+    return array(typecode, np.ascontiguousarray(values, dtype=np.dtype(typecode)).tobytes())
+
+def _segments(off, selected):
+    """Posiciones de los elementos de los segmentos `selected` (de offsets `off`) y sus nuevos offsets."""
+    import numpy as np
+    starts = off[selected]
+    lengths = off[selected + 1] - starts
+    new_off = np.concatenate(([0], np.cumsum(lengths)))
+    return np.arange(new_off[-1]) + np.repeat(starts - new_off[:-1], lengths), new_off
+
+def _postings(acep_off, acep_rel_off, acep_rel, num_ids):
+    """Índice inverso (`id` -> [(palabra, acepción)], como `utils.build_id_index`) en forma de offsets y arrays."""
+    import numpy as np
+    acep_off, acep_rel_off, acep_rel = np.asarray(acep_off, dtype=np.int64), np.asarray(acep_rel_off, dtype=np.int64), np.asarray(acep_rel, dtype=np.int64)
+    num_words = len(acep_off) - 1
+    aceps, rels = np.diff(acep_off), np.diff(acep_rel_off)
+    acep_word = np.repeat(np.arange(num_words), aceps) # Palabra de cada acepción
+    acep_num = np.arange(acep_off[-1]) - np.repeat(acep_off[:-1], aceps) # Posición de cada acepción en su palabra
+    keys = acep_rel * max(num_words, 1) + np.repeat(acep_word, rels)
+    keys, first = np.unique(keys, return_index=True) # Ordenado por `id` y palabra, con la primera acepción de cada palabra
+    post_rel = keys // max(num_words, 1)
+    post_off = np.concatenate(([0], np.cumsum(np.bincount(post_rel, minlength=num_ids))))
+    return _np_array(post_off), _np_array(keys % max(num_words, 1)), _np_array(np.repeat(acep_num, rels)[first])
+
+def finish_sections(sections, words, ids, id_table, abrevs, df):
+    """Completa las secciones de las acepciones con el índice inverso, la tabla de palabras y las tablas de cadenas.
+
+    Args
+    ----------
+    sections : dict
+        Secciones `word_id`, `acep_*` y `def_*` (ver `build_sections`).
+    words, ids, abrevs : list
+        Palabras, `id` y abreviaturas (las secciones guardan su posición).
+    id_table : dict
+        `{id: posición en ids}` (se amplía con los `id` de la tabla).
+    df : None, pd.DataFrame or dict
+        DataFrame de palabras (o diccionario de columnas). Si es `None`, la tabla queda vacía.
+
+    Returns
+    -------
+    dict
+        Todas las secciones.
+    """
+    columns = {c: df[c].tolist() if hasattr(df[c], 'tolist') else list(df[c]) for c in TABLE_COLUMNS} if df is not None else {c: [] for c in TABLE_COLUMNS}
+    kinds, kind_table = [], {}
+    sections['row_id'] = _intern(columns['id'], id_table, ids)
+    sections['row_kinds'] = _intern(columns['kinds'], kind_table, kinds)
+    sections['row_num_defs'] = array('i', (int(v) for v in columns['num_defs']))
+    sections['row_def_freq'] = array('i', (int(v) for v in columns['def_freq']))
+    sections['row_commonness'] = array('b', (int(v) for v in columns['commonness']))
+    sections['post_off'], sections['post_word'], sections['post_acep'] = _postings(sections['acep_off'], sections['acep_rel_off'], sections['acep_rel'], len(ids))
+    for name, values in (('word', words), ('id', ids), ('abrev', abrevs), ('kind', kinds), ('row_word', columns['word']), ('row_simple', columns['simple_word'])):
+        sections[name + '_str'], sections[name + '_off'] = _string_section(values)
+    return sections
+
+def _write_sections(sections, fp):
+    layout, pos = {}, 0
+    for name, data in sections.items():
+        nbytes = len(data) * data.itemsize if isinstance(data, array) else len(data)
+        layout[name] = [pos, nbytes, data.typecode if isinstance(data, array) else 'B']
+        pos += nbytes + (-nbytes % ALIGN)
+    header = json.dumps({'version': VERSION, 'byteorder': sys.byteorder, 'sections': layout}).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 8 + len(header)) % ALIGN) # Secciones alineadas
+    fp.write(MAGIC + struct.pack('<Q', len(header)) + header)
+    for name, data in sections.items():
+        raw = data.tobytes() if isinstance(data, array) else data
+        fp.write(raw + b'\0' * (-len(raw) % ALIGN))
+
+def write_compact(drae, df, file):
+    """Guarda diccionario y DataFrame en el formato compacto.
+
+    Args
+    ----------
+    drae : dict
+        Diccionario de la RAE.
+    df : pd.DataFrame or dict
+        DataFrame de palabras (o diccionario de columnas).
+    file : str
+        Archivo de salida.
+    """
+    with open(file, 'wb') as fp:
+        _write_sections(build_sections(drae, df), fp)
+
+def _copy_section(section):
+    """Copia de una sección del archivo (`memoryview`) como bytes o array."""
+    return bytes(section) if section.format == 'B' else array(section.format, section.tobytes())
+
+def from_sections(sections):
+    """Diccionario compacto en memoria (sin archivo) a partir de sus secciones.
+
+    Args
+    ----------
+    sections : dict
+        Secciones (ver `build_sections`).
+
+    Returns
+    -------
+    CompactDict
+        Diccionario de la RAE.
+    """
+    fp = io.BytesIO()
+    _write_sections(sections, fp)
+    return CompactDict(fp.getbuffer())
+
+def compact_dict(drae, df=None):
+    """Convierte un diccionario en un diccionario compacto en memoria.
+
+    Ocupa varias veces menos que el diccionario de listas y se usa igual (es de sólo lectura).
+
+    Args
+    ----------
+    drae : dict
+        Diccionario de la RAE.
+    df : None, pd.DataFrame or dict
+        DataFrame de palabras (o diccionario de columnas) que se guarda como tabla (`.table`).
+
+    Returns
+    -------
+    CompactDict
+        Diccionario de la RAE.
+    """
+    return from_sections(build_sections(drae, df))
+
+def load_compact(file):
+    """Carga (mapeando en memoria, sólo lectura) un diccionario en formato compacto.
+
+    Args
+    ----------
+    file : str
+        Archivo creado con `write_compact`.
+
+    Returns
+    -------
+    CompactDict
+        Diccionario de la RAE (con la tabla de palabras en `.table` y el índice inverso en `.index`).
+    """
+    with open(file, 'rb') as fp:
+        buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    return CompactDict(buffer)
+
+class _Strings:
+    """Tabla de cadenas sobre un blob UTF-8 y sus offsets."""
+    __slots__ = ('blob', 'off')
+
+    def __init__(self, blob, off):
+        self.blob = blob
+        self.off = off
+
+    def __len__(self):
+        return len(self.off) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.off[i]:self.off[i + 1]], 'utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def tolist(self):
+        """Todas las cadenas, decodificadas."""
+        blob, off = self.blob, self.off
+        return [str(blob[off[i]:off[i + 1]], 'utf-8') for i in range(len(off) - 1)]
+
+class CompactDict(Mapping):
+    """Vista de sólo lectura del diccionario compacto, compatible con `{palabra: {'id', 'defs', 'abrev', 'rel_ids'}}`.
+
+    Los `id` y las abreviaturas se guardan como enteros (posiciones en sus tablas), y acepciones, relaciones y abreviaturas en arrays planos con offsets. Las entradas se crean al consultarlas.
+    """
+    __slots__ = ('_buffer', '_s', '_words', '_ids', '_defs', '_abrevs', '_kinds', '_row_words', '_row_simples',
+                 '_word_index', '_id_index', '_id_list', '_abrev_list', 'table', 'index')
+
+    def __init__(self, buffer):
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise Exception('El archivo no está en formato compacto')
+        (header_len,) = struct.unpack_from('<Q', buffer, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(bytes(buffer[start:start + header_len]))
+        if header['version'] != VERSION or header['byteorder'] != sys.byteorder:
+            raise Exception('Versión u orden de bytes del archivo compacto no soportados')
+        start += header_len
+        self._buffer = buffer
+        view = memoryview(buffer)
+        s = {}
+        for name, (offset, nbytes, typecode) in header['sections'].items():
+            section = view[start + offset:start + offset + nbytes]
+            s[name] = section if typecode == 'B' else section.cast(typecode)
+        self._s = s
+        for name in ('word', 'id', 'def', 'abrev', 'kind', 'row_word', 'row_simple'):
+            setattr(self, '_' + name + 's', _Strings(s[name + '_str'], s[name + '_off']))
+        self._word_index = None
+        self._id_index = None
+        self._id_list = None
+        self._abrev_list = None
+        self.table = CompactTable(self)
+        self.index = CompactIndex(self)
+
+    def word_index(self):
+        """Diccionario `{palabra: posición}` (se crea en la primera consulta)."""
+        if self._word_index is None:
+            self._word_index = {w: i for i, w in enumerate(self._words)}
+        return self._word_index
+
+    def id_index(self):
+        """Diccionario `{id: posición en la tabla de ids}` (se crea en la primera consulta)."""
+        if self._id_index is None:
+            self._id_index = {r: i for i, r in enumerate(self._ids)}
+        return self._id_index
+
+    def entry(self, w):
+        """Entrada de la palabra en la posición `w`."""
+        if self._id_list is None: # Tablas pequeñas y muy consultadas: se decodifican una sola vez
+            self._id_list = self._ids.tolist()
+            self._abrev_list = self._abrevs.tolist()
+        s = self._s
+        ids, abrevs = self._id_list, self._abrev_list
+        abrev_off, rel_off = s['acep_abrev_off'], s['acep_rel_off']
+        start, end = s['acep_off'][w], s['acep_off'][w + 1]
+        defs = [self._defs[a] for a in range(start, end)]
+        abrev = [[abrevs[i] for i in s['acep_abrev'][abrev_off[a]:abrev_off[a + 1]]] for a in range(start, end)]
+        rel_ids = [[ids[i] for i in s['acep_rel'][rel_off[a]:rel_off[a + 1]]] for a in range(start, end)]
+        return {'id': ids[s['word_id'][w]], 'defs': defs, 'abrev': abrev, 'rel_ids': rel_ids}
+
+    def word_id(self, word):
+        """`id` de la palabra."""
+        return self._ids[self._s['word_id'][self.word_index()[word]]]
+
+    def definition(self, word, i):
+        """Acepción `i` (posición) de la palabra."""
+        return self._defs[self._s['acep_off'][self.word_index()[word]] + i]
+
+    def words_with(self, word):
+        """Palabras en cuya definición aparece `word`, con su primera acepción que la contiene (como `utils.words_with_word` con `.index`).
+
+        Returns
+        -------
+        list
+            Lista de tuplas: `(palabra, acepción)`
+        """
+        s = self._s
+        r = s['word_id'][self.word_index()[word]]
+        start, end = s['post_off'][r], s['post_off'][r + 1]
+        words, defs, acep_off = self._words, self._defs, s['acep_off']
+        return [(words[w], defs[acep_off[w] + i]) for w, i in zip(s['post_word'][start:end], s['post_acep'][start:end])]
+
+    def definitions(self):
+        """Todas las acepciones, en orden."""
+        return self._defs.tolist()
+
+    def select(self, keep):
+        """Copia (en memoria) con sólo algunas acepciones. Las palabras que se quedan sin acepciones (o no tenían) se quitan.
+
+        Args
+        ----------
+        keep : list of bool
+            Para cada acepción (en el orden de `definitions`), si se conserva.
+
+        Returns
+        -------
+        CompactDict
+            Diccionario con las mismas tablas de `id`, abreviaturas y palabras (`.table`).
+        """
+        import numpy as np
+        s = self._s
+        keep = np.asarray(keep, dtype=bool)
+        acep_off = np.asarray(s['acep_off'], dtype=np.int64)
+        kept = np.concatenate(([0], np.cumsum(keep)))
+        counts = kept[acep_off[1:]] - kept[acep_off[:-1]] # Acepciones que conserva cada palabra
+        selected = np.flatnonzero(counts > 0) # Las que se quedan sin acepciones se quitan (como en `utils.exclude_group`)
+        aceps = np.flatnonzero(keep)
+        rels, acep_rel_off = _segments(np.asarray(s['acep_rel_off'], dtype=np.int64), aceps)
+        abrev, acep_abrev_off = _segments(np.asarray(s['acep_abrev_off'], dtype=np.int64), aceps)
+        def_off, defs = s['def_off'], s['def_str']
+        sections = {'word_id': _np_array(np.asarray(s['word_id'])[selected]), 'acep_off': _np_array(np.concatenate(([0], np.cumsum(counts[selected])))),
+                    'acep_abrev_off': _np_array(acep_abrev_off), 'acep_abrev': _np_array(np.asarray(s['acep_abrev'])[abrev]),
+                    'acep_rel_off': _np_array(acep_rel_off), 'acep_rel': _np_array(np.asarray(s['acep_rel'])[rels])}
+        sections['def_str'] = b''.join(defs[def_off[a]:def_off[a + 1]] for a in aceps.tolist())
+        lengths = np.asarray(def_off, dtype=np.int64)[aceps + 1] - np.asarray(def_off, dtype=np.int64)[aceps]
+        sections['def_off'] = _np_array(np.concatenate(([0], np.cumsum(lengths))), 'Q')
+        sections['post_off'], sections['post_word'], sections['post_acep'] = _postings(sections['acep_off'], sections['acep_rel_off'], sections['acep_rel'], len(self._ids))
+        words = self._words.tolist()
+        sections['word_str'], sections['word_off'] = _string_section([words[w] for w in selected.tolist()])
+        for name, section in s.items(): # Tablas de `id`, abreviaturas y palabras: sin cambios
+            if name not in sections:
+                sections[name] = _copy_section(section)
+        return from_sections(sections)
+
+    def sections(self):
+        """Copia de todas las secciones (p. ej. para guardarlas con otras, ver `snapshot`).
+
+        Returns
+        -------
+        dict
+            `{nombre: array o bytes}`.
+        """
+        return {name: _copy_section(section) for name, section in self._s.items()}
+
+    def __getitem__(self, word):
+        return self.entry(self.word_index()[word])
+
+    def __contains__(self, word):
+        return word in self.word_index()
+
+    def __iter__(self):
+        return iter(self._words)
+
+    def __len__(self):
+        return len(self._words)
+
+class CompactIndex(Mapping):
+    """Índice inverso `{id: [(palabra, acepción)]}` guardado en el archivo compacto (ver `utils.build_id_index`)."""
+    __slots__ = ('_drae',)
+
+    def __init__(self, drae):
+        self._drae = drae
+
+    def __getitem__(self, rel_id):
+        d = self._drae
+        s = d._s
+        r = d.id_index()[rel_id]
+        start, end = s['post_off'][r], s['post_off'][r + 1]
+        return [(d._words[w], i) for w, i in zip(s['post_word'][start:end], s['post_acep'][start:end])]
+
+    def __iter__(self):
+        d = self._drae
+        return (d._ids[r] for r in range(len(d._ids)) if d._s['post_off'][r] < d._s['post_off'][r + 1])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+class CompactTable(Mapping):
+    """Tabla de palabras `{palabra: {columna: valor}}` guardada en el archivo compacto (ver `utils.build_word_lookup`)."""
+    __slots__ = ('_drae', '_row_index')
+
+    def __init__(self, drae):
+        self._drae = drae
+        self._row_index = None
+
+    def row_index(self):
+        """Diccionario `{palabra: primera fila}` (se crea en la primera consulta)."""
+        if self._row_index is None:
+            self._row_index = {}
+            for i, w in enumerate(self._drae._row_words):
+                self._row_index.setdefault(w, i)
+        return self._row_index
+
+    def row(self, i):
+        """Fila `i` de la tabla."""
+        d = self._drae
+        s = d._s
+        return {'id': d._ids[s['row_id'][i]], 'word': d._row_words[i], 'simple_word': d._row_simples[i], 'kinds': d._kinds[s['row_kinds'][i]],
+                'num_defs': s['row_num_defs'][i], 'def_freq': s['row_def_freq'][i], 'commonness': s['row_commonness'][i]}
+
+    def columns(self):
+        """Tabla completa como diccionario de columnas (como `utils.df_to_dict`), p. ej. para crear un DataFrame."""
+        d = self._drae
+        s = d._s
+        ids, kinds = d._ids.tolist(), d._kinds.tolist()
+        return {'id': [ids[i] for i in s['row_id']], 'word': d._row_words.tolist(), 'simple_word': d._row_simples.tolist(),
+                'kinds': [kinds[i] for i in s['row_kinds']], 'num_defs': s['row_num_defs'].tolist(),
+                'def_freq': s['row_def_freq'].tolist(), 'commonness': s['row_commonness'].tolist()}
+
+    def __getitem__(self, word):
+        return self.row(self.row_index()[word])
+
+    def __contains__(self, word):
+        return word in self.row_index()
+
+    def __iter__(self):
+        return iter(self.row_index())
+
+    def __len__(self):
+        return len(self.row_index())
+
+if __name__ == '__main__':
+    import argparse
+    import pandas as pd
+    from src.utils import load_dict
+    parser = argparse.ArgumentParser(description='Convierte el diccionario (json + csv) al formato compacto.')
+    parser.add_argument('json_file')
+    parser.add_argument('csv_file')
+    parser.add_argument('out_file')
+    args = parser.parse_args()
+    write_compact(load_dict(args.json_file), pd.read_csv(args.csv_file), args.out_file)
@@ -0,0 +1,404 @@
+import bisect, itertools, json, os, sys, threading
+from collections.abc import Mapping
+from . import utils
+
+# Cambios incrementales del diccionario (correcciones de acepciones o de datos de palabras) sin reconstruir el motor.
+# Un cambio es una lista de operaciones (en un archivo, una por línea en json):
+#     {"op": "add_acep", "word": "fresa1", "def": "3. f. ...", "abrev": ["f."], "rel_ids": ["..."]}
+#     {"op": "remove_acep", "word": "fresa1", "def": "3. f. ..."}
+#     {"op": "modify_acep", "word": "fresa1", "def": "3. f. ...", "set": {"def": "3. f. ...", "abrev": [...], "rel_ids": [...]}}
+#     {"op": "add_word", "word": "fresón", "id": "...", "defs": [...], "abrev": [...], "rel_ids": [...], "meta": {"simple_word": "fresón", "commonness": 2, ...}}
+#     {"op": "remove_word", "word": "fresón"}
+#     {"op": "update_word", "word": "fresa1", "values": {"commonness": 3}}
+# Las acepciones se identifican por su texto y se colocan por su número (ver `utils.get_acep_num`). Las que son del grupo excluído del motor (`DictEngine.excl_group`) se ignoran, como al cargar.
+# Uso: `engine, changed = engine.apply(read_delta('data/cambios.jsonl'))` (o `PuzzlePool.apply`, que además descarta los puzles afectados).
+
+OPS = ('add_acep', 'remove_acep', 'modify_acep', 'add_word', 'remove_word', 'update_word')
+
+def read_delta(file):
+    """Lee un archivo de cambios (una operación json por línea; se ignoran las líneas vacías).
+
+    Args
+    ----------
+    file : str
+        Archivo de cambios.
+
+    Returns
+    -------
+    list
+        Operaciones.
+    """
+    with open(file, 'r', encoding='utf-8') as fp:
+        return [json.loads(line) for line in fp if line.strip()]
+
+class PatchedDict(Mapping):
+    """Diccionario con cambios sobre otro de sólo lectura (p. ej. un `CompactDict`), sin copiarlo.
+
+    Las palabras cambiadas conservan su posición y las nuevas van al final (como en un `dict`). Lleva su propio índice inverso (`.index`, ver `PatchedIndex`).
+
+    Args
+    ----------
+    base : Mapping
+        Diccionario original.
+    changes : dict
+        `{palabra: entrada}`, con `None` para las palabras quitadas.
+    index : PatchedIndex
+        Índice inverso del diccionario con los cambios.
+    """
+    __slots__ = ('base', 'changes', 'index', '_added', '_order', '_len')
+
+    def __init__(self, base, changes, index, order=None):
+        self.base, self.changes, self.index = base, changes, index
+        self._added = [word for word in changes if word not in base] # En orden de llegada
+        self._order = order
+        self._len = len(base) + sum(1 for word, entry in changes.items() if (entry is not None) != (word in base))
+
+    def order(self):
+        """Diccionario `{palabra: posición}` de `base` (se crea en la primera consulta y se comparte entre versiones)."""
+        if self._order is None:
+            self._order = self.base.word_index() if hasattr(self.base, 'word_index') else {w: i for i, w in enumerate(self.base)}
+        return self._order
+
+    def position(self, word):
+        """Posición de la palabra para ordenar el índice (las nuevas, tras las de `base`)."""
+        pos = self.order().get(word)
+        return pos if pos is not None else len(self.base) + self._added.index(word)
+
+    def word_id(self, word):
+        """`id` de la palabra."""
+        if word in self.changes:
+            return self[word]['id']
+        return self.base.word_id(word) if hasattr(self.base, 'word_id') else self.base[word]['id']
+
+    def definition(self, word, i):
+        """Acepción `i` (posición) de la palabra."""
+        if word in self.changes:
+            return self[word]['defs'][i]
+        return self.base.definition(word, i) if hasattr(self.base, 'definition') else self.base[word]['defs'][i]
+
+    def words_with(self, word):
+        """Palabras en cuya definición aparece `word`, con su primera acepción que la contiene (como `utils.words_with_word` con `.index`)."""
+        return [(w, self.definition(w, i)) for w, i in self.index.get(self.word_id(word), [])]
+
+    def __getitem__(self, word):
+        if word in self.changes:
+            entry = self.changes[word]
+            if entry is None:
+                raise KeyError(word)
+            return entry
+        return self.base[word]
+
+    def __contains__(self, word):
+        if word in self.changes:
+            return self.changes[word] is not None
+        return word in self.base
+
+    def __iter__(self):
+        changes = self.changes
+        for word in self.base:
+            if word not in changes or changes[word] is not None:
+                yield word
+        for word in self._added:
+            if changes[word] is not None:
+                yield word
+
+    def __len__(self):
+        return self._len
+
+class PatchedIndex(Mapping):
+    """Índice inverso con cambios sobre otro (ver `utils.build_id_index`). Las listas cambiadas se rehacen al consultarlas, así que aplicar cambios no recorre las listas largas.
+
+    Args
+    ----------
+    base : Mapping
+        Índice original.
+    changes : dict
+        `{id: {palabra: primera acepción que lo contiene o None}}`.
+    drae : PatchedDict
+        Diccionario con los cambios (para colocar las palabras en su orden).
+    """
+    __slots__ = ('base', 'changes', 'drae')
+
+    def __init__(self, base, changes, drae):
+        self.base, self.changes, self.drae = base, changes, drae
+
+    def __getitem__(self, rel_id):
+        if rel_id not in self.changes:
+            return self.base[rel_id]
+        words = self.changes[rel_id]
+        postings = [p for p in self.base.get(rel_id, []) if p[0] not in words]
+        position = self.drae.position
+        for word, i in words.items():
+            if i is not None:
+                pos = position(word)
+                lo, hi = 0, len(postings)
+                while lo < hi: # Búsqueda binaria por posición en el diccionario
+                    mid = (lo + hi) // 2
+                    if position(postings[mid][0]) <= pos:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                postings.insert(lo, (word, i))
+        return postings
+
+    def __iter__(self):
+        return (r for r in itertools.chain(self.base, (r for r in self.changes if r not in self.base)) if r not in self.changes or self[r])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+def _first_aceps(entry):
+    """`{id: primera acepción que lo contiene}` de una entrada (o `{}` si no hay entrada), como en `utils.build_id_index`."""
+    res = {}
+    if entry is not None:
+        for i, rel_ids in enumerate(entry['rel_ids']):
+            for rel_id in rel_ids:
+                res.setdefault(rel_id, i)
+    return res
+
+class _Delta:
+    """Aplica las operaciones sobre las entradas del diccionario filtrado y las filas de palabras, guardando sólo lo que cambia."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.pattern = utils.compile_group(engine.excl_group) if engine.excl_group else None
+        self.entries = {} # {palabra: entrada o None}
+        self.meta = {} # {palabra: {columna: valor}} (filas nuevas o cambiadas)
+        self.removed_meta = set()
+
+    def excluded(self, definition):
+        return self.pattern is not None and self.pattern.search(definition) is not None
+
+    def entry(self, word):
+        """Copia de la entrada actual de la palabra (o `None`) para modificarla."""
+        if word not in self.entries:
+            entry = self.engine.drae.get(word)
+            self.entries[word] = None if entry is None else {'id': entry['id'], 'defs': list(entry['defs']), 'abrev': list(entry['abrev']), 'rel_ids': list(entry['rel_ids'])}
+        return self.entries[word]
+
+    def word_id(self, word, op):
+        if 'id' in op:
+            return op['id']
+        if word in self.engine.drae:
+            return self.engine.drae[word]['id']
+        full_df = self.engine.full_df
+        if word not in full_df['word']:
+            raise Exception(f'{word}: hace falta el `id` de la palabra')
+        return full_df['id'][full_df['word'].index(word)]
+
+    def insert(self, word, definition, abrev, rel_ids, op):
+        """Añade una acepción en el lugar que le corresponde por su número (salvo si es del grupo excluído)."""
+        if self.excluded(definition):
+            return
+        entry = self.entry(word)
+        if entry is None:
+            entry = self.entries[word] = {'id': self.word_id(word, op), 'defs': [], 'abrev': [], 'rel_ids': []}
+        nums = [utils.get_acep_num(d) for d in entry['defs']]
+        i = bisect.bisect_right(nums, utils.get_acep_num(definition))
+        entry['defs'].insert(i, definition)
+        entry['abrev'].insert(i, list(abrev))
+        entry['rel_ids'].insert(i, list(rel_ids))
+
+    def remove(self, word, definition):
+        """Quita una acepción y devuelve `(abrev, rel_ids)` (o `None` si estaba excluída). Si la palabra se queda sin acepciones se quita."""
+        entry = self.entry(word)
+        if entry is None or definition not in entry['defs']:
+            if self.excluded(definition): # Ya se había quitado al filtrar
+                return None
+            raise Exception(f'{word}: no tiene la acepción {definition!r}')
+        i = entry['defs'].index(definition)
+        del entry['defs'][i]
+        res = entry['abrev'].pop(i), entry['rel_ids'].pop(i)
+        if not entry['defs']:
+            self.entries[word] = None
+        return res
+
+    def row(self, word):
+        """Fila de datos actual de la palabra (o `None`) para modificarla."""
+        if word not in self.meta:
+            if word in self.removed_meta or word not in self.engine.lookup:
+                return None
+            self.meta[word] = {}
+        return self.meta[word]
+
+    def apply(self, op):
+        kind, word = op.get('op'), op.get('word')
+        if kind not in OPS or not word:
+            raise Exception(f'Operación no válida: {op!r}')
+        if kind == 'add_acep':
+            self.insert(word, op['def'], op.get('abrev', []), op.get('rel_ids', []), op)
+        elif kind == 'remove_acep':
+            self.remove(word, op['def'])
+        elif kind == 'modify_acep':
+            new = op['set']
+            old = self.remove(word, op['def'])
+            if old is None and not {'def', 'abrev', 'rel_ids'} <= set(new): # Estaba excluída y no se sabe cómo queda: se sigue ignorando
+                return
+            abrev, rel_ids = old or (None, None)
+            self.insert(word, new.get('def', op['def']), new.get('abrev', abrev), new.get('rel_ids', rel_ids), op)
+        elif kind == 'add_word':
+            if self.entry(word) is not None:
+                raise Exception(f'{word}: ya está en el diccionario')
+            entry = self.entries[word] = {'id': op['id'], 'defs': [], 'abrev': [], 'rel_ids': []}
+            for definition, abrev, rel_ids in zip(op['defs'], op['abrev'], op['rel_ids']):
+                self.insert(word, definition, abrev, rel_ids, op)
+            if not entry['defs']: # Sin acepciones (o las ha perdido todas): no entra, como en `utils.exclude_group`
+                self.entries[word] = None
+            if 'meta' in op:
+                self.removed_meta.discard(word)
+                self.meta[word] = dict(op['meta'])
+        elif kind == 'remove_word':
+            if self.entry(word) is None and word not in self.engine.lookup:
+                raise Exception(f'{word}: no está en el diccionario')
+            self.entries[word] = None
+            self.meta.pop(word, None)
+            self.removed_meta.add(word)
+        elif kind == 'update_word':
+            row = self.row(word)
+            if row is None:
+                raise Exception(f'{word}: no tiene datos')
+            row.update(op['values'])
+
+def _patch_index(drae, index, old, new):
+    """Índice inverso de `drae` con los cambios de las entradas (`old` y `new`: `{palabra: entrada o None}`)."""
+    base, changes = (index.base, dict(index.changes)) if isinstance(index, PatchedIndex) else (index, {})
+    for word in new:
+        before, after = _first_aceps(old[word]), _first_aceps(new[word])
+        for rel_id in before.keys() | after.keys():
+            if before.get(rel_id) != after.get(rel_id):
+                changes[rel_id] = {**changes.get(rel_id, {}), word: after.get(rel_id)}
+    return PatchedIndex(base, changes, drae)
+
+def _patch_meta(engine, delta):
+    """`full_df` y `lookup` con los datos cambiados."""
+    full_df = engine.full_df
+    if delta.removed_meta:
+        full_df = utils.table_rows(full_df, [i for i, word in enumerate(full_df['word']) if word not in delta.removed_meta])
+    else:
+        full_df = {c: list(values) for c, values in full_df.items()}
+    new_rows = {word: row for word, row in delta.meta.items() if word not in engine.lookup or word in delta.removed_meta}
+    updated = {word for word in delta.meta if word not in new_rows}
+    rows = len(full_df['word'])
+    for column in {c for word in updated | set(new_rows) for c in delta.meta[word]} - full_df.keys(): # Columnas nuevas (vacías en el resto de filas)
+        full_df[column] = [None] * rows
+    for i, word in enumerate(full_df['word']):
+        if word in updated: # Todas las filas de la palabra
+            for column, value in delta.meta[word].items():
+                full_df[column][i] = value
+    for word, row in new_rows.items():
+        row = dict(row, word=word)
+        for column, values in full_df.items():
+            values.append(row.get(column))
+    lookup = dict(engine.lookup)
+    columns = list(next(iter(lookup.values()), {}))
+    for word in delta.removed_meta:
+        lookup.pop(word, None)
+    for word, row in delta.meta.items():
+        lookup[word] = {c: row[c] if c in row else lookup.get(word, {}).get(c) for c in columns}
+    return full_df, lookup
+
+def _patch_df(engine, full_df, drae, words):
+    """`df` rehaciendo sólo los grupos de homónimos (`simple_word`, ver `utils.leave_single_kind`) de `words`."""
+    from .engine import target_df
+    groups = {simple_word for table in (full_df, engine.full_df) for word, simple_word in zip(table['word'], table['simple_word']) if word in words}
+    rows = utils.table_rows(full_df, [i for i, simple_word in enumerate(full_df['simple_word']) if simple_word in groups])
+    keep = set(target_df(rows, {word for word in rows['word'] if word in drae}, engine.kind)['word'])
+    keep.update(word for word, simple_word in zip(engine.df['word'], engine.df['simple_word']) if simple_word not in groups)
+    return utils.table_rows(full_df, [i for i, word in enumerate(full_df['word']) if word in keep])
+
+def apply_delta(engine, ops):
+    """Aplica cambios al diccionario de un motor, actualizando sólo lo afectado: entradas, filas de datos, listas del índice inverso y palabras objetivo de las tablas.
+
+    El diccionario filtrado no se copia (ver `PatchedDict`). Sólo se recalculan las palabras objetivo (y sus pistas guardadas, ver `DictEngine.hint_buckets`) cuyas pistas o datos cambian; de `df` (palabras objetivo posibles) sólo se rehacen los grupos de homónimos de las palabras cambiadas.
+
+    Args
+    ----------
+    engine : DictEngine
+        Motor (no se modifica).
+    ops : iterable
+        Operaciones (ver arriba o `read_delta`).
+
+    Returns
+    -------
+    tuple
+        Motor nuevo y conjunto de palabras cuyas entradas o datos han cambiado (los puzles con ellas están desactualizados, ver `PuzzlePool.update`).
+    """
+    from .engine import DictEngine
+    delta = _Delta(engine)
+    for op in ops:
+        delta.apply(op)
+    drae, old = engine.drae, {}
+    for word in delta.entries:
+        old[word] = drae.get(word)
+    if isinstance(drae, PatchedDict):
+        drae = PatchedDict(drae.base, {**drae.changes, **delta.entries}, None, drae._order)
+    else:
+        drae = PatchedDict(drae, dict(delta.entries), None)
+    drae.index = _patch_index(drae, engine.index, old, delta.entries)
+    # Datos de las palabras
+    meta_words = set(delta.meta) | delta.removed_meta
+    full_df, lookup = (engine.full_df, engine.lookup) if not meta_words else _patch_meta(engine, delta)
+    membership = {word for word, entry in delta.entries.items() if (entry is None) != (old[word] is None)}
+    df = _patch_df(engine, full_df, drae, meta_words | membership) if meta_words or membership else engine.df
+    # Palabras objetivo afectadas: las de datos cambiados y las que aparecen en entradas cambiadas o de palabras con datos cambiados (su lista de pistas, el texto o la rareza de alguna pista cambia)
+    targets, changed_ids = set(meta_words), set()
+    for word in set(delta.entries) | meta_words:
+        for entry in (old.get(word, engine.drae.get(word)), drae.get(word)):
+            changed_ids.update(_first_aceps(entry))
+    words, commonness, def_freq = df['word'], df['commonness'], df['def_freq']
+    targets.update(word for word, word_id in zip(words, df['id']) if word_id in changed_ids)
+    if df is not engine.df: # Palabras que entran o salen de las posibles
+        targets.update(set(words) ^ set(engine.df['word']))
+    viable = {d: set(table) for d, table in engine.target_tables.items()}
+    changed = {d for d, table in viable.items() if not targets.isdisjoint(table) or df is not engine.df}
+    for d in viable:
+        viable[d] -= targets
+    for word, c, freq in zip(words, commonness, def_freq):
+        if word in targets:
+            for difficulty in utils.viable_difficulties(drae, word, c, freq, lookup, drae.index):
+                viable[difficulty].add(word)
+                changed.add(difficulty)
+    target_tables = {d: [word for word in words if word in viable[d]] if d in changed else table for d, table in engine.target_tables.items()} # En el orden de `df`, como `utils.build_target_tables`
+    buckets = {key: value for key, value in engine._buckets.items() if key[0] not in targets and key[0] in drae} # Sólo se pierden las pistas de las afectadas
+    new_engine = DictEngine(drae, df, full_df, drae.index, lookup, target_tables, engine.kind, engine.excl_group, buckets)
+    return new_engine, set(delta.entries) | meta_words
+
+class DeltaFeed:
+    """Sigue un archivo de cambios al que se añaden operaciones (una por línea) y devuelve las nuevas en cada consulta.
+
+    Args
+    ----------
+    file : str
+        Archivo de cambios (puede no existir todavía).
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """Operaciones añadidas desde la última consulta (sólo líneas completas).
+
+        Returns
+        -------
+        list
+            Operaciones.
+        """
+        with self._lock:
+            if not os.path.exists(self.file) or os.path.getsize(self.file) <= self._offset:
+                return []
+            with open(self.file, 'rb') as fp:
+                fp.seek(self._offset)
+                data = fp.read()
+            data = data[:data.rfind(b'\n') + 1] # La última línea puede estar a medias
+            ops = []
+            for line in data.decode('utf-8', errors='replace').splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    ops.append(json.loads(line))
+                except ValueError as e: # Una línea mal escrita no se lleva por delante las demás
+                    print(f'{self.file}: línea de cambios no válida, se ignora ({e}): {line[:200]!r}', file=sys.stderr)
+            self._offset += len(data) # Sólo cuando ya se han leído todas
+            return ops
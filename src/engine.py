@@ -0,0 +1,354 @@
+import os, threading
+from types import MappingProxyType
+from . import telemetry, utils
+
+def target_rows(df, words):
+    """Filas de las palabras objetivo posibles de todos los tipos a la vez (mismos criterios que `target_df`), para repartir `df` una sola vez entre los modos de juego.
+
+    Args
+    ----------
+    df : dict
+        Diccionario de columnas de palabras (ver `utils.df_to_dict`).
+    words : Container
+        Palabras del diccionario de la RAE filtrado.
+
+    Returns
+    -------
+    dict
+        `{tipo: posiciones de las filas en df}`, en orden.
+    """
+    res = {}
+    column_words, column_commonness, column_kinds = df['word'], df['commonness'], df['kinds']
+    # Quitar palabras que pueden tener varios tipos
+    for i in utils.single_kind_rows(df):
+        # Quitar palabras extremadamente comunes (son como comodines)
+        # if column_commonness[i] == 4: continue
+        # Quitar palabras extremadamente raras (son desconocidas) y restringir a las palabras del diccionario
+        if column_commonness[i] != 0 and column_words[i] in words:
+            res.setdefault(column_kinds[i], []).append(i)
+    return res
+
+def target_df(df, words, kind):
+    """Palabras objetivo posibles: de un solo tipo (`kind`), no extremadamente raras y con entrada en el diccionario filtrado.
+
+    Args
+    ----------
+    df : dict
+        Diccionario de columnas de palabras (ver `utils.df_to_dict`).
+    words : Container
+        Palabras del diccionario de la RAE filtrado.
+    kind : str
+        Tipo de las palabras objetivo.
+
+    Returns
+    -------
+    dict
+        Diccionario de columnas de palabras objetivo posibles.
+    """
+    return utils.table_rows(df, target_rows(df, words).get(kind, [])) # TODO: 'la' me ha salido como palabra (y 'pesar')
+
+def default_excl_group():
+    """Abreviaturas cuyas acepciones se excluyen por defecto: regionalismos, temas y desusadas."""
+    excl_group = dict()
+    excl_group.update(utils.ABR_REG) # Quitar regionalismos
+    excl_group.update(utils.ABR_TEMA) # Quitar temas
+    excl_group.update(utils.ABR_DESUS) # Quitar desusadas
+    return excl_group
+
+class _Views:
+    """Motores de cada tipo de palabras objetivo que comparten diccionario filtrado, índices y tablas (ver `DictEngine.view`)."""
+    __slots__ = ('engines', 'rows', 'lock')
+
+    def __init__(self, rows=None):
+        self.engines = {}
+        self.rows = rows # Reparto de `full_df` por tipo (ver `target_rows`), calculado una sola vez
+        self.lock = threading.Lock()
+
+class DictEngine:
+    """Diccionario filtrado, tablas de palabras e índices del juego, de sólo lectura.
+
+    Se crea una vez por proceso y se puede compartir entre sesiones e hilos (p. ej. con `st.cache_resource`), ya que nada lo modifica. Las funciones de `utils` lo aceptan en lugar de `drae` o `df`. Las tablas son diccionarios de columnas (ver `utils.df_to_dict`), así que cargarlo y jugar no necesita pandas.
+
+    Attributes
+    ----------
+    drae : Mapping
+        Diccionario de la RAE filtrado (ver `DictEngine.build`).
+    df : dict
+        Diccionario de columnas de palabras objetivo posibles.
+    full_df : dict
+        Diccionario de columnas de todas las palabras.
+    index : Mapping
+        Índice inverso de `drae` (ver `utils.build_id_index`).
+    lookup : Mapping
+        Tabla de búsqueda de todas las palabras (ver `utils.build_word_lookup`).
+    target_tables : Mapping
+        Palabras objetivo viables de cada dificultad (ver `utils.build_target_tables`).
+    kind : str
+        Tipo de las palabras objetivo.
+    excl_group : Mapping
+        Abreviaturas cuyas acepciones se han excluído (también de las que llegan con `apply`).
+
+    Otros tipos de palabras objetivo (modos de juego) se sirven con `view`, sin volver a filtrar ni copiar el diccionario.
+    """
+    __slots__ = ('drae', 'df', 'full_df', 'index', 'lookup', 'target_tables', 'kind', 'excl_group', '_buckets', '_views')
+
+    def __init__(self, drae, df, full_df, index, lookup, target_tables, kind, excl_group=None, buckets=None, views=None):
+        object.__setattr__(self, '_buckets', dict(buckets or {})) # Caché de `hint_buckets` (lo único que cambia: sólo se añaden entradas)
+        object.__setattr__(self, '_views', views or _Views())
+        self._views.engines.setdefault(kind, self)
+        for name, value in (('drae', drae), ('df', df), ('full_df', full_df), ('index', index), ('lookup', lookup),
+                            ('target_tables', MappingProxyType({d: tuple(t) for d, t in target_tables.items()})), ('kind', kind), ('excl_group', dict(excl_group or {}))):
+            object.__setattr__(self, name, MappingProxyType(value) if isinstance(value, dict) else value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('DictEngine es de sólo lectura')
+
+    def __delattr__(self, name):
+        raise AttributeError('DictEngine es de sólo lectura')
+
+    @classmethod
+    def build(cls, drae, df, kind='sust', excl_group=None):
+        """Aplica los filtros del juego y precalcula los índices.
+
+        Args
+        ----------
+        drae : dict or CompactDict
+            Diccionario de la RAE (no se modifica). Si es compacto, el diccionario filtrado y su índice también lo son.
+        df : pd.DataFrame or dict
+            DataFrame de palabras (o diccionario de columnas). Se guarda como diccionario de columnas.
+        kind : str
+            Tipo de las palabras objetivo: `'sust'`, `'verb'`, `'adj'`, `'adv'`, `'prep'`, `'art'`, `'pron'`, `'interj'`, `'conj'`, `'onomat'`, `'elem'` o `'expr'`.
+        excl_group : None or dict
+            Abreviaturas cuyas acepciones se excluyen. Por defecto regionalismos, temas y desusadas.
+
+        Returns
+        -------
+        DictEngine
+            Motor con el diccionario filtrado.
+        """
+        # Quitar regionalismos y otras acepciones
+        if excl_group is None:
+            excl_group = default_excl_group()
+        my_drae = utils.exclude_group(drae, excl_group, rebuild=True) # `drae` no se modifica
+        df = utils.df_to_dict(df)
+        rows = target_rows(df, my_drae.keys()) # Todos los tipos a la vez (ver `view`)
+        my_df = utils.table_rows(df, rows.get(kind, []))
+        index = my_drae.index if isinstance(my_drae, utils.CompactDict) else utils.build_id_index(my_drae) # El compacto ya trae el índice
+        lookup = utils.build_word_lookup(df)
+        target_tables = utils.build_target_tables(my_drae, my_df, lookup, index)
+        return cls(my_drae, my_df, df, index, lookup, target_tables, kind, excl_group, views=_Views(rows))
+
+    @classmethod
+    def load(cls, json_file='data/diccionario.json', csv_file='data/diccionario_df.csv', compact_file='data/diccionario.bin', kind='sust', compact=True, snapshot_dir='data/cache'):
+        """Carga el diccionario (en formato compacto si existe `compact_file`) y crea el motor.
+
+        Si hay una instantánea del motor para estos archivos y esta configuración (ver `snapshot`), se carga directamente sin volver a filtrar. Si no, se crea el motor y se guarda la instantánea.
+
+        Args
+        ----------
+        json_file : str
+            Diccionario de la RAE en json.
+        csv_file : str
+            DataFrame de palabras en csv.
+        compact_file : None or str
+            Diccionario y DataFrame en formato compacto (ver `utils.write_compact`).
+        kind : str
+            Tipo de las palabras objetivo.
+        compact : bool
+            Si es `True`, el diccionario json se pasa a formato compacto en memoria (ver `utils.compact_dict`), que ocupa varias veces menos.
+        snapshot_dir : None or str
+            Carpeta de las instantáneas (`None` para no usarlas). El motor de una instantánea siempre es compacto.
+
+        Returns
+        -------
+        DictEngine
+            Motor con el diccionario filtrado.
+        """
+        from . import snapshot
+        use_compact = bool(compact_file and os.path.exists(compact_file))
+        snapshot_file = None
+        if snapshot_dir:
+            snapshot_file = snapshot.snapshot_file(snapshot_dir, [compact_file] if use_compact else [json_file, csv_file], kind, default_excl_group())
+            if os.path.exists(snapshot_file):
+                try:
+                    return snapshot.read_snapshot(snapshot_file)
+                except Exception: # Instantánea dañada o de otra versión del formato: se rehace
+                    pass
+        if use_compact:
+            drae = utils.load_compact(compact_file)
+            df = drae.table.columns()
+        else:
+            drae = utils.load_dict(json_file)
+            df = utils.read_table(csv_file)
+            if compact:
+                drae = utils.compact_dict(drae, df)
+        engine = cls.build(drae, df, kind=kind)
+        if snapshot_file:
+            try:
+                snapshot.write_snapshot(engine, snapshot_file)
+            except OSError: # Sin permiso de escritura, etc.: se sigue sin instantánea
+                pass
+        return engine
+
+    def apply(self, ops):
+        """Aplica cambios al diccionario sin reconstruirlo (ver `delta.apply_delta`).
+
+        Args
+        ----------
+        ops : iterable
+            Operaciones (ver `delta`).
+
+        Returns
+        -------
+        tuple
+            Motor nuevo (este no cambia) y conjunto de palabras cuyas entradas o datos han cambiado.
+        """
+        from .delta import apply_delta
+        return apply_delta(self, ops)
+
+    def view(self, kind):
+        """Motor de otro tipo de palabras objetivo (otro modo de juego) que comparte con este el diccionario filtrado, los índices y las tablas de palabras.
+
+        Sólo se calculan (la primera vez que se pide cada tipo) sus palabras objetivo posibles y sus tablas de palabras objetivo. Cada vista tiene su propia caché de `hint_buckets`. Los cambios (`apply`) se aplican a cada vista por separado.
+
+        Args
+        ----------
+        kind : str
+            Tipo de las palabras objetivo (ver `build`).
+
+        Returns
+        -------
+        DictEngine
+            Motor del tipo `kind` (este mismo si ya es de ese tipo).
+        """
+        views = self._views
+        with views.lock:
+            engine = views.engines.get(kind)
+            if engine is None:
+                if views.rows is None: # Motor cargado de una instantánea: se reparte ahora
+                    views.rows = target_rows(self.full_df, self.drae)
+                df = utils.table_rows(self.full_df, views.rows.get(kind, []))
+                target_tables = utils.build_target_tables(self.drae, df, self.lookup, self.index)
+                engine = DictEngine(self.drae, df, self.full_df, self.index, self.lookup, target_tables, kind, self.excl_group, views=views)
+        return engine
+
+    def hint_buckets(self, word, difficulty, avoid_common=True):
+        """Pistas posibles de `word` por rareza para una dificultad (ver `utils.bucket_solutions`). Se calculan la primera vez y se guardan.
+
+        Args
+        ----------
+        word : str
+            Palabra objetivo.
+        difficulty : str
+            Dificultad (de la que se usa `utils.ACEP_LIMIT`).
+        avoid_common : bool
+            Como en `utils.pick_solutions`.
+
+        Returns
+        -------
+        dict
+            Diccionario donde las `keys` son las rarezas y los `values` tuplas de soluciones `(palabra, acepción, rareza)`.
+        """
+        key = (word, utils.ACEP_LIMIT[difficulty], avoid_common)
+        buckets = self._buckets.get(key)
+        telemetry.cache('hint_buckets', hits=int(buckets is not None), misses=int(buckets is None))
+        if buckets is None:
+            with telemetry.stage('words_with_word'):
+                solutions = utils.words_with_word(self, word) # Busco dentro del diccionario restringido
+            with telemetry.stage('add_commonness'):
+                solutions = utils.limit_defs(solutions, limit_acep=utils.ACEP_LIMIT[difficulty]) # Limita el número de acepciones que la palabra objetivo tiene (cuantas menos acepciones menos lioso)
+                solutions = utils.add_commonness(solutions, self) # Las rarezas salen de `lookup`, que incluye todas las palabras
+            with telemetry.stage('bucket_solutions'):
+                buckets = self._buckets[key] = utils.bucket_solutions(solutions, word, avoid_common=avoid_common)
+        return buckets
+
+    def cache_clear(self):
+        """Vacía la caché de `hint_buckets`."""
+        self._buckets.clear()
+
+    def rerolls(self, puzzle, avoid_common=True, rng=None):
+        """Genera puzles con la misma palabra y dificultad que `puzzle` pero otras pistas (distintas cada vez, hasta agotarlas).
+
+        Args
+        ----------
+        puzzle : dict
+            Puzle (ver `new_puzzle`).
+        avoid_common : bool
+            Como en `utils.pick_solutions`.
+        rng : None or random.Random
+            Generador aleatorio (por defecto el del módulo `random`).
+
+        Returns
+        -------
+        generator
+            Puzles (sin `alternatives`).
+        """
+        hints = utils.HINT_TYPES[puzzle['difficulty']]
+        current = frozenset(map(tuple, puzzle['solutions']))
+        for solutions in utils.iter_hint_sets(self.hint_buckets(puzzle['word'], puzzle['difficulty'], avoid_common), hints, rng=rng):
+            if frozenset(solutions) != current:
+                yield {'difficulty': puzzle['difficulty'], 'word': puzzle['word'], 'show_word': puzzle['show_word'], 'solutions': solutions,
+                       'masked_defs': [utils.modify_def(puzzle['show_word'], acep) for _, acep, _ in solutions]}
+
+    def new_puzzle(self, difficulty, avoid_common=True, rng=None, checker=None, reject_ambiguous=False, max_ambiguous=100):
+        """Genera un puzle (palabra objetivo, pistas y definiciones ocultando la palabra) de la dificultad dada.
+
+        Si la medición está activada (ver `telemetry`), guarda el tiempo de cada etapa, los reintentos, el número de pistas posibles y los aciertos de las cachés de `hint_buckets` y `utils.modify_def`.
+
+        Args
+        ----------
+        difficulty : str
+            Dificultad (ver `utils.HINT_TYPES`).
+        avoid_common : bool
+            Como en `utils.pick_solutions`.
+        rng : None or random.Random
+            Generador aleatorio (por defecto el del módulo `random`). Con uno inicializado con una semilla el puzle es reproducible.
+        checker : None or AmbiguityChecker
+            Si se da, el puzle incluye `alternatives`: otras respuestas válidas (ver `validate.AmbiguityChecker`).
+        reject_ambiguous : bool
+            Si es `True` (y hay `checker`), los puzles ambiguos se descartan y se genera otro.
+        max_ambiguous : int
+            Número máximo de puzles ambiguos descartados antes de dar error.
+
+        Returns
+        -------
+        dict
+            Puzle: `difficulty`, `word` (forma diccionario), `show_word`, `solutions` (tripletas `(palabra, acepción, rareza)`) y `masked_defs` (acepciones de `solutions` con `show_word` oculta).
+        """
+        with telemetry.track('puzzle', difficulty=difficulty):
+            return self._new_puzzle(difficulty, avoid_common, rng, checker, reject_ambiguous, max_ambiguous)
+
+    def _new_puzzle(self, difficulty, avoid_common, rng, checker, reject_ambiguous, max_ambiguous):
+        hints = utils.HINT_TYPES[difficulty]
+        if not self.target_tables[difficulty]:
+            raise Exception(f'No hay palabras objetivo viables para la dificultad {difficulty} ({self.kind})')
+        for _ in range(max_ambiguous + 1):
+            solutions = False
+            while not solutions: # Mientras no haya soluciones para las pistas requeridas sigue buscando (con `target_tables` basta una vuelta)
+                with telemetry.stage('get_random_word'):
+                    word = utils.get_random_word(self, commonness=utils.TARGET_COMMONNESS[difficulty], appear_lim=len(hints), targets=self.target_tables[difficulty], rng=rng)
+                with telemetry.stage('hint_buckets'):
+                    buckets = self.hint_buckets(word, difficulty, avoid_common=avoid_common)
+                telemetry.size('hint_buckets', sum(len(b) for b in buckets.values()))
+                with telemetry.stage('pick_solutions'):
+                    solutions = utils.draw_hints(buckets, hints, rng=rng) # Comprueba (por los tamaños) que se puedan dar todas las pistas previstas y las saca
+                if not solutions:
+                    telemetry.retry()
+            puzzle = {'difficulty': difficulty, 'word': word, 'show_word': self.lookup[word]['simple_word'], 'solutions': solutions}
+            if checker is None:
+                break
+            with telemetry.stage('alternatives'):
+                puzzle['alternatives'] = checker.alternatives(puzzle)
+            if not (reject_ambiguous and puzzle['alternatives']):
+                break
+            telemetry.retry()
+        else:
+            raise Exception(f'No se ha encontrado un puzle sin ambigüedad ({difficulty})')
+        before = utils.modify_def.cache_info().hits if telemetry.enabled() else 0
+        with telemetry.stage('modify_def'):
+            puzzle['masked_defs'] = [utils.modify_def(puzzle['show_word'], acep) for _, acep, _ in solutions]
+        if telemetry.enabled():
+            hits = utils.modify_def.cache_info().hits - before # Aproximado si otros hilos enmascaran a la vez
+            telemetry.cache('modify_def', hits=hits, misses=len(solutions) - hits)
+        telemetry.annotate(word=word)
+        return puzzle
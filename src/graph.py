@@ -0,0 +1,265 @@
+import numpy as np
+from . import utils
+
+class DefGraph:
+    """Grafo de definiciones en formato disperso (CSR/CSC).
+
+    Hay una arista `Y -> X` si la palabra `X` aparece en la definición de la palabra `Y`, con la acepción (ordinal) de `Y` como atributo. Como en `utils.words_with_word`, para cada par sólo se guarda la primera acepción de `Y` que contiene `X`. Las palabras se identifican con enteros (su posición en `words`).
+
+    Attributes
+    ----------
+    words : list
+        Palabras (nodos), en el orden del diccionario.
+    word_index : dict
+        Posición de cada palabra.
+    indptr, indices, aceps : np.ndarray
+        CSR (por filas `Y`): palabras usadas en la definición de `Y` y acepción en la que aparecen.
+    t_indptr, t_indices, t_aceps : np.ndarray
+        CSC (por filas `X`): palabras en cuya definición aparece `X` y acepción.
+    commonness : None or np.ndarray
+        Rareza de cada palabra (ver `set_commonness`), `-1` si no se conoce.
+    """
+
+    def __init__(self, words, indptr, indices, aceps):
+        self.words = list(words)
+        self.word_index = {w: i for i, w in enumerate(self.words)}
+        self.indptr, self.indices, self.aceps = indptr, indices, aceps
+        rows = np.repeat(np.arange(len(self.words), dtype=np.int32), np.diff(indptr)) # Fila de cada arista
+        order = np.argsort(indices, kind='stable') # Transpuesta, manteniendo el orden del diccionario dentro de cada fila
+        self.t_indptr = np.concatenate(([0], np.cumsum(np.bincount(indices, minlength=len(self.words))))).astype(np.int64)
+        self.t_indices = rows[order]
+        self.t_aceps = aceps[order]
+        self.commonness = None
+
+    @classmethod
+    def from_drae(cls, drae):
+        """Crea el grafo de un diccionario.
+
+        Args
+        ----------
+        drae : dict
+            Diccionario de la RAE. Los `rel_ids` que no son de ninguna palabra del diccionario se ignoran.
+
+        Returns
+        -------
+        DefGraph
+            Grafo de definiciones.
+        """
+        words = list(drae)
+        entries = [drae[word] for word in words]
+        id_index = {entry['id']: i for i, entry in enumerate(entries)}
+        indptr, indices, aceps = [0], [], []
+        for entry in entries:
+            seen = set()
+            for definition, rel_ids in zip(entry['defs'], entry['rel_ids']):
+                num = None
+                for rel_id in rel_ids:
+                    x = id_index.get(rel_id)
+                    if x is not None and x not in seen: # Sólo la primera acepción que contiene `X`
+                        seen.add(x)
+                        indices.append(x)
+                        num = utils.get_acep_num(definition) if num is None else num
+                        aceps.append(num)
+            indptr.append(len(indices))
+        return cls(words, np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int32), np.array(aceps, dtype=np.int16))
+
+    def __len__(self):
+        return len(self.words)
+
+    @property
+    def num_edges(self):
+        """Número de aristas."""
+        return len(self.indices)
+
+    def set_commonness(self, lookup):
+        """Asocia la rareza de cada palabra.
+
+        Args
+        ----------
+        lookup : dict
+            Tabla de búsqueda (ver `utils.build_word_lookup`) o `{palabra: rareza}`.
+
+        Returns
+        -------
+        DefGraph
+            El propio grafo.
+        """
+        values = (lookup.get(w, -1) for w in self.words)
+        self.commonness = np.fromiter((v['commonness'] if isinstance(v, dict) else v for v in values), dtype=np.int8, count=len(self.words))
+        return self
+
+    def in_degree(self):
+        """Número de palabras en cuya definición aparece cada palabra (`def_freq`).
+
+        Returns
+        -------
+        np.ndarray
+            Grado de entrada de cada palabra (en el orden de `words`).
+        """
+        return np.diff(self.t_indptr)
+
+    def out_degree(self):
+        """Número de palabras distintas usadas en la definición de cada palabra.
+
+        Returns
+        -------
+        np.ndarray
+            Grado de salida de cada palabra.
+        """
+        return np.diff(self.indptr)
+
+    def def_freq(self):
+        """`def_freq` de todas las palabras.
+
+        Returns
+        -------
+        dict
+            `{palabra: def_freq}`.
+        """
+        return dict(zip(self.words, self.in_degree().tolist()))
+
+    def def_perc(self):
+        """Percentil de `def_freq` de todas las palabras (porcentaje de palabras con `def_freq` menor o igual).
+
+        Returns
+        -------
+        dict
+            `{palabra: def_perc}`.
+        """
+        degree = self.in_degree()
+        perc = np.searchsorted(np.sort(degree), degree, side='right') / max(len(degree), 1) * 100
+        return dict(zip(self.words, perc.tolist()))
+
+    def _edge_mask(self, aceps, neighbors, acep_limit=None, commonness=None):
+        mask = np.ones(len(aceps), dtype=bool)
+        if acep_limit:
+            mask &= aceps <= acep_limit
+        if commonness is not None:
+            if self.commonness is None:
+                raise Exception('Falta asociar la rareza (`set_commonness`)')
+            mask &= np.isin(self.commonness[neighbors], np.atleast_1d(commonness))
+        return mask
+
+    def neighbors(self, word, acep_limit=None, commonness=None):
+        """Palabras en cuya definición aparece `word` (como `utils.words_with_word` + `utils.limit_defs`).
+
+        Args
+        ----------
+        word : str
+            Palabra objetivo.
+        acep_limit : None or int
+            Límite del ordinal de las acepciones.
+        commonness : None, int or list
+            Rareza (o rarezas) de las palabras a devolver.
+
+        Returns
+        -------
+        list of tuple
+            Lista de tuplas `(palabra, acepción)` (ordinal de la acepción).
+        """
+        x = self.word_index[word]
+        start, end = self.t_indptr[x], self.t_indptr[x + 1]
+        neighbors, aceps = self.t_indices[start:end], self.t_aceps[start:end]
+        mask = self._edge_mask(aceps, neighbors, acep_limit, commonness)
+        return [(self.words[y], a) for y, a in zip(neighbors[mask].tolist(), aceps[mask].tolist())]
+
+    def hint_counts(self, acep_limit=None, levels=5):
+        """Número de palabras de cada rareza en cuya definición aparece cada palabra (para calibrar dificultades en bloque).
+
+        Args
+        ----------
+        acep_limit : None or int
+            Límite del ordinal de las acepciones.
+        levels : int
+            Número de niveles de rareza (`0` a `levels - 1`).
+
+        Returns
+        -------
+        np.ndarray
+            Matriz `(palabras, levels)`. Las palabras sin rareza conocida no se cuentan.
+        """
+        if self.commonness is None:
+            raise Exception('Falta asociar la rareza (`set_commonness`)')
+        rows = np.repeat(np.arange(len(self.words)), np.diff(self.t_indptr))
+        c = self.commonness[self.t_indices].astype(np.int64)
+        mask = self._edge_mask(self.t_aceps, self.t_indices, acep_limit) & (c >= 0) & (c < levels)
+        return np.bincount(rows[mask] * levels + c[mask], minlength=len(self.words) * levels).reshape(len(self.words), levels)
+
+    def filter_commonness(self, commonness):
+        """Palabras con la rareza dada.
+
+        Args
+        ----------
+        commonness : int or list
+            Rareza (o rarezas).
+
+        Returns
+        -------
+        list
+            Palabras con esa rareza.
+        """
+        if self.commonness is None:
+            raise Exception('Falta asociar la rareza (`set_commonness`)')
+        return [self.words[i] for i in np.flatnonzero(np.isin(self.commonness, np.atleast_1d(commonness))).tolist()]
+
+    def candidate_mask(self, words):
+        """Máscara de las palabras dadas (ver `common_words`).
+
+        Args
+        ----------
+        words : iterable
+            Palabras.
+
+        Returns
+        -------
+        np.ndarray
+            Array booleano con `True` en la posición de cada palabra del grafo que está en `words`.
+        """
+        mask = np.zeros(len(self.words), dtype=bool)
+        mask[[self.word_index[w] for w in words if w in self.word_index]] = True
+        return mask
+
+    def common_words(self, words, k=None, acep_limit=None, candidates=None):
+        """Palabras que aparecen en la definición de todas las palabras dadas, o de al menos `k` de ellas ("denominador común").
+
+        Se cuentan las apariciones fusionando las listas (ordenadas) de palabras usadas en la definición de cada una.
+
+        Args
+        ----------
+        words : list
+            Palabras cuyas definiciones se intersecan.
+        k : None or int
+            Número mínimo de definiciones en las que debe aparecer. Por defecto todas.
+        acep_limit : None or int
+            Límite del ordinal de las acepciones de `words` que se tienen en cuenta.
+        candidates : None, iterable or np.ndarray
+            Si se da, sólo se devuelven estas palabras (p. ej. las palabras objetivo posibles). Para consultas repetidas conviene pasar la máscara de `candidate_mask`.
+
+        Returns
+        -------
+        list of tuple
+            Lista de tuplas `(palabra, apariciones, rareza, suma de ordinales de las acepciones)`, ordenada por apariciones y rareza (de más a menos) y por ordinales (de menos a más). La rareza es `-1` si no se ha asociado (`set_commonness`).
+        """
+        k = len(words) if k is None else k
+        cols, aceps = [], []
+        for word in set(words):
+            y = self.word_index[word]
+            start, end = self.indptr[y], self.indptr[y + 1]
+            mask = self._edge_mask(self.aceps[start:end], None, acep_limit)
+            cols.append(self.indices[start:end][mask])
+            aceps.append(self.aceps[start:end][mask])
+        if not cols:
+            return []
+        cols, aceps = np.concatenate(cols), np.concatenate(aceps).astype(np.int64)
+        order = np.argsort(cols, kind='stable')
+        cols, aceps = cols[order], aceps[order]
+        found, starts, counts = np.unique(cols, return_index=True, return_counts=True)
+        acep_sums = np.add.reduceat(aceps, starts) if len(cols) else aceps
+        mask = counts >= k
+        if candidates is not None:
+            allowed = candidates if isinstance(candidates, np.ndarray) else self.candidate_mask(candidates)
+            mask &= allowed[found]
+        found, counts, acep_sums = found[mask], counts[mask], acep_sums[mask]
+        commonness = self.commonness[found] if self.commonness is not None else np.full(len(found), -1)
+        rank = np.lexsort((acep_sums, -commonness.astype(np.int64), -counts)) # La última clave es la principal
+        return [(self.words[x], c, r, a) for x, c, r, a in zip(found[rank].tolist(), counts[rank].tolist(), commonness[rank].tolist(), acep_sums[rank].tolist())]
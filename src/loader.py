@@ -0,0 +1,202 @@
+import json, os, re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from . import utils
+from .compact import _intern, _np_array, _segments, _string_section, finish_sections, from_sections
+
+# Carga de diccionarios repartidos en varios archivos json (p. ej. el diccionario y suplementos regionales).
+# Cada archivo se lee por partes en un proceso, filtrando las acepciones al vuelo, y llega al proceso principal ya en forma compacta (ver `compact`).
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+def iter_entries(file, chunk_size=1 << 20):
+    """Recorre las entradas de un diccionario json sin cargarlo entero.
+
+    Args
+    ----------
+    file : str
+        Archivo json con un objeto `{palabra: entrada}`.
+    chunk_size : int
+        Caracteres leídos cada vez.
+
+    Returns
+    -------
+    generator
+        Tuplas `(palabra, entrada)`, en el orden del archivo.
+    """
+    decoder = json.JSONDecoder()
+    with open(file, 'r', encoding='utf-8') as fp:
+        buf, eof = '', False
+        pos = None # Posición tras la `{` inicial
+        while True:
+            try:
+                if pos is None:
+                    start = _WHITESPACE.match(buf).end()
+                    if start == len(buf):
+                        raise IndexError
+                    if buf[start] != '{':
+                        raise Exception(f'{file} no contiene un objeto json')
+                    pos = start + 1
+                p = _WHITESPACE.match(buf, pos).end()
+                if buf[p] == '}':
+                    return
+                if buf[p] == ',':
+                    p = _WHITESPACE.match(buf, p + 1).end()
+                word, p = decoder.raw_decode(buf, p)
+                p = _WHITESPACE.match(buf, p).end()
+                if buf[p] != ':':
+                    raise Exception(f'{file}: falta `:` tras {word!r}')
+                entry, p = decoder.raw_decode(buf, _WHITESPACE.match(buf, p + 1).end())
+            except (IndexError, json.JSONDecodeError): # Entrada incompleta: leer más
+                if eof:
+                    raise Exception(f'{file} está incompleto o mal formado')
+                chunk = fp.read(chunk_size)
+                eof = not chunk
+                if pos is None:
+                    buf += chunk
+                else:
+                    buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield word, entry
+            pos = p
+
+def _keep_acepciones(entry, pattern=None, kinds=None):
+    """Posiciones de las acepciones que pasan los filtros (como `utils.exclude_group` y tipos según `utils.get_kinds`)."""
+    keep = []
+    for i, definition in enumerate(entry['defs']):
+        if pattern is not None and pattern.search(definition):
+            continue
+        if kinds is not None:
+            parts = definition.split('. ')
+            if len(parts) < 2 or utils.ABREV_KINDS.get(parts[1] + '.') not in kinds:
+                continue
+        keep.append(i)
+    return keep
+
+def encode_shard(file, group=None, kinds=None, chunk_size=1 << 20):
+    """Lee y filtra un archivo, guardando sus entradas en arrays (con tablas de cadenas propias del archivo).
+
+    Args
+    ----------
+    file : str
+        Archivo json.
+    group : None or list
+        Abreviaturas cuyas acepciones se excluyen (como en `utils.exclude_group`).
+    kinds : None or list
+        Tipos (ver `utils.ABREV`) de las acepciones que se conservan. Por defecto todos.
+    chunk_size : int
+        Caracteres leídos cada vez (ver `iter_entries`).
+
+    Returns
+    -------
+    dict
+        Palabras (`words`, incluídas las que se quitan, marcadas en `dropped`), tablas de `ids` y `abrevs`, y secciones de las acepciones (`word_id`, `acep_*` y `def_*`, ver `compact.build_sections`) con posiciones en esas tablas.
+    """
+    pattern = utils.compile_group(group) if group else None
+    kinds = set(kinds) if kinds is not None else None
+    words, ids, id_table, abrevs, abrev_table, defs = [], [], {}, [], {}, []
+    word_id, acep_off, acep_abrev_off, acep_rel_off = array('I'), array('I', [0]), array('I', [0]), array('I', [0])
+    acep_abrev, acep_rel, dropped = array('I'), array('I'), array('B')
+    for word, entry in iter_entries(file, chunk_size):
+        keep = _keep_acepciones(entry, pattern, kinds)
+        words.append(word)
+        dropped.append(not keep) # Si la palabra se queda sin acepciones se quita (pero cuenta al unir archivos)
+        word_id.extend(_intern((entry['id'],), id_table, ids))
+        for i in keep:
+            defs.append(entry['defs'][i])
+            acep_abrev.extend(_intern(entry['abrev'][i], abrev_table, abrevs))
+            acep_abrev_off.append(len(acep_abrev))
+            acep_rel.extend(_intern(entry['rel_ids'][i], id_table, ids))
+            acep_rel_off.append(len(acep_rel))
+        acep_off.append(len(defs))
+    def_str, def_off = _string_section(defs)
+    return {'words': words, 'dropped': dropped, 'ids': ids, 'abrevs': abrevs, 'word_id': word_id, 'acep_off': acep_off, 'acep_abrev_off': acep_abrev_off, 'acep_abrev': acep_abrev,
+            'acep_rel_off': acep_rel_off, 'acep_rel': acep_rel, 'def_str': def_str, 'def_off': def_off}
+
+def _encode_shard(args):
+    return encode_shard(*args)
+
+def merge_shards(shards, df=None):
+    """Une archivos leídos con `encode_shard` en un diccionario compacto. Si una palabra está en varios, se queda la del último (como `utils.load_dicts`).
+
+    Args
+    ----------
+    shards : iterable
+        Resultados de `encode_shard`, en orden.
+    df : None, pd.DataFrame or dict
+        DataFrame de palabras (o diccionario de columnas) que se guarda como tabla.
+
+    Returns
+    -------
+    CompactDict
+        Diccionario de la RAE (en memoria).
+    """
+    shards = list(shards)
+    chosen = {} # {palabra: (archivo, posición)}
+    for s, shard in enumerate(shards):
+        for w, word in enumerate(shard['words']):
+            chosen[word] = (s, w) # Mantiene la posición de la primera aparición, como `dict.update`
+    chosen = {word: (s, w) for word, (s, w) in chosen.items() if not shards[s]['dropped'][w]} # Filtrar después de unir, como `utils.exclude_group` sobre `utils.load_dicts`
+    import numpy as np
+    ids, id_table, abrevs, abrev_table = [], {}, [], {}
+    id_maps = [np.asarray(_intern(shard['ids'], id_table, ids), dtype=np.int64) for shard in shards] # Posiciones de cada archivo -> posiciones globales
+    abrev_maps = [np.asarray(_intern(shard['abrevs'], abrev_table, abrevs), dtype=np.int64) for shard in shards]
+    # Todos los archivos seguidos, con posiciones globales
+    bases = np.cumsum([0] + [len(shard['words']) for shard in shards])
+    joined = {'word_id': np.concatenate([m[np.asarray(shard['word_id'], dtype=np.int64)] for m, shard in zip(id_maps, shards)]),
+              'acep_rel': np.concatenate([m[np.asarray(shard['acep_rel'], dtype=np.int64)] for m, shard in zip(id_maps, shards)]),
+              'acep_abrev': np.concatenate([m[np.asarray(shard['acep_abrev'], dtype=np.int64)] for m, shard in zip(abrev_maps, shards)]),
+              'def_str': memoryview(b''.join(shard['def_str'] for shard in shards))}
+    for name in ('acep_off', 'acep_rel_off', 'acep_abrev_off', 'def_off'):
+        offsets, base = [], 0
+        for shard in shards:
+            off = np.asarray(shard[name], dtype=np.int64)
+            offsets.append(off[:-1] + base)
+            base += off[-1]
+        joined[name] = np.concatenate(offsets + [[base]])
+    # Quedarse con las palabras elegidas
+    words = list(chosen)
+    selected = np.fromiter((bases[s] + w for s, w in chosen.values()), dtype=np.int64, count=len(words))
+    aceps, acep_off = _segments(joined['acep_off'], selected)
+    rels, acep_rel_off = _segments(joined['acep_rel_off'], aceps)
+    abrev, acep_abrev_off = _segments(joined['acep_abrev_off'], aceps)
+    def_off = joined['def_off'][aceps]
+    def_off = np.concatenate(([0], np.cumsum(joined['def_off'][aceps + 1] - def_off)))
+    starts, ends = joined['def_off'][joined['acep_off'][selected]], joined['def_off'][joined['acep_off'][selected + 1]] # Las definiciones de cada palabra están seguidas
+    def_str = b''.join(joined['def_str'][start:end] for start, end in zip(starts.tolist(), ends.tolist()))
+    sections = {'word_id': _np_array(joined['word_id'][selected]), 'acep_off': _np_array(acep_off),
+                'acep_abrev_off': _np_array(acep_abrev_off), 'acep_abrev': _np_array(joined['acep_abrev'][abrev]),
+                'acep_rel_off': _np_array(acep_rel_off), 'acep_rel': _np_array(joined['acep_rel'][rels]),
+                'def_str': def_str, 'def_off': _np_array(def_off, 'Q')}
+    return from_sections(finish_sections(sections, words, ids, id_table, abrevs, df))
+
+def load_shards(files, df=None, group=None, kinds=None, processes=None, chunk_size=1 << 20):
+    """Carga y une varios archivos json (en paralelo) en un diccionario compacto, filtrando acepciones durante la lectura.
+
+    Las acepciones excluídas nunca llegan a crearse en el proceso principal, y cada proceso sólo tiene en memoria un trozo de su archivo y sus arrays.
+
+    Args
+    ----------
+    files : list
+        Archivos json (ver `utils.load_dicts`).
+    df : None, pd.DataFrame or dict
+        DataFrame de palabras (o diccionario de columnas) que se guarda como tabla (`.table`).
+    group : None or list
+        Abreviaturas cuyas acepciones se excluyen (como en `utils.exclude_group`).
+    kinds : None or list
+        Tipos de las acepciones que se conservan (p. ej. `['sust', 'verb']`). Por defecto todos.
+    processes : None or int
+        Número de procesos. Con `0` se lee todo en el proceso principal. Por defecto uno por archivo (sin pasar del número de núcleos).
+    chunk_size : int
+        Caracteres leídos cada vez (ver `iter_entries`).
+
+    Returns
+    -------
+    CompactDict
+        Diccionario de la RAE (en memoria, con la tabla de palabras en `.table` y el índice inverso en `.index`).
+    """
+    tasks = [(file, tuple(group) if group else None, tuple(kinds) if kinds is not None else None, chunk_size) for file in files]
+    if processes == 0 or len(tasks) == 1:
+        return merge_shards(map(_encode_shard, tasks), df)
+    with ProcessPoolExecutor(min(processes or os.cpu_count(), len(tasks))) as executor:
+        return merge_shards(executor.map(_encode_shard, tasks), df)
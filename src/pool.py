@@ -0,0 +1,293 @@
+import collections, sys, threading, time
+from concurrent.futures import ProcessPoolExecutor
+from . import telemetry
+from .validate import AmbiguityChecker
+
+_worker_engine = None # Motor de cada proceso del `ProcessPoolExecutor`
+_worker_checker = None # Y su comprobador de ambigüedad (si se pide)
+
+def _init_worker(load_kwargs, check=False):
+    """Carga el motor (y, si `check`, crea su comprobador de ambigüedad) una vez por proceso."""
+    global _worker_engine, _worker_checker
+    from .engine import DictEngine
+    _worker_engine = DictEngine.load(**load_kwargs)
+    _worker_checker = AmbiguityChecker.from_engine(_worker_engine) if check else None
+
+def _worker_puzzle(difficulty, reject_ambiguous=False):
+    return _worker_engine.new_puzzle(difficulty, checker=_worker_checker, reject_ambiguous=reject_ambiguous)
+
+def _worker_difficulties():
+    return available_difficulties(_worker_engine)
+
+def available_difficulties(engine):
+    """Dificultades de `engine` con alguna palabra objetivo (en el resto `new_puzzle` siempre falla)."""
+    return [d for d, table in engine.target_tables.items() if table]
+
+class PuzzlePool:
+    """Genera puzles en segundo plano y los guarda en una cola acotada por dificultad.
+
+    Empezar una ronda es sólo sacar un puzle de la cola (`get`). Los hilos de relleno generan con `DictEngine.new_puzzle` en el propio proceso o, si se dan `processes`, en un `ProcessPoolExecutor` (cada proceso carga su propio motor).
+
+    Args
+    ----------
+    engine : None or DictEngine
+        Motor con el que generar (en hilos). No hace falta si se usan procesos.
+    size : int
+        Tamaño máximo de cada cola.
+    difficulties : None or list
+        Dificultades a mantener. Por defecto las que tienen palabras objetivo (ver `available_difficulties`; con procesos, se pregunta a uno de ellos).
+    workers : int
+        Número de hilos de relleno (al menos uno por proceso).
+    processes : int
+        Si es mayor que `0`, número de procesos donde generar.
+    load_kwargs : None or dict
+        Argumentos de `DictEngine.load` para los procesos.
+    window : float
+        Ventana (en segundos) para calcular el ritmo de relleno.
+    backoff : float
+        Segundos sin volver a intentar una dificultad tras un error al generar (se duplica con cada error seguido, hasta `max_backoff`). El resto de dificultades se siguen rellenando.
+    max_backoff : float
+        Espera máxima tras errores seguidos.
+    checker : bool or AmbiguityChecker
+        Comprobar si cada puzle tiene otras respuestas válidas (ver `validate.AmbiguityChecker`); los puzles incluyen `alternatives`. Con `True` se crea a partir del motor (con procesos, cada uno el suyo). Se vuelve a crear en cada `update`, con el motor nuevo.
+    reject_ambiguous : bool
+        Si es `True` (y hay `checker`), los puzles ambiguos se descartan y se genera otro (ver `DictEngine.new_puzzle`).
+    """
+
+    def __init__(self, engine=None, size=8, difficulties=None, workers=1, processes=0, load_kwargs=None, window=60.0, backoff=1.0, max_backoff=60.0,
+                 checker=False, reject_ambiguous=False):
+        if engine is None and not processes:
+            raise Exception('Hace falta un motor o procesos en los que generar')
+        self.engine = engine
+        self.size = size
+        self._executor = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(load_kwargs or {}, bool(checker))) if processes else None
+        if difficulties is None:
+            difficulties = available_difficulties(engine) if self._executor is None else self._executor.submit(_worker_difficulties).result()
+        self.difficulties = list(difficulties)
+        self.workers = max(workers, processes)
+        self.window = window
+        self.backoff, self.max_backoff = backoff, max_backoff
+        self.checker = None if not checker or engine is None else AmbiguityChecker.from_engine(engine) if checker is True else checker
+        self.reject_ambiguous = reject_ambiguous
+        self._queues = {d: collections.deque() for d in self.difficulties}
+        self._produced = {d: collections.deque() for d in self.difficulties} # Instantes de generación (para el ritmo de relleno)
+        self._counts = {d: {'produced': 0, 'served': 0, 'misses': 0, 'errors': 0} for d in self.difficulties}
+        self._failures = {d: 0 for d in self.difficulties} # Errores seguidos al generar
+        self._retry_at = {d: 0.0 for d in self.difficulties} # Instante a partir del cual se vuelve a intentar
+        self._last_error = {d: None for d in self.difficulties}
+        self._in_progress = {d: 0 for d in self.difficulties} # Puzles generándose
+        self._version = 0 # Cambia con cada `update` (los puzles generados con un motor anterior se descartan)
+        self._cond = threading.Condition()
+        self._apply_lock = threading.Lock()
+        self._threads = []
+        self._running = False
+
+    def start(self):
+        """Arranca los hilos de relleno."""
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._refill, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """Para los hilos de relleno (y los procesos, si los hay)."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def _generate(self, difficulty):
+        if self._executor is not None:
+            return self._executor.submit(_worker_puzzle, difficulty, self.reject_ambiguous).result()
+        with self._cond: # El comprobador es el del mismo motor (ver `update`)
+            engine, checker = self.engine, self.checker
+        return engine.new_puzzle(difficulty, checker=checker, reject_ambiguous=self.reject_ambiguous)
+
+    def _next_difficulty(self, now):
+        """Dificultad con la cola más vacía (contando los puzles en curso y sin contar las que esperan tras un error), o `None` si todas están llenas o esperando."""
+        ready = [d for d in self.difficulties if self._retry_at[d] <= now]
+        if not ready:
+            return None
+        pending = min(ready, key=lambda d: len(self._queues[d]) + self._in_progress[d])
+        return pending if len(self._queues[pending]) + self._in_progress[pending] < self.size else None
+
+    def _wait_time(self, now):
+        """Segundos hasta que se pueda volver a intentar alguna dificultad (`None` si ninguna está esperando)."""
+        return min((t - now for t in self._retry_at.values() if t > now), default=None)
+
+    def _refill(self):
+        while True:
+            with self._cond:
+                while self._running and (difficulty := self._next_difficulty(time.monotonic())) is None:
+                    self._cond.wait(self._wait_time(time.monotonic()))
+                if not self._running:
+                    return
+                self._in_progress[difficulty] += 1
+                version = self._version
+            try:
+                puzzle = self._generate(difficulty)
+            except Exception as e: # Sólo se deja de intentar esta dificultad durante un tiempo: el hilo sigue con las demás
+                self._failed(difficulty, e)
+                continue
+            finally:
+                with self._cond:
+                    self._in_progress[difficulty] -= 1
+            with self._cond:
+                self._failures[difficulty] = 0
+                if version != self._version: # El motor ha cambiado mientras se generaba
+                    self._cond.notify_all()
+                    continue
+                self._queues[difficulty].append(puzzle)
+                self._counts[difficulty]['produced'] += 1
+                self._record(difficulty, time.monotonic())
+                self._cond.notify_all()
+
+    def _failed(self, difficulty, error):
+        """Registra un error al generar y aplaza la dificultad (más cuantos más errores seguidos)."""
+        with self._cond:
+            self._counts[difficulty]['errors'] += 1
+            self._failures[difficulty] += 1
+            delay = min(self.max_backoff, self.backoff * 2 ** (self._failures[difficulty] - 1))
+            self._retry_at[difficulty] = time.monotonic() + delay
+            self._last_error[difficulty] = repr(error)
+            self._cond.notify_all()
+        print(f'Error al generar un puzle ({difficulty}), se reintenta en {delay:.1f} s: {error!r}', file=sys.stderr)
+
+    def update(self, engine, words=()):
+        """Cambia el motor (p. ej. tras `DictEngine.apply`) y descarta los puzles en cola cuya palabra o alguna pista está en `words`. Si hay `checker`, se vuelve a crear con el motor nuevo.
+
+        Args
+        ----------
+        engine : DictEngine
+            Motor nuevo.
+        words : iterable
+            Palabras cuyas entradas o datos han cambiado.
+        """
+        if self._executor is not None:
+            raise Exception('Los procesos cargan su propio motor: no se puede cambiar')
+        words = set(words)
+        checker = None if self.checker is None else type(self.checker).from_engine(engine) # Fuera del cerrojo: recorre todo el diccionario
+        with self._cond:
+            self.engine, self.checker = engine, checker
+            self._version += 1
+            for d in self.difficulties: # El motor nuevo puede no tener el error
+                self._failures[d] = 0
+                self._retry_at[d] = 0.0
+            for queue in self._queues.values():
+                kept = [p for p in queue if p['word'] not in words and not any(word in words for word, _, _ in p['solutions'])]
+                queue.clear()
+                queue.extend(kept)
+            self._cond.notify_all() # Hay hueco para rellenar
+
+    def apply(self, ops, skip_invalid=False):
+        """Aplica cambios al diccionario del motor (ver `delta`) y descarta sólo los puzles afectados.
+
+        Args
+        ----------
+        ops : iterable
+            Operaciones (ver `delta`).
+        skip_invalid : bool
+            Si es `True` y el lote falla, se aplican las operaciones una a una y las que fallan se ignoran (y se avisa por `stderr`). Si no, el error se propaga y no se aplica ninguna.
+
+        Returns
+        -------
+        set
+            Palabras cuyas entradas o datos han cambiado.
+        """
+        ops = list(ops)
+        with self._apply_lock: # Un cambio detrás de otro (cada uno sobre el motor del anterior)
+            try:
+                engine, words = self.engine.apply(ops)
+            except Exception:
+                if not skip_invalid:
+                    raise
+                engine, words = self.engine, set()
+                for op in ops:
+                    try:
+                        engine, changed = engine.apply([op])
+                    except Exception as e:
+                        print(f'Cambio no aplicado ({e}): {op!r}', file=sys.stderr)
+                        continue
+                    words |= changed
+            self.update(engine, words)
+        return words
+
+    def get(self, difficulty, timeout=0.0):
+        """Saca un puzle de la cola de `difficulty`.
+
+        Con la medición activada (ver `telemetry`) se guardan la profundidad de la cola, la espera y si el puzle estaba listo.
+
+        Args
+        ----------
+        difficulty : str
+            Dificultad.
+        timeout : None or float
+            Segundos a esperar si la cola está vacía (`None` espera indefinidamente). Si se agotan, el puzle se genera en el momento.
+
+        Returns
+        -------
+        dict
+            Puzle (ver `DictEngine.new_puzzle`).
+        """
+        with telemetry.track('serve', difficulty=difficulty):
+            return self._get(difficulty, timeout)
+
+    def _get(self, difficulty, timeout):
+        if difficulty not in self._queues: # Sin cola (p. ej. sin palabras objetivo): se genera en el momento, y `new_puzzle` da el error
+            telemetry.cache('pool', misses=1)
+            return self._generate(difficulty)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            queue = self._queues[difficulty]
+            telemetry.size('depth', len(queue))
+            while not queue and self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                with telemetry.stage('wait'):
+                    self._cond.wait(remaining)
+            if queue:
+                self._counts[difficulty]['served'] += 1
+                self._cond.notify_all() # Hay hueco para rellenar
+                telemetry.cache('pool', hits=1)
+                puzzle = queue.popleft()
+                telemetry.annotate(word=puzzle['word'])
+                return puzzle
+            self._counts[difficulty]['misses'] += 1
+        telemetry.cache('pool', misses=1)
+        return self._generate(difficulty) # Cola vacía: se genera en el momento (con la medición, en la misma ronda)
+
+    def _record(self, difficulty, now):
+        """Registra un puzle generado y olvida los que quedan fuera de la ventana."""
+        produced = self._produced[difficulty]
+        produced.append(now)
+        while produced[0] < now - self.window:
+            produced.popleft()
+
+    def metrics(self):
+        """Profundidad de las colas, ritmo de relleno y errores al generar.
+
+        Returns
+        -------
+        dict
+            `{dificultad: {'depth', 'produced', 'served', 'misses', 'errors', 'last_error', 'retry_in', 'refill_rate'}}`, con `refill_rate` en puzles por segundo dentro de la ventana `window` y `retry_in` los segundos que faltan para volver a intentar la dificultad tras un error (`0` si no está esperando).
+        """
+        now = time.monotonic()
+        res = {}
+        with self._cond:
+            for d in self.difficulties:
+                produced = self._produced[d]
+                while produced and produced[0] < now - self.window:
+                    produced.popleft()
+                res[d] = dict(self._counts[d], depth=len(self._queues[d]), last_error=self._last_error[d], retry_in=max(0.0, self._retry_at[d] - now),
+                              refill_rate=len(produced) / self.window)
+        return res
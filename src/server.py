@@ -0,0 +1,312 @@
+import asyncio, base64, hashlib, hmac, json, os, random, secrets, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+from .delta import DeltaFeed
+from .pool import PuzzlePool
+
+# Servicio HTTP/JSON (sólo biblioteca estándar, con asyncio) para jugar sin Streamlit. Uso: python -m src.server --port 8000
+#     GET  /puzzle?difficulty=easy&kind=sust      -> {'token', 'kind', 'difficulty', 'length', 'first_letter', 'hints': [{'word', 'definition'}]} (todas las pistas menos la última; y `ambiguous` con --ambiguous flag)
+#     POST /check {"token": ..., "answer": ...}   -> {'correct'} (y `word` si acierta o si se rinde con "give_up": true)
+#     GET  /clue?token=...&level=2                -> {'last_letter', 'hint': {'word', 'definition'}} (nivel 2) o {'anagram'} (nivel 3), como las pistas del juego
+#     GET  /health                                -> estado de las colas de puzles de cada tipo (ver `PuzzlePool.metrics`)
+# El estado de cada puzle viaja en el token (firmado y con la palabra y la última pista cifradas), así que cualquier instancia con el mismo secreto (`RAE_SERVER_SECRET`) puede comprobarlo.
+
+MAX_BODY = 1 << 16
+
+class TokenError(Exception):
+    """Token mal formado, con firma incorrecta o caducado."""
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+class Tokens:
+    """Tokens sin estado en el servidor: `datos.firma`, con la palabra y la última pista cifradas (flujo de SHAKE-256 con un nonce por token) y firmados con HMAC-SHA256.
+
+    Args
+    ----------
+    secret : bytes
+        Secreto compartido por todas las instancias.
+    ttl : float
+        Segundos de validez de cada token.
+    """
+
+    def __init__(self, secret, ttl=24 * 3600):
+        self._enc_key = hmac.new(secret, b'enc', hashlib.sha256).digest() # Claves distintas para cifrar y firmar
+        self._mac_key = hmac.new(secret, b'mac', hashlib.sha256).digest()
+        self.ttl = ttl
+
+    def _keystream(self, nonce, n):
+        return hashlib.shake_256(self._enc_key + nonce).digest(n)
+
+    def issue(self, puzzle):
+        """Token de un puzle (ver `DictEngine.new_puzzle`). La última pista (la del nivel 2) va cifrada con la palabra."""
+        nonce = secrets.token_bytes(12)
+        secret = json.dumps([puzzle['show_word'], puzzle['solutions'][-1][0], puzzle['masked_defs'][-1]], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        cipher = bytes(a ^ b for a, b in zip(secret, self._keystream(nonce, len(secret))))
+        payload = json.dumps({'d': puzzle['difficulty'], 'n': _b64encode(nonce), 'w': _b64encode(cipher), 'e': int(time.time() + self.ttl)}, separators=(',', ':')).encode('utf-8')
+        return _b64encode(payload) + '.' + _b64encode(hmac.new(self._mac_key, payload, hashlib.sha256).digest())
+
+    def read(self, token):
+        """Datos de un token.
+
+        Args
+        ----------
+        token : str
+            Token creado con `issue`.
+
+        Returns
+        -------
+        dict
+            `difficulty`, `word` (como se muestra, ver `show_word`), `hint` (`{'word', 'definition'}` de la última pista) y `nonce`.
+        """
+        try:
+            payload, signature = (_b64decode(part) for part in str(token).split('.'))
+        except ValueError:
+            raise TokenError('Token mal formado')
+        if not hmac.compare_digest(signature, hmac.new(self._mac_key, payload, hashlib.sha256).digest()):
+            raise TokenError('Firma incorrecta')
+        data = json.loads(payload)
+        if data['e'] < time.time():
+            raise TokenError('Token caducado')
+        nonce, cipher = _b64decode(data['n']), _b64decode(data['w'])
+        word, hint_word, hint_def = json.loads(bytes(a ^ b for a, b in zip(cipher, self._keystream(nonce, len(cipher)))))
+        return {'difficulty': data['d'], 'word': word, 'hint': {'word': hint_word, 'definition': hint_def}, 'nonce': nonce}
+
+def normalize_answer(answer):
+    """Respuesta como la compara el juego: en minúsculas y sin espacios."""
+    return str(answer).lower().replace(' ', '')
+
+class PuzzleServer:
+    """Servidor HTTP/1.1 mínimo (con conexiones persistentes) sobre una cola de puzles compartida.
+
+    Las llamadas que pueden generar un puzle (o aplicar cambios) se hacen en un `ThreadPoolExecutor`, así que el bucle de eventos nunca se bloquea.
+
+    Args
+    ----------
+    pools : dict
+        Colas de puzles (ya arrancadas) de cada tipo de palabra objetivo (`{tipo: PuzzlePool}`, ver `DictEngine.view`). La primera es la de por defecto.
+    tokens : Tokens
+        Emisor y lector de tokens.
+    threads : int
+        Hilos del executor.
+    changes : None or str
+        Archivo de cambios del diccionario que se aplican al llegar (ver `delta.DeltaFeed`).
+    poll_interval : float
+        Segundos entre comprobaciones de `changes`.
+    timeout : float
+        Segundos de espera máximos de cada lectura de la petición (la línea, las cabeceras y el cuerpo) y de cada envío de la respuesta. Si se agotan se cierra la conexión (con un 408 si la petición estaba a medias).
+    """
+
+    def __init__(self, pools, tokens, threads=8, changes=None, poll_interval=5.0, timeout=30.0):
+        self.pools, self.tokens = dict(pools), tokens
+        self.default_kind = next(iter(self.pools))
+        self.executor = ThreadPoolExecutor(threads)
+        self.feed = DeltaFeed(changes) if changes else None
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.routes = {'/puzzle': self.puzzle, '/check': self.check, '/clue': self.clue, '/health': self.health}
+
+    async def puzzle(self, params):
+        kind, difficulty = params.get('kind', self.default_kind), params.get('difficulty', 'easy')
+        pool = self.pools.get(kind)
+        if pool is None:
+            return 400, {'error': f'Tipo de palabra no disponible: {kind}'}
+        if difficulty not in pool.difficulties:
+            return 400, {'error': f'Dificultad no disponible: {difficulty}'}
+        try:
+            puzzle = await asyncio.get_running_loop().run_in_executor(self.executor, pool.get, difficulty)
+        except Exception as e: # Cola vacía y la generación en el momento ha fallado
+            print(f'Error al generar un puzle ({kind}, {difficulty}): {e!r}', file=sys.stderr)
+            return 503, {'error': 'No se ha podido generar un puzle, inténtalo de nuevo'}
+        shown = len(puzzle['solutions']) - 1 # La última pista se da con la del nivel 2 (ver `clue`)
+        res = {'token': self.tokens.issue(puzzle), 'kind': kind, 'difficulty': difficulty, 'length': len(puzzle['show_word']), 'first_letter': puzzle['show_word'][0],
+               'hints': [{'word': word, 'definition': definition} for (word, _, _), definition in zip(puzzle['solutions'][:shown], puzzle['masked_defs'][:shown])]}
+        if 'alternatives' in puzzle: # Comprobado (ver `PuzzlePool`): si hay otras respuestas válidas
+            res['ambiguous'] = bool(puzzle['alternatives'])
+        return 200, res
+
+    async def check(self, params):
+        state = self.tokens.read(params.get('token'))
+        correct = normalize_answer(params.get('answer', '')) == state['word']
+        res = {'correct': correct}
+        if correct or params.get('give_up'):
+            res['word'] = state['word']
+        return 200, res
+
+    async def clue(self, params):
+        word = self.tokens.read(params.get('token'))
+        level = int(params.get('level', 2))
+        if level == 2: # Última letra y una definición más, como en el juego
+            return 200, {'last_letter': word['word'][-1], 'hint': word['hint']}
+        if level == 3: # Mismo anagrama para el mismo token
+            letters = list(word['word'][1:-1])
+            random.Random(word['nonce']).shuffle(letters)
+            return 200, {'anagram': word['word'][0] + ''.join(letters) + word['word'][-1]}
+        return 400, {'error': 'Nivel de pista desconocido (2 o 3)'}
+
+    async def health(self, params):
+        return 200, {'status': 'ok', 'pools': {kind: pool.metrics() for kind, pool in self.pools.items()}}
+
+    async def dispatch(self, method, target, body):
+        """Respuesta `(estado, json)` a una petición."""
+        url = urlsplit(target)
+        route = self.routes.get(url.path)
+        if route is None:
+            return 404, {'error': 'No encontrado'}
+        if method not in ('GET', 'POST'):
+            return 405, {'error': 'Método no permitido'}
+        params = dict(parse_qsl(url.query))
+        try:
+            if body:
+                params.update(json.loads(body))
+            return await route(params)
+        except TokenError as e:
+            return 400, {'error': str(e)}
+        except (ValueError, TypeError, AttributeError) as e: # json o parámetros no válidos
+            return 400, {'error': f'Petición no válida: {e}'}
+        except Exception as e:
+            print(f'Error al atender {method} {url.path}: {e!r}', file=sys.stderr)
+            return 500, {'error': 'Error interno'}
+
+    async def handle(self, reader, writer):
+        """Atiende una conexión (varias peticiones seguidas si el cliente la mantiene abierta)."""
+        try:
+            while True:
+                line = await asyncio.wait_for(reader.readline(), self.timeout) # Conexión inactiva: se cierra sin responder
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'Petición mal formada'}, False)
+                    break
+                try:
+                    headers = await asyncio.wait_for(self._read_headers(reader), self.timeout)
+                    length = headers.get('content-length') or '0'
+                    if not (length.isascii() and length.isdigit()): # Ni negativo ni otra cosa que un número
+                        await self._respond(writer, 400, {'error': f'Content-Length no válido: {length}'}, False)
+                        break
+                    length = int(length)
+                    if length > MAX_BODY:
+                        await self._respond(writer, 413, {'error': 'Petición demasiado grande'}, False)
+                        break
+                    body = await asyncio.wait_for(reader.readexactly(length), self.timeout) if length else b''
+                except asyncio.TimeoutError:
+                    await self._respond(writer, 408, {'error': 'Tiempo de espera agotado'}, False)
+                    break
+                keep_alive = headers.get('connection', '').lower() != 'close' if version == 'HTTP/1.1' else headers.get('connection', '').lower() == 'keep-alive'
+                if method == 'OPTIONS': # Preflight de CORS
+                    status, payload = 204, None
+                else:
+                    status, payload = await self.dispatch(method, target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_headers(self, reader):
+        """Cabeceras de una petición (`{nombre en minúsculas: valor}`), hasta la línea vacía."""
+        headers = {}
+        while (header := await reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = header.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return headers
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        reason = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 408: 'Request Timeout', 413: 'Payload Too Large',
+                  500: 'Internal Server Error', 503: 'Service Unavailable'}.get(status, '')
+        head = (f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {len(body)}\r\n'
+                f'Access-Control-Allow-Origin: *\r\nAccess-Control-Allow-Headers: Content-Type\r\nConnection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+        writer.write(head.encode('latin-1') + body)
+        await asyncio.wait_for(writer.drain(), self.timeout) # Cliente que no lee: se cierra la conexión
+
+    async def _watch_changes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                ops = self.feed.poll()
+            except Exception as e: # Se reintenta en la siguiente comprobación (el offset no avanza)
+                print(f'No se han podido leer los cambios del diccionario: {e!r}', file=sys.stderr)
+                continue
+            if not ops:
+                continue
+            words = set()
+            for kind, pool in self.pools.items(): # Cada tipo tiene su motor (ver `DictEngine.view`)
+                try:
+                    words |= await loop.run_in_executor(self.executor, pool.apply, ops, True) # Los cambios no válidos se ignoran (ver `PuzzlePool.apply`)
+                except Exception as e:
+                    print(f'{kind}: cambios del diccionario no aplicados: {e!r}', file=sys.stderr)
+            print(f'{len(ops)} cambios recibidos ({len(words)} palabras cambiadas)', file=sys.stderr)
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        """Atiende peticiones hasta que se cancela."""
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        watcher = asyncio.create_task(self._watch_changes()) if self.feed else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher:
+                watcher.cancel()
+            self.executor.shutdown(wait=False)
+
+def main(argv=None):
+    import argparse
+    from .engine import DictEngine
+    parser = argparse.ArgumentParser(description='Servicio HTTP/JSON de puzles (puzle nuevo y comprobar respuesta).')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--json', default='data/diccionario.json')
+    parser.add_argument('--csv', default='data/diccionario_df.csv')
+    parser.add_argument('--compact', default='data/diccionario.bin')
+    parser.add_argument('--kind', nargs='+', default=['sust'], help='Tipos de palabra objetivo (modos de juego) que se sirven. Comparten el diccionario cargado.')
+    parser.add_argument('--size', type=int, default=32, help='Puzles listos por dificultad.')
+    parser.add_argument('--workers', type=int, default=2, help='Hilos de relleno de la cola.')
+    parser.add_argument('--processes', type=int, default=0, help='Procesos en los que generar (cada uno carga su motor).')
+    parser.add_argument('--threads', type=int, default=8, help='Hilos del executor de las peticiones.')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Segundos de espera máximos de cada lectura de la petición y de cada respuesta.')
+    parser.add_argument('--ttl', type=float, default=24 * 3600, help='Segundos de validez de los tokens.')
+    parser.add_argument('--changes', default='data/cambios.jsonl', help='Archivo de cambios del diccionario (ver src/delta.py).')
+    parser.add_argument('--ambiguous', default='reject', choices=['keep', 'flag', 'reject'], help='Puzles con otras respuestas válidas: no comprobar, marcar (`ambiguous` en /puzzle) o descartar.')
+    args = parser.parse_args(argv)
+    secret = os.environ.get('RAE_SERVER_SECRET')
+    if not secret:
+        print('RAE_SERVER_SECRET no está definido: los tokens sólo valen en esta instancia y hasta que se reinicie', file=sys.stderr)
+    load_kwargs = {'json_file': args.json, 'csv_file': args.csv, 'compact_file': args.compact, 'kind': args.kind[0]}
+    engine = None if args.processes else DictEngine.load(**load_kwargs)
+    check = {'checker': args.ambiguous != 'keep', 'reject_ambiguous': args.ambiguous == 'reject'}
+    pools = {}
+    for kind in args.kind:
+        # Sólo las dificultades con palabras objetivo (con procesos, se pregunta a uno de ellos; ver `PuzzlePool`)
+        if engine is None:
+            pool = PuzzlePool(None, size=args.size, workers=args.workers, processes=args.processes, load_kwargs=dict(load_kwargs, kind=kind), **check)
+        else:
+            pool = PuzzlePool(engine.view(kind), size=args.size, workers=args.workers, **check)
+        if not pool.difficulties:
+            print(f'{kind}: no hay palabras objetivo viables, no se sirve', file=sys.stderr)
+            pool.stop()
+            continue
+        pools[kind] = pool.start()
+    if not pools:
+        sys.exit('Ningún tipo de palabra tiene palabras objetivo viables')
+    tokens = Tokens(secret.encode('utf-8') if secret else secrets.token_bytes(32), ttl=args.ttl)
+    server = PuzzleServer(pools, tokens, threads=args.threads, changes=None if args.processes else args.changes, timeout=args.timeout)
+    print(f'Escuchando en http://{args.host}:{args.port}', file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pool in pools.values():
+            pool.stop()
+
+if __name__ == '__main__':
+    main()
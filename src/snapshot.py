@@ -0,0 +1,120 @@
+import glob, hashlib, json, os
+from array import array
+from . import utils
+from .compact import CompactDict, _write_sections, compact_dict, load_compact
+
+# Instantáneas en disco del motor ya preprocesado (diccionario filtrado, palabras objetivo posibles y tablas de palabras objetivo), en formato compacto.
+# Se guardan con un nombre que depende del contenido de los archivos de origen y de la configuración de los filtros, así que si cambia cualquiera de los dos se crea otra.
+# El nombre empieza por una clave de los archivos de origen (sus rutas) y de los filtros elegidos: al guardar una se borran sólo las anteriores con la misma clave, y las de otros archivos u otros filtros que compartan la carpeta se mantienen.
+# Al reiniciar el proceso (o en procesos nuevos) se carga la instantánea mapeándola en memoria, sin volver a filtrar.
+
+SNAPSHOT_VERSION = 2 # Cambiar si cambian los filtros de `DictEngine.build` (las instantáneas anteriores dejan de usarse)
+
+def source_hash(files, chunk_size=1 << 20):
+    """Hash (sha256) del contenido de varios archivos.
+
+    Args
+    ----------
+    files : list
+        Archivos.
+    chunk_size : int
+        Bytes leídos cada vez.
+
+    Returns
+    -------
+    str
+        Hash en hexadecimal.
+    """
+    h = hashlib.sha256()
+    for file in files:
+        h.update(os.path.basename(file).encode('utf-8') + b'\0')
+        with open(file, 'rb') as fp:
+            while chunk := fp.read(chunk_size):
+                h.update(chunk)
+    return h.hexdigest()
+
+def filter_config(kind, excl_group):
+    """Configuración de la que depende el motor (filtros y reglas de las tablas de palabras objetivo)."""
+    return {'snapshot_version': SNAPSHOT_VERSION, 'kind': kind, 'excl_group': sorted(excl_group),
+            'target_commonness': utils.TARGET_COMMONNESS, 'acep_limit': utils.ACEP_LIMIT, 'hint_types': utils.HINT_TYPES}
+
+def snapshot_file(directory, files, kind, excl_group):
+    """Archivo de la instantánea para unos archivos de origen y una configuración.
+
+    Args
+    ----------
+    directory : str
+        Carpeta de las instantáneas.
+    files : list
+        Archivos de origen.
+    kind : str
+        Tipo de las palabras objetivo.
+    excl_group : dict
+        Abreviaturas cuyas acepciones se excluyen.
+
+    Returns
+    -------
+    str
+        Ruta de la instantánea (exista o no).
+    """
+    key = hashlib.sha256(json.dumps([[os.path.abspath(f) for f in files], kind, sorted(excl_group)], ensure_ascii=False).encode('utf-8')) # Qué se carga (no su contenido)
+    h = hashlib.sha256(source_hash(files).encode('ascii'))
+    h.update(json.dumps(filter_config(kind, excl_group), sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return os.path.join(directory, f'engine-{kind}-{key.hexdigest()[:8]}-{h.hexdigest()[:16]}.bin')
+
+def write_snapshot(engine, file):
+    """Guarda el motor en una instantánea (escribiendo a un temporal, así que quien la lea nunca la ve a medias) y borra las anteriores de los mismos archivos de origen y filtros (con la misma clave, ver `snapshot_file`).
+
+    Args
+    ----------
+    engine : DictEngine
+        Motor (su `full_df` se guarda como tabla).
+    file : str
+        Archivo de la instantánea (ver `snapshot_file`).
+    """
+    drae = engine.drae
+    if not isinstance(drae, CompactDict):
+        drae = compact_dict(drae, engine.full_df)
+    sections = drae.sections()
+    positions = drae.word_index()
+    targets = set(engine.df['word'])
+    sections['target_rows'] = array('I', (i for i, word in enumerate(engine.full_df['word']) if word in targets)) # Filas de `full_df` (como en la tabla)
+    for difficulty, table in engine.target_tables.items():
+        sections['targets_' + difficulty] = array('I', (positions[word] for word in table))
+    sections['snapshot'] = json.dumps({'kind': engine.kind, 'excl_group': dict(engine.excl_group), 'difficulties': list(engine.target_tables)}, ensure_ascii=False).encode('utf-8')
+    directory = os.path.dirname(file) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp = f'{file}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as fp:
+        _write_sections(sections, fp)
+    os.replace(tmp, file)
+    prefix = os.path.basename(file).rsplit('-', 1)[0] # `engine-{tipo}-{clave}`
+    for old in glob.glob(os.path.join(directory, glob.escape(prefix) + '-*.bin')): # Instantáneas de otras versiones de los mismos archivos o de las reglas
+        if os.path.abspath(old) != os.path.abspath(file):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+def read_snapshot(file):
+    """Carga un motor desde una instantánea (mapeándola en memoria).
+
+    Args
+    ----------
+    file : str
+        Archivo creado con `write_snapshot`.
+
+    Returns
+    -------
+    DictEngine
+        Motor con el diccionario filtrado (compacto).
+    """
+    from .engine import DictEngine
+    drae = load_compact(file)
+    s = drae._s
+    meta = json.loads(bytes(s['snapshot']))
+    full_df = drae.table.columns()
+    df = utils.table_rows(full_df, s['target_rows'])
+    words = drae._words
+    target_tables = {d: [words[w] for w in s['targets_' + d]] for d in meta['difficulties']}
+    return DictEngine(drae, df, full_df, drae.index, utils.build_word_lookup(full_df), target_tables, meta['kind'], meta['excl_group'])
@@ -0,0 +1,162 @@
+import collections, itertools, random, string
+from . import utils
+
+# Diccionarios sintéticos con el mismo esquema que el de la RAE, para pruebas y mediciones cuando no se tiene `diccionario.json` o para probar a mayor escala.
+# Crear un diccionario 10 veces mayor: python -m src.synthetic --scale 10 --json-out data/sintetico.json --csv-out data/sintetico_df.csv
+
+_SYLLABLES = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ru', 'sa', 'te', 'vi', 'zo', 'cha', 'llo'] # Para formar palabras nuevas
+_ID_CHARS = string.digits + string.ascii_letters
+
+def fit_profile(df, drae=None):
+    """Distribuciones del diccionario que reproducen los diccionarios sintéticos.
+
+    Args
+    ----------
+    df : pd.DataFrame
+        DataFrame de palabras.
+    drae : None or dict
+        Diccionario de la RAE. Si no se da, el número de palabras relacionadas por acepción se estima a partir de `def_freq` y `num_defs`.
+
+    Returns
+    -------
+    dict
+        `fan_out` (`{número de rel_ids de una acepción: frecuencia}`) y `extra_abrev` (proporción de acepciones con regionalismos, temas o desusadas).
+    """
+    if drae is None:
+        mean = max(1.0, df['def_freq'].sum() / max(df['num_defs'].sum(), 1)) # Aristas por acepción
+        return {'fan_out': {n: 1 for n in range(1, round(2 * mean))}, 'extra_abrev': 0.2} # Uniforme con la misma media
+    extra = set(utils.ABR_REG) | set(utils.ABR_TEMA) | set(utils.ABR_DESUS)
+    fan_out, total, with_extra = collections.Counter(), 0, 0
+    for entry in drae.values():
+        for abrev, rel_ids in zip(entry['abrev'], entry['rel_ids']):
+            fan_out[len(rel_ids)] += 1
+            total += 1
+            with_extra += any(a in extra for a in abrev)
+    return {'fan_out': dict(fan_out), 'extra_abrev': with_extra / max(total, 1)}
+
+def make_drae(df, seed=0, profile=None):
+    """Crea un diccionario sintético para las palabras de un DataFrame.
+
+    Cada palabra tiene `num_defs` acepciones, con abreviaturas de su tipo (`kinds`) y, a veces, de regionalismos, temas o desusadas. Las palabras relacionadas de cada acepción (`rel_ids`) se eligen con probabilidad proporcional a `def_freq` y son las que forman el texto de la definición.
+
+    Args
+    ----------
+    df : pd.DataFrame
+        DataFrame de palabras (con `id`, `word`, `kinds`, `num_defs`, `def_freq` y, si está, `simple_word`).
+    seed : int or str
+        Semilla (misma semilla, mismo diccionario).
+    profile : None or dict
+        Distribuciones a reproducir (ver `fit_profile`). Por defecto las estimadas de `df`.
+
+    Returns
+    -------
+    dict
+        Diccionario con el esquema `{palabra: {'id', 'defs', 'abrev', 'rel_ids'}}`.
+    """
+    rng = random.Random(seed)
+    profile = profile or fit_profile(df)
+    df = df.drop_duplicates('word')
+    ids, words = df['id'].tolist(), df['word'].tolist()
+    texts = df['simple_word'].tolist() if 'simple_word' in df else words # Sin el número de los homónimos
+    cum_weights = list(itertools.accumulate(f + 1 for f in df['def_freq'].fillna(0).tolist()))
+    fan_outs = list(profile['fan_out'])
+    fan_weights = list(itertools.accumulate(profile['fan_out'].values()))
+    extra = list(utils.ABR_REG) + list(utils.ABR_TEMA) + list(utils.ABR_DESUS)
+    population = range(len(ids))
+    drae = {}
+    for word_id, word, kinds, num_defs in zip(ids, words, df['kinds'].tolist(), df['num_defs'].tolist()):
+        kinds = str(kinds).split(',')
+        defs, abrev, rel_ids = [], [], []
+        for i in range(1, max(1, int(num_defs)) + 1):
+            abr = [rng.choice(utils.ABREV.get(rng.choice(kinds), ['m.']))]
+            if rng.random() < profile['extra_abrev']:
+                abr.append(rng.choice(extra))
+            rel = rng.choices(population, cum_weights=cum_weights, k=rng.choices(fan_outs, cum_weights=fan_weights)[0])
+            text = ' '.join(str(texts[r]) for r in rel) or 'sin palabras relacionadas'
+            defs.append(f"{i}. {' '.join(abr)} {text[:1].upper() + text[1:]}.")
+            abrev.append(abr)
+            rel_ids.append([ids[r] for r in rel])
+        drae[word] = {'id': word_id, 'defs': defs, 'abrev': abrev, 'rel_ids': rel_ids}
+    return drae
+
+def _new_word(simple_word, copy):
+    """Palabra nueva (distinta para cada `copy`) formada añadiendo sílabas a `simple_word`."""
+    suffix = ''
+    while copy:
+        copy, digit = divmod(copy, len(_SYLLABLES))
+        suffix += _SYLLABLES[digit]
+    return simple_word + suffix
+
+def scale_dict(df, scale=10, seed=0, drae=None):
+    """Crea un diccionario sintético `scale` veces mayor, con su DataFrame.
+
+    Cada palabra del DataFrame se repite `scale` veces (con otro nombre e `id`), de modo que se mantienen las distribuciones conjuntas de tipo, número de acepciones y rareza. Las palabras relacionadas se eligen con probabilidad proporcional al `def_freq` original, así que cada copia tiene, en media, el `def_freq` de la original. Si `scale` no es entero, la parte fraccionaria se rellena con palabras al azar.
+
+    Args
+    ----------
+    df : pd.DataFrame
+        DataFrame de palabras.
+    scale : float
+        Factor de escala.
+    seed : int or str
+        Semilla (misma semilla, mismo diccionario).
+    drae : None or dict
+        Diccionario de la RAE. Si se da, se reproducen sus distribuciones de acepciones por palabra y de palabras relacionadas por acepción (ver `fit_profile`).
+
+    Returns
+    -------
+    tuple
+        Diccionario sintético y su DataFrame (mismas columnas que `df`, con `num_defs` y `def_freq` recalculados).
+    """
+    import pandas as pd
+    rng = random.Random(seed)
+    base = df.drop_duplicates('word').reset_index(drop=True)
+    if drae is not None: # Acepciones reales (`num_defs` puede no coincidir tras filtrar)
+        base['num_defs'] = [len(drae[w]['defs']) if w in drae else n for w, n in zip(base['word'], base['num_defs'])]
+    rows = list(range(len(base))) * int(scale) + rng.sample(range(len(base)), round((scale % 1) * len(base)))
+    seen_words, seen_ids = set(base['word']), set(base['id'])
+    columns = {c: base[c].tolist() for c in base.columns}
+    out = {c: [] for c in base.columns}
+    copies = collections.Counter()
+    for r in rows:
+        copy = copies[r]
+        copies[r] += 1
+        word, simple_word, word_id = columns['word'][r], columns['simple_word'][r], columns['id'][r]
+        if copy: # La primera vez se usa la palabra original
+            homonym = word[len(simple_word):] if word.startswith(simple_word) else '' # Número de homónimo
+            while True:
+                simple_word = _new_word(columns['simple_word'][r], copy)
+                word = simple_word + homonym
+                if word not in seen_words:
+                    break
+                copy += len(rows) # Choca con otra palabra: probar otras sílabas
+            while word_id in seen_ids:
+                word_id = ''.join(rng.choices(_ID_CHARS, k=7))
+            seen_words.add(word)
+            seen_ids.add(word_id)
+        for c in base.columns:
+            out[c].append(columns[c][r])
+        out['word'][-1], out['simple_word'][-1], out['id'][-1] = word, simple_word, word_id
+    new_df = pd.DataFrame(out)
+    new_drae = make_drae(new_df, seed=seed, profile=fit_profile(df, drae))
+    # `def_freq`: número de palabras en cuya definición aparece cada palabra
+    def_freq = collections.Counter(r for entry in new_drae.values() for r in set(itertools.chain.from_iterable(entry['rel_ids'])))
+    new_df['def_freq'] = [def_freq.get(i, 0) for i in new_df['id']]
+    new_df['num_defs'] = [len(new_drae[w]['defs']) for w in new_df['word']]
+    return new_drae, new_df
+
+if __name__ == '__main__':
+    import argparse
+    import pandas as pd
+    parser = argparse.ArgumentParser(description='Crea un diccionario sintético (json y csv) a escala del real.')
+    parser.add_argument('--scale', type=float, default=10)
+    parser.add_argument('--seed', default=0)
+    parser.add_argument('--csv', default='data/diccionario_df.csv')
+    parser.add_argument('--json', default=None, help='Diccionario real del que tomar las distribuciones (opcional).')
+    parser.add_argument('--json-out', required=True)
+    parser.add_argument('--csv-out', required=True)
+    args = parser.parse_args()
+    drae, df = scale_dict(pd.read_csv(args.csv), scale=args.scale, seed=args.seed, drae=utils.load_dict(args.json) if args.json else None)
+    utils.save_dict(drae, args.json_out)
+    df.to_csv(args.csv_out, index=False)
+    print(f'{len(drae)} palabras, {sum(len(e["defs"]) for e in drae.values())} acepciones')
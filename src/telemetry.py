@@ -0,0 +1,279 @@
+import atexit, json, os, threading, time
+
+# Medición opcional (desactivada por defecto) de la generación de puzles: tiempos por etapa, reintentos, tamaños de las listas de candidatas y aciertos de cachés.
+# Se activa con `configure` o con las variables de entorno `RAE_TELEMETRY_LOG` (registro JSONL, una línea por ronda) y `RAE_TELEMETRY_PROM` (métricas agregadas en formato de texto de Prometheus).
+# Uso:
+#     with telemetry.track('puzzle', difficulty='easy'):
+#         with telemetry.stage('words_with_word'):
+#             ...
+#         telemetry.size('solutions', len(solutions))
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # Límites (en segundos) del histograma de duración de las rondas
+
+class _Null:
+    """Contexto vacío (lo que se usa con la medición desactivada o fuera de una ronda)."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _Null()
+
+class _Stage:
+    __slots__ = ('record', 'name', 'start')
+
+    def __init__(self, record, name):
+        self.record, self.name = record, name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stages = self.record.stages
+        stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+class Record:
+    """Medidas de una ronda (ver `track`)."""
+    __slots__ = ('telemetry', 'kind', 'fields', 'stages', 'sizes', 'caches', 'retries', 'start', 'depth')
+
+    def __init__(self, telemetry, kind, fields):
+        self.telemetry, self.kind, self.fields = telemetry, kind, fields
+        self.stages, self.sizes, self.caches = {}, {}, {}
+        self.retries = 0
+        self.depth = 0 # Rondas anidadas (se acumulan en la de fuera)
+
+    def __enter__(self):
+        if self.depth == 0:
+            self.start = time.perf_counter()
+            _local.record = self
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.depth -= 1
+        if self.depth == 0:
+            _local.record = None
+            if exc_type is not None:
+                self.fields['error'] = exc_type.__name__
+            self.telemetry.emit(self, time.perf_counter() - self.start)
+        return False
+
+    def to_dict(self, seconds):
+        return {'ts': time.time(), 'kind': self.kind, **self.fields, 'seconds': seconds, 'stages': self.stages, 'retries': self.retries, 'sizes': self.sizes, 'cache': self.caches}
+
+class Telemetry:
+    """Destino de las medidas: registro JSONL y/o archivo de métricas de Prometheus.
+
+    Args
+    ----------
+    log_file : None or str
+        Archivo JSONL al que se añade una línea por ronda.
+    prometheus_file : None or str
+        Archivo de métricas (formato de texto de Prometheus), reescrito cada `interval` segundos. Puede contener `{pid}` para tener uno por proceso.
+    interval : float
+        Segundos entre escrituras de `prometheus_file`.
+    records : None or list
+        Si se da, se le añade cada ronda como diccionario (ver `Record.to_dict`), p. ej. para `benchmark.py`.
+    """
+
+    def __init__(self, log_file=None, prometheus_file=None, interval=10.0, records=None):
+        self.log_file = log_file
+        self.prometheus_file = prometheus_file.format(pid=os.getpid()) if prometheus_file else None
+        self.interval = interval
+        self.records = records
+        self.enabled = bool(log_file or prometheus_file) or records is not None
+        self._lock = threading.Lock()
+        self._log = None
+        self._written = 0.0
+        self._rounds = {} # {(tipo, dificultad): [cuentas por límite de BUCKETS, suma, número, reintentos]}
+        self._stages = {} # {(tipo, dificultad, etapa): [segundos, número]}
+        self._sizes = {} # {(tipo, dificultad, lista): [suma, número]}
+        self._caches = {} # {(tipo, caché): [aciertos, fallos]}
+
+    def emit(self, record, seconds):
+        """Guarda una ronda terminada."""
+        key = (record.kind, record.fields.get('difficulty', ''))
+        with self._lock:
+            if self.records is not None:
+                self.records.append(record.to_dict(seconds))
+            if self.log_file:
+                if self._log is None:
+                    self._log = open(self.log_file, 'a', encoding='utf-8')
+                self._log.write(json.dumps(record.to_dict(seconds), ensure_ascii=False) + '\n')
+                self._log.flush()
+            if self.prometheus_file:
+                counts = self._rounds.setdefault(key, [0] * len(BUCKETS) + [0.0, 0, 0])
+                for i, limit in enumerate(BUCKETS):
+                    if seconds <= limit:
+                        counts[i] += 1
+                counts[-3] += seconds
+                counts[-2] += 1
+                counts[-1] += record.retries
+                for name, value in record.stages.items():
+                    acc = self._stages.setdefault(key + (name,), [0.0, 0])
+                    acc[0] += value
+                    acc[1] += 1
+                for name, value in record.sizes.items():
+                    acc = self._sizes.setdefault(key + (name,), [0, 0])
+                    acc[0] += value
+                    acc[1] += 1
+                for name, (hits, misses) in record.caches.items():
+                    acc = self._caches.setdefault((record.kind, name), [0, 0])
+                    acc[0] += hits
+                    acc[1] += misses
+                if time.monotonic() - self._written >= self.interval:
+                    self._write_prometheus()
+
+    def prometheus_text(self):
+        """Métricas agregadas en formato de texto de Prometheus."""
+        lines = ['# TYPE rae_round_seconds histogram']
+        for (kind, difficulty), counts in sorted(self._rounds.items()):
+            labels = f'kind="{kind}",difficulty="{difficulty}"'
+            for limit, count in zip(BUCKETS, counts):
+                lines.append(f'rae_round_seconds_bucket{{{labels},le="{limit}"}} {count}')
+            lines.append(f'rae_round_seconds_bucket{{{labels},le="+Inf"}} {counts[-2]}')
+            lines.append(f'rae_round_seconds_sum{{{labels}}} {counts[-3]}')
+            lines.append(f'rae_round_seconds_count{{{labels}}} {counts[-2]}')
+        lines.append('# TYPE rae_round_retries_total counter')
+        for (kind, difficulty), counts in sorted(self._rounds.items()):
+            lines.append(f'rae_round_retries_total{{kind="{kind}",difficulty="{difficulty}"}} {counts[-1]}')
+        lines.append('# TYPE rae_stage_seconds_total counter')
+        for (kind, difficulty, name), (seconds, _) in sorted(self._stages.items()):
+            lines.append(f'rae_stage_seconds_total{{kind="{kind}",difficulty="{difficulty}",stage="{name}"}} {seconds}')
+        lines.append('# TYPE rae_stage_rounds_total counter')
+        for (kind, difficulty, name), (_, count) in sorted(self._stages.items()):
+            lines.append(f'rae_stage_rounds_total{{kind="{kind}",difficulty="{difficulty}",stage="{name}"}} {count}')
+        lines.append('# TYPE rae_candidates summary')
+        for (kind, difficulty, name), (total, count) in sorted(self._sizes.items()):
+            labels = f'kind="{kind}",difficulty="{difficulty}",list="{name}"'
+            lines.append(f'rae_candidates_sum{{{labels}}} {total}')
+            lines.append(f'rae_candidates_count{{{labels}}} {count}')
+        lines.append('# TYPE rae_cache_hits_total counter')
+        for (kind, name), (hits, _) in sorted(self._caches.items()):
+            lines.append(f'rae_cache_hits_total{{kind="{kind}",cache="{name}"}} {hits}')
+        lines.append('# TYPE rae_cache_misses_total counter')
+        for (kind, name), (_, misses) in sorted(self._caches.items()):
+            lines.append(f'rae_cache_misses_total{{kind="{kind}",cache="{name}"}} {misses}')
+        return '\n'.join(lines) + '\n'
+
+    def _write_prometheus(self):
+        tmp = self.prometheus_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fp:
+            fp.write(self.prometheus_text())
+        os.replace(tmp, self.prometheus_file) # Quien lo lea nunca ve un archivo a medias
+        self._written = time.monotonic()
+
+    def flush(self):
+        """Escribe las métricas pendientes y cierra el registro."""
+        with self._lock:
+            if self.prometheus_file and self._rounds:
+                self._write_prometheus()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+_local = threading.local() # Ronda en curso de cada hilo
+_telemetry = Telemetry(os.environ.get('RAE_TELEMETRY_LOG'), os.environ.get('RAE_TELEMETRY_PROM'))
+atexit.register(lambda: _telemetry.flush())
+
+def percentiles(seconds):
+    """Resumen (en milisegundos) de una lista de tiempos en segundos: `n`, `mean`, `p50`, `p90`, `p99` y `max` (percentiles por rango más cercano)."""
+    values = sorted(s * 1000 for s in seconds)
+    if not values:
+        return {'n': 0}
+    pick = lambda p: values[min(len(values) - 1, int(p / 100 * len(values)))] # Rango más cercano
+    return {'n': len(values), 'mean': sum(values) / len(values), 'p50': pick(50), 'p90': pick(90), 'p99': pick(99), 'max': values[-1]}
+
+def configure(log_file=None, prometheus_file=None, interval=10.0, records=None):
+    """Activa (o, sin destinos, desactiva) la medición.
+
+    Args
+    ----------
+    log_file : None or str
+        Archivo JSONL al que se añade una línea por ronda.
+    prometheus_file : None or str
+        Archivo de métricas de Prometheus (ver `Telemetry`).
+    interval : float
+        Segundos entre escrituras de `prometheus_file`.
+    records : None or list
+        Lista a la que se añade cada ronda (ver `Telemetry`).
+
+    Returns
+    -------
+    Telemetry
+        Destino de las medidas.
+    """
+    global _telemetry
+    _telemetry.flush()
+    _telemetry = Telemetry(log_file, prometheus_file, interval, records)
+    return _telemetry
+
+def enabled():
+    """`True` si la medición está activada."""
+    return _telemetry.enabled
+
+def current():
+    """Ronda en curso del hilo, o `None`."""
+    return getattr(_local, 'record', None)
+
+def track(kind, **fields):
+    """Contexto de una ronda. Las medidas de dentro (`stage`, `retry`, `size`, `cache`) se acumulan en ella y al salir se guarda.
+
+    Si ya hay una ronda en curso en el hilo (p. ej. un puzle generado al servir otro), se usa esa, añadiéndole `fields`.
+
+    Args
+    ----------
+    kind : str
+        Tipo de ronda (p. ej. `'puzzle'` para la generación o `'serve'` para servir un puzle).
+    **fields
+        Datos de la ronda (p. ej. `difficulty` o `word`).
+
+    Returns
+    -------
+    Record
+        Ronda (o un contexto vacío si la medición está desactivada).
+    """
+    if not _telemetry.enabled:
+        return _NULL
+    record = current()
+    if record is None:
+        return Record(_telemetry, kind, fields)
+    for name, value in fields.items():
+        record.fields.setdefault(name, value)
+    return record
+
+def stage(name):
+    """Contexto que suma su duración a la etapa `name` de la ronda en curso."""
+    record = current() if _telemetry.enabled else None
+    return _NULL if record is None else _Stage(record, name)
+
+def retry():
+    """Cuenta un reintento en la ronda en curso."""
+    record = current() if _telemetry.enabled else None
+    if record is not None:
+        record.retries += 1
+
+def size(name, value):
+    """Guarda el tamaño de una lista (la última medida) en la ronda en curso."""
+    record = current() if _telemetry.enabled else None
+    if record is not None:
+        record.sizes[name] = value
+
+def cache(name, hits=0, misses=0):
+    """Suma aciertos y fallos de una caché en la ronda en curso."""
+    record = current() if _telemetry.enabled else None
+    if record is not None:
+        acc = record.caches.setdefault(name, [0, 0])
+        acc[0] += hits
+        acc[1] += misses
+
+def annotate(**fields):
+    """Añade datos a la ronda en curso."""
+    record = current() if _telemetry.enabled else None
+    if record is not None:
+        record.fields.update(fields)
@@ -1,4 +1,6 @@
-import json, random
+import bisect, csv, functools, itertools, json, math, random, re, threading
+from collections.abc import Mapping
+from .compact import CompactDict, compact_dict, load_compact, write_compact
 
 # Para crear documentación: pdoc --html src/utils.py --force
 
@@ -54,43 +56,234 @@ def df_to_dict(df):
     
     Args
     ----------
-    df : pd.DataFrame
-        DataFrame.
+    df : pd.DataFrame or dict
+        DataFrame (o diccionario de columnas, que se devuelve tal cual).
 
     Returns
     -------
     dict
         Diccionario donde las `keys` son los nombres columnas y los `values` son las columnas (como listas).
     """
+    if isinstance(df, Mapping):
+        return df
     res = {}
     for c in df.columns:
         res[c] = df[c].tolist()
     return res
 
-def words_with_word(drae, target_word):
-    """Lista de todas las palabras que contienen `target_word` en su definición.
+def _parse_column(values):
+    """Valores de una columna del csv como `int` o `float` si todos lo permiten (vacíos como `nan`), o como texto (vacíos como `None`)."""
+    if '' not in values:
+        try:
+            return [int(v) for v in values]
+        except ValueError:
+            pass
+    try:
+        return [float(v) if v else math.nan for v in values]
+    except ValueError:
+        return [v if v else None for v in values]
+
+def read_table(file, columns=None):
+    """Carga un csv como diccionario de columnas (como `df_to_dict(pd.read_csv(file))`, pero sin pandas).
+
+    Args
+    ----------
+    file : str
+        Archivo csv (p. ej. `diccionario_df.csv`).
+    columns : None or iterable
+        Columnas a cargar. Por defecto todas.
+
+    Returns
+    -------
+    dict
+        Diccionario donde las `keys` son los nombres de las columnas y los `values` las columnas (como listas).
+    """
+    with open(file, newline='', encoding='utf-8') as fp:
+        reader = csv.reader(fp)
+        header = next(reader)
+        values = list(zip(*reader)) or [()] * len(header)
+    columns = header if columns is None else set(columns)
+    return {name: _parse_column(column) for name, column in zip(header, values) if name in columns}
+
+def table_rows(table, rows):
+    """Filas `rows` (posiciones, en orden) de un diccionario de columnas.
+
+    Args
+    ----------
+    table : dict
+        Diccionario de columnas (ver `df_to_dict`).
+    rows : iterable
+        Posiciones de las filas.
+
+    Returns
+    -------
+    dict
+        Diccionario de columnas con sólo esas filas.
+    """
+    rows = list(rows)
+    return {c: [values[i] for i in rows] for c, values in table.items()}
+
+def _column(df, column):
+    """Columna de un DataFrame o de un diccionario de columnas, como lista."""
+    values = df[column]
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+def _is_table(obj):
+    """Comprueba si `obj` es un diccionario de columnas (y no una tabla de búsqueda por palabra)."""
+    return isinstance(obj, Mapping) and isinstance(obj.get('word'), list)
+
+def build_id_index(drae):
+    """Índice inverso de `id` a las palabras en cuya definición aparece.
 
     Args
     ----------
     drae : dict
         Diccionario de la RAE.
+
+    Returns
+    -------
+    dict
+        Diccionario donde las `keys` son los `id` y los `values` son listas de tuplas `(palabra, índice de acepción)`, en el orden de `drae`. Para cada palabra sólo se registra la primera acepción que contiene el `id`.
+    """
+    index = {}
+    for word in drae:
+        seen = set() # `id` ya registrados para esta palabra
+        for i, rel_ids in enumerate(drae[word]['rel_ids']): # Para cada acepción
+            for rel_id in rel_ids:
+                if rel_id not in seen: # Sólo la primera acepción (la más común) que contiene el `id`
+                    seen.add(rel_id)
+                    index.setdefault(rel_id, []).append((word, i))
+    return index
+
+def _is_engine(obj):
+    """Comprueba si `obj` es un `DictEngine` (ver `src/engine.py`)."""
+    from .engine import DictEngine
+    return isinstance(obj, DictEngine)
+
+def build_word_lookup(df, columns=('simple_word', 'commonness', 'kinds', 'def_freq')):
+    """Tabla de búsqueda por palabra con los datos de `df`, para no filtrar el DataFrame en cada consulta.
+
+    Args
+    ----------
+    df : pd.DataFrame or dict
+        DataFrame de palabras (o diccionario de columnas).
+    columns : iterable
+        Columnas a guardar.
+
+    Returns
+    -------
+    dict
+        Diccionario donde las `keys` son las palabras y los `values` diccionarios `{columna: valor}`. Si una palabra aparece varias veces se guarda su primera fila.
+    """
+    columns = list(columns)
+    res = {}
+    for word, *values in zip(_column(df, 'word'), *[_column(df, c) for c in columns]):
+        if word not in res: # Primera fila, como `df[df['word'] == word].iloc[0]`
+            res[word] = dict(zip(columns, values))
+    return res
+
+_WORD_ROWS = {} # id(tabla) -> (tabla, filas, {palabra: fila}), de las últimas `_WORD_ROWS_SIZE` tablas consultadas
+_WORD_ROWS_SIZE = 4
+_WORD_ROWS_LOCK = threading.Lock()
+
+def _word_rows(df):
+    """Mapa `{palabra: primera fila}` de un DataFrame o diccionario de columnas, construido una vez por tabla.
+
+    Se guarda la propia tabla (así su `id` no se reutiliza mientras está guardada) y su número de filas, y se reconstruye si cambia.
+    """
+    n = len(df['word'])
+    with _WORD_ROWS_LOCK:
+        cached = _WORD_ROWS.get(id(df))
+        if cached is not None and cached[0] is df and cached[1] == n:
+            return cached[2]
+        rows = {}
+        for i, word in enumerate(_column(df, 'word')):
+            rows.setdefault(word, i) # Primera fila, como `df[df['word'] == word].iloc[0]`
+        _WORD_ROWS.pop(id(df), None)
+        _WORD_ROWS[id(df)] = (df, n, rows)
+        while len(_WORD_ROWS) > _WORD_ROWS_SIZE: # Se olvida la más antigua
+            del _WORD_ROWS[next(iter(_WORD_ROWS))]
+        return rows
+
+def _row_value(df, column, row):
+    """Valor de la fila `row` (posición) de `column` en un DataFrame o diccionario de columnas."""
+    return df[column][row] if isinstance(df, Mapping) else df[column].iat[row]
+
+class _TableLookup(Mapping):
+    """Tabla de búsqueda (como `build_word_lookup`, con sólo `columns`) que lee las filas de un DataFrame o diccionario de columnas sin copiarlas."""
+
+    def __init__(self, df, columns):
+        self.df, self.columns = df, list(columns)
+        self.rows = _word_rows(df)
+
+    def __getitem__(self, word):
+        row = self.rows[word]
+        return {c: _row_value(self.df, c, row) for c in self.columns}
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+def _as_lookup(df, columns):
+    """Tabla de búsqueda de `df`: la propia `df` si ya lo es, el `lookup` de un motor o, para un DataFrame o diccionario de columnas, una vista sobre sus filas (el mapa palabra -> fila se construye una vez por tabla, ver `_word_rows`)."""
+    if _is_engine(df):
+        return df.lookup
+    if isinstance(df, Mapping) and not _is_table(df):
+        return df
+    return _TableLookup(df, columns)
+
+def get_word_info(df, word, column):
+    """Dato `column` de `word`.
+
+    En un DataFrame o diccionario de columnas, la fila de cada palabra se busca en un mapa que se construye en la primera consulta de cada tabla (ver `_word_rows`).
+
+    Args
+    ----------
+    df : pd.DataFrame, dict or DictEngine
+        DataFrame de palabras (o diccionario de columnas), tabla de búsqueda (ver `build_word_lookup`) o motor (se usa su `lookup`).
+    word : str
+        Palabra a buscar en su forma diccionario (ej. `fresa1`).
+    column : str
+        Columna a consultar.
+
+    Returns
+    -------
+    object
+        Valor de la columna para la (primera fila de la) palabra.
+    """
+    if _is_engine(df):
+        df = df.lookup
+    if isinstance(df, Mapping) and not _is_table(df):
+        return df[word][column]
+    return _row_value(df, column, _word_rows(df)[word])
+
+def words_with_word(drae, target_word, index=None):
+    """Lista de todas las palabras que contienen `target_word` en su definición.
+
+    Args
+    ----------
+    drae : dict or DictEngine
+        Diccionario de la RAE (o motor, del que se usan su diccionario y su índice).
     target_word : str
         Palabra que comprobar.
+    index : None or dict
+        Índice inverso de `drae` (ver `build_id_index`). Si no se da, se usa el del motor o el del diccionario compacto, o se construye (recorriendo todo `drae`).
 
     Returns
     -------
     list
         Lista de tuplas: `(palabra, acepción)`
     """
+    if _is_engine(drae):
+        drae, index = drae.drae, (drae.index if index is None else index)
+    if index is None:
+        index = drae.index if isinstance(drae, CompactDict) else build_id_index(drae)
+    if hasattr(drae, 'words_with') and index is drae.index: # Diccionario compacto (o con cambios, ver `delta`): sin crear las entradas
+        return drae.words_with(target_word)
     target_id = drae[target_word]['id']
-    res = []
-    for word in drae:
-        for i in range(len(drae[word]['defs'])): # Para cada acepción
-            rel_ids = drae[word]['rel_ids'][i]
-            if target_id in '|'.join(rel_ids): # Si el 'target_id' está en la acepción, añadir palabra y acepción
-                res.append((word, drae[word]['defs'][i]))
-                break # Con que una acepción tenga la palabra, `word` ya queda registrada (además, con su acepción más común)
-    return res
+    return [(word, drae[word]['defs'][i]) for word, i in index.get(target_id, [])] # Con que una acepción tenga la palabra, `word` ya queda registrada (además, con su acepción más común)
 
 def get_kinds(drae, word):
     """Tipos de la palabra según sus definiciones.
@@ -107,11 +300,7 @@ def get_kinds(drae, word):
     list
         Lista con los tipos de la palabra.
     """
-    abrev = ABREV
-    kinds = {}
-    for kind in ABREV:
-        for abr in abrev[kind]:
-            kinds[abr] = kind
+    kinds = ABREV_KINDS
     res = []
     for d in drae[word]['defs']:
         start = d.split('. ')[1] + '.'
@@ -119,19 +308,56 @@ def get_kinds(drae, word):
             res.append(kinds[start])
     return res
 
+def batch_kinds(drae, words=None):
+    """Tipos de todas las palabras a la vez (mismo resultado que `get_kinds` para cada una).
+
+    Args
+    ----------
+    drae : dict
+        Diccionario de la RAE.
+    words : None or list
+        Palabras a clasificar. Por defecto todas las de `drae`.
+
+    Returns
+    -------
+    dict
+        Diccionario donde las `keys` son las palabras y los `values` las listas con sus tipos.
+    """
+    import numpy as np
+    words = list(drae) if words is None else list(words)
+    kind_names = list(ABREV)
+    kind_codes = {abr: kind_names.index(kind) for abr, kind in ABREV_KINDS.items()}
+    num_defs = np.fromiter((len(drae[word]['defs']) for word in words), dtype=np.int64, count=len(words))
+    owners = np.repeat(np.arange(len(words)), num_defs) # Palabra de cada acepción
+    text = '\0'.join(d for word in words for d in drae[word]['defs']) + '\0'
+    starts = _KIND_ABREV.findall(text) # Un único recorrido: `d.split('. ')[1]` de cada acepción ('' si no tiene)
+    codes = np.fromiter((kind_codes.get(start + '.', -1) for start in starts), dtype=np.int64, count=len(starts))
+    found = codes >= 0
+    keys = owners[found] * len(kind_names) + codes[found]
+    _, first = np.unique(keys, return_index=True) # Primera aparición de cada (palabra, tipo)
+    first.sort()
+    res = {word: [] for word in words}
+    for key in keys[first].tolist():
+        res[words[key // len(kind_names)]].append(kind_names[key % len(kind_names)])
+    return res
+
+_KIND_ABREV = re.compile(r'[^\0]*?\. ([^\0]*?)(?:\. [^\0]*)?\0|[^\0]*\0') # Texto entre el primer y el segundo `. ` de cada acepción (separadas por `\0`)
+
 def leave_single_kind(df):
     """Deja únicamente palabras de 1 tipo (incluyendo polisemia y homonimia).
 
     Args
     ----------
-    df : pd.DataFrame
-        DataFrame de palabras.
+    df : pd.DataFrame or dict
+        DataFrame de palabras (o diccionario de columnas, que se filtra sin pandas).
 
     Returns
     -------
-    pd.DataFrame
-        DataFrame de palabras con sólo 1 tipo.
+    pd.DataFrame or dict
+        DataFrame de palabras (o diccionario de columnas) con sólo 1 tipo.
     """
+    if isinstance(df, Mapping):
+        return table_rows(df, single_kind_rows(df))
     # Reducir en homonimia
     aux = df.groupby('simple_word')['kinds'].nunique().reset_index()
     aux = aux[aux['kinds'] == 1] # Palabras con sólo 1 tipo
@@ -140,6 +366,24 @@ def leave_single_kind(df):
     df = df[~df['kinds'].str.contains(',')] # Eliminar las que tengan `,` en el tipo
     return df
 
+def single_kind_rows(df):
+    """Filas (posiciones) de las palabras de 1 tipo, como en `leave_single_kind`.
+
+    Args
+    ----------
+    df : dict
+        Diccionario de columnas de palabras.
+
+    Returns
+    -------
+    list
+        Posiciones de las filas, en orden.
+    """
+    group_kinds = {}
+    for simple_word, kinds in zip(df['simple_word'], df['kinds']):
+        group_kinds.setdefault(simple_word, set()).add(kinds)
+    return [i for i, (simple_word, kinds) in enumerate(zip(df['simple_word'], df['kinds'])) if len(group_kinds[simple_word]) == 1 and ',' not in kinds]
+
 def set_commonness(row):
     """Determina cuánto de común es una palabra en un rango del 0 (muy rara) al 4 (común).
 
@@ -163,69 +407,177 @@ def set_commonness(row):
         return 1
     return 0 # Casi no aparece como palabra
 
-def exclude_group(drae, group):
+def batch_commonness(df):
+    """Rareza de todas las palabras a la vez (mismo resultado que `set_commonness` para cada fila).
+
+    Args
+    ----------
+    df : pd.DataFrame
+        DataFrame de palabras con `def_perc`, `crea_perc`, `ngram_perc` y `def_freq`.
+
+    Returns
+    -------
+    pd.Series
+        Nivel de común de cada fila.
+    """
+    import numpy as np
+    import pandas as pd
+    def_perc, crea_perc, ngram_perc, def_freq = (df[c].to_numpy(dtype=float) for c in ('def_perc', 'crea_perc', 'ngram_perc', 'def_freq'))
+    conditions = [def_perc >= 95, # Palabras comodín (aparecen en muchas definiciones)
+                  (crea_perc >= 80) & (ngram_perc >= 80), # Muy frecuente
+                  (crea_perc >= 50) & (ngram_perc >= 50), # Menos frecuente
+                  ((crea_perc >= 30) & (ngram_perc >= 30)) | (def_freq >= 5)] # Menos frecuente aún o no tan frecuente pero aparece en más de 5 definiciones
+    return pd.Series(np.select(conditions, [4, 3, 2, 1], default=0), index=df.index) # Casi no aparece como palabra
+
+@functools.lru_cache(maxsize=32)
+def _compile_terms(terms):
+    """Compila los términos en una única expresión regular (en forma de trie) que detecta si aparece alguno."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for c in term:
+            if '' in node: # Ya hay un término más corto que es prefijo de este (con detectar ese basta)
+                break
+            node = node.setdefault(c, {})
+        else:
+            node.clear() # Los términos más largos que empiezan por este sobran
+            node[''] = True
+    def to_regex(node):
+        if '' in node:
+            return ''
+        alts = [re.escape(c) + to_regex(child) for c, child in sorted(node.items())]
+        return alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+    return re.compile(to_regex(trie) if trie else '(?!)') # Sin términos: no encuentra nada
+
+def compile_group(group):
+    """Compila un grupo de abreviaturas en un patrón que recorre cada texto una sola vez.
+
+    Args
+    ----------
+    group : list
+        Grupo de abreviaturas.
+
+    Returns
+    -------
+    re.Pattern
+        Patrón que encuentra cualquiera de las abreviaturas (como subcadena, igual que `term in definition`).
+    """
+    return _compile_terms(tuple(sorted(set(group))))
+
+def match_group(definitions, group, batch_size=4096):
+    """Comprueba qué definiciones contienen algún término del grupo.
+
+    Las definiciones se procesan por lotes: cada lote se une en un único texto que se recorre con el patrón compilado, saltando a la siguiente definición tras cada coincidencia.
+
+    Args
+    ----------
+    definitions : list
+        Lista de definiciones.
+    group : list or re.Pattern
+        Grupo de abreviaturas (o patrón ya compilado con `compile_group`).
+    batch_size : int
+        Número de definiciones por lote.
+
+    Returns
+    -------
+    list of bool
+        `True` para las definiciones que contienen algún término.
+    """
+    pattern = group if isinstance(group, re.Pattern) else compile_group(group)
+    res = []
+    for start in range(0, len(definitions), batch_size):
+        batch = definitions[start:start + batch_size]
+        offsets = list(itertools.accumulate((len(d) + 1 for d in batch), initial=0)) # Inicio de cada definición en `text`
+        text = '\n'.join(batch)
+        found = [False] * len(batch)
+        pos = 0
+        while (m := pattern.search(text, pos)) is not None:
+            i = bisect.bisect_right(offsets, m.start()) - 1 # Definición de la coincidencia
+            found[i] = True
+            pos = offsets[i + 1] # Siguiente definición
+            if pos > len(text): # Era la última (un término vacío coincidiría también al final)
+                break
+        res.extend(found)
+    return res
+
+def exclude_group(drae, group, rebuild=False, batch_size=4096):
     """Excluye acepciones que pertenecen a un grupo determinado de tecnicismos (p. ej. regionalismos).
 
     Args
     ----------
-    drae : dict
+    drae : dict or CompactDict
         Diccionario de la RAE.
     group : list
         Grupo de abreviaturas que se quieren eliminar.
+    rebuild : bool
+        Si es `True` se devuelve un diccionario nuevo y `drae` no se modifica. Si no, `drae` se modifica en el sitio (salvo si es compacto: entonces siempre se devuelve uno nuevo).
+    batch_size : int
+        Número de definiciones por lote (ver `match_group`).
 
     Returns
     -------
     dict
         Diccionario con términos del grupo excluídos. Si una palabra pierde todas sus acepciones se quita del diccionario.
     """
-    words_to_remove = []
-    for word in drae:
-        i = 0 # Índice de acepción a borrar
-        j = 0 # Índice total de acepciones, para saber cuándo he llegado al final
-        total_len = len(drae[word]['defs']) # Total de acepciones (en el momento inicial)
-        while j < total_len:
-            definition = drae[word]['defs'][i]
-            deleted = False
-            for term in group: # Para cada término a excluir
-                if term in definition: # Si el término aparece en la acepción
-                    del drae[word]['defs'][i]
-                    del drae[word]['abrev'][i]
-                    del drae[word]['rel_ids'][i]
-                    deleted = True
-                    break
-            if not deleted:
-                i += 1
-            j += 1
-        if len(drae[word]['defs']) == 0: # Si la palabra ha perdido todas las acepciones, eliminar palabra
-            words_to_remove.append(word)
-    for word in words_to_remove:
-        del drae[word]
-    return drae
-
-def get_random_word(df, commonness=None, appear_lim=None):
+    pattern = compile_group(group)
+    if isinstance(drae, CompactDict): # Sólo lectura: siempre se devuelve uno nuevo, también compacto
+        return drae.select([not m for m in match_group(drae.definitions(), pattern, batch_size=batch_size)])
+    entries = [(word, drae[word]) for word in drae]
+    excluded = iter(match_group([d for word, entry in entries for d in entry['defs']], pattern, batch_size=batch_size))
+    res = {} if rebuild else drae
+    for word, entry in entries:
+        keep = [i for i in range(len(entry['defs'])) if not next(excluded)] # Acepciones que no tienen ningún término
+        if not keep: # Si la palabra ha perdido todas las acepciones (o no tenía), eliminar palabra
+            if not rebuild:
+                del res[word]
+            continue
+        if len(keep) == len(entry['defs']):
+            if rebuild:
+                res[word] = entry
+            continue
+        if rebuild:
+            entry = dict(entry)
+            res[word] = entry
+        for key in ('defs', 'abrev', 'rel_ids'):
+            entry[key] = [entry[key][i] for i in keep]
+    return res
+
+def get_random_word(df, commonness=None, appear_lim=None, targets=None, rng=None):
     """Selecciona palabra aleatoria de rareza `commonness` y límite inferior de apariciones `appear_lim`.
 
     Args
     ----------
-    df : pd.DataFrame
-        DataFrame de palabras.
+    df : pd.DataFrame, dict or DictEngine
+        DataFrame de palabras (o diccionario de columnas, o motor, del que se usa su `df`).
     commonness : None or int
         Número del `1` al `4` (`0` y `5` suelen estar excluídos).
     appear_lim : None or int
         Número mínimo de apariciones en las que la palabra puede aparecer.
+    targets : None or list
+        Tabla de palabras objetivo viables (ver `build_target_tables`). Si se da, se elige directamente de ella y se ignoran el resto de parámetros.
+    rng : None or random.Random
+        Generador aleatorio (por defecto el del módulo `random`).
 
     Returns
     -------
     str
         Palabra aleatoria dentro de los parámetros datos.
     """
+    rng = rng or random
+    if targets is not None:
+        return rng.choice(targets)
+    if _is_engine(df):
+        df = df.df
+    if isinstance(df, Mapping): # Diccionario de columnas: sin pandas
+        words = [word for word, c, freq in zip(df['word'], df['commonness'], df['def_freq']) if (commonness is None or c == commonness) and (not appear_lim or freq >= appear_lim)]
+        return rng.choice(words)
     temp = df.copy()
     # print(commonness, appear_lim)
     if commonness is not None: # Si la rareza está definida
         temp = df[df['commonness'] == commonness].copy()
     if appear_lim: # Si el límite apariciones está definido
         temp = temp[temp['def_freq'] >= appear_lim]
-    return temp.sample(1)['word'].iloc[0]
+    return temp.sample(1, random_state=rng.randrange(2**32) if rng is not random else None)['word'].iloc[0]
 
 def get_acep_num(acep): 
     """Número de la acepción.
@@ -253,15 +605,16 @@ def add_commonness(www, df):
     ----------
     www: list of tuple
         Lista de soluciones.
-    df: pd.DataFrame
-        DataFrame de palabras.
+    df: pd.DataFrame, dict or DictEngine
+        DataFrame de palabras, tabla de búsqueda (ver `build_word_lookup`) o motor. Un DataFrame (o diccionario de columnas) se indexa por palabra una sola vez, en la primera llamada con esa tabla; mejor pasar la tabla de búsqueda o el motor.
 
     Returns
     -------
     list of tuple
         Lista de tripletas `(palabra, acepción, rareza)`.
     """
-    return [(word, acep, df[df['word'] == word]['commonness'].iloc[0]) for word, acep in www] # Asociar rareza a palabras encontradas
+    lookup = _as_lookup(df, ['commonness']) # Una búsqueda por palabra (sin recorrer `df` en cada llamada)
+    return [(word, acep, lookup[word]['commonness']) for word, acep in www] # Asociar rareza a palabras encontradas
 
 def limit_defs(www, limit_acep=None):
     """Limita el ordinal de las acepciones.
@@ -280,7 +633,131 @@ def limit_defs(www, limit_acep=None):
     """
     return [(word, acep) for word, acep in www if get_acep_num(acep) <= (limit_acep if limit_acep else 100)] # Limita a acepciones con ordinal menor o igual que 'limit_acep'
 
-def pick_solutions(solutions, target_word, hints, avoid_common=False):
+def is_valid_hint(word, target_word, avoid_common=False):
+    """Decide si `word` puede usarse como pista de `target_word`.
+
+    Args
+    ----------
+    word: str
+        Palabra candidata a pista.
+    target_word: str
+        Palabra objetivo.
+    avoid_common: bool
+        Determina si descartar `word` cuando su deletreo inicial (primeras tres letras) coincide con la `target_word`.
+
+    Returns
+    -------
+    bool
+        `True` si la palabra no es la misma que la buscada (ni empieza igual, si `avoid_common`).
+    """
+    return word != target_word and (not avoid_common or word[:3] != target_word[:3])
+
+def hint_histogram(drae, target_word, lookup, index, acep_limits=(None,), avoid_common=True):
+    """Cuenta las pistas disponibles para `target_word` por rareza, para cada límite de acepciones.
+
+    Args
+    ----------
+    drae : dict
+        Diccionario de la RAE.
+    target_word : str
+        Palabra objetivo.
+    lookup : dict
+        Tabla de búsqueda con la rareza de cada palabra (ver `build_word_lookup`).
+    index : dict
+        Índice inverso de `drae` (ver `build_id_index`).
+    acep_limits : iterable
+        Límites del ordinal de las acepciones (como en `limit_defs`).
+    avoid_common: bool
+        Como en `pick_solutions`.
+
+    Returns
+    -------
+    None or dict
+        `{límite: {rareza: número de pistas}}`. `None` si alguna pista no tiene rareza conocida.
+    """
+    res = {limit: {} for limit in acep_limits}
+    for word, acep in words_with_word(drae, target_word, index=index):
+        if not is_valid_hint(word, target_word, avoid_common):
+            continue
+        if word not in lookup: # `add_commonness` fallaría con esta palabra
+            return None
+        num = get_acep_num(acep)
+        commonness = lookup[word]['commonness']
+        for limit in res:
+            if num <= (limit if limit else 100): # Mismo criterio que `limit_defs`
+                res[limit][commonness] = res[limit].get(commonness, 0) + 1
+    return res
+
+def build_target_tables(drae, df, full_df, index, avoid_common=True):
+    """Tablas de palabras objetivo viables para cada dificultad (`HINT_TYPES`).
+
+    Una palabra es viable si tiene la rareza (`TARGET_COMMONNESS`) y las apariciones requeridas, y entre sus soluciones (limitadas por `ACEP_LIMIT`) hay suficientes pistas de cada rareza. Así, `pick_solutions` nunca falla con una palabra de la tabla.
+
+    Args
+    ----------
+    drae : dict
+        Diccionario de la RAE.
+    df : pd.DataFrame or dict
+        DataFrame (o diccionario de columnas) de palabras objetivo posibles.
+    full_df : pd.DataFrame or dict
+        DataFrame (o tabla de búsqueda, ver `build_word_lookup`) de todas las palabras, de donde se toman las rarezas de las pistas, como en `add_commonness`.
+    index : dict
+        Índice inverso de `drae` (ver `build_id_index`).
+    avoid_common: bool
+        Como en `pick_solutions`.
+
+    Returns
+    -------
+    dict
+        `{dificultad: lista de palabras objetivo}`.
+    """
+    lookup = full_df if isinstance(full_df, Mapping) and not _is_table(full_df) else build_word_lookup(full_df, ['commonness']) # Recorre todas las palabras de todas formas: mejor construirla entera una vez
+    tables = {difficulty: [] for difficulty in HINT_TYPES}
+    for word, c, freq in zip(_column(df, 'word'), _column(df, 'commonness'), _column(df, 'def_freq')):
+        for difficulty in viable_difficulties(drae, word, c, freq, lookup, index, avoid_common=avoid_common):
+            tables[difficulty].append(word)
+    return tables
+
+def viable_difficulties(drae, word, commonness, def_freq, lookup, index, avoid_common=True):
+    """Dificultades para las que `word` es una palabra objetivo viable (ver `build_target_tables`).
+
+    Args
+    ----------
+    drae : dict
+        Diccionario de la RAE.
+    word : str
+        Palabra objetivo.
+    commonness : int
+        Rareza de la palabra.
+    def_freq : int
+        Número de definiciones en las que aparece la palabra.
+    lookup : dict
+        Tabla de búsqueda de todas las palabras (ver `build_word_lookup`).
+    index : dict
+        Índice inverso de `drae` (ver `build_id_index`).
+    avoid_common: bool
+        Como en `pick_solutions`.
+
+    Returns
+    -------
+    list
+        Dificultades (en el orden de `HINT_TYPES`).
+    """
+    if commonness not in TARGET_COMMONNESS.values() or word not in drae:
+        return []
+    hist = hint_histogram(drae, word, lookup, index, set(ACEP_LIMIT.values()), avoid_common=avoid_common)
+    if hist is None:
+        return []
+    res = []
+    for difficulty, hints in HINT_TYPES.items():
+        if commonness != TARGET_COMMONNESS[difficulty] or def_freq < len(hints): # Mismos filtros que `get_random_word`
+            continue
+        available = hist[ACEP_LIMIT[difficulty]]
+        if all(available.get(h, 0) >= hints.count(h) for h in set(hints)): # Hay pistas suficientes de cada rareza
+            res.append(difficulty)
+    return res
+
+def pick_solutions(solutions, target_word, hints, avoid_common=False, rng=None):
     """Decide si en las soluciones están las dificultades deseadas, en cuyo caso devuelve una muestra en orden para mostrar. La `target_word` no puede aparecer entre las soluciones.
 
     Args
@@ -293,26 +770,114 @@ def pick_solutions(solutions, target_word, hints, avoid_common=False):
         Rareza de las pistas.
     avoid_common: bool
         Determina si eliminar candidatos que su deletreo inicial (primeras tres letras) coincida con la `target_word` (P. ej., 'pulmón' y 'pulmonar').
+    rng : None or random.Random
+        Generador aleatorio (por defecto el del módulo `random`).
 
     Returns
     -------
     bool or list of tuple
         Devuelve una muestra de soluciones con las rarezas solicitadas. En caso de no ser posible devuelve `False`.
     """
-    count = {h: hints.count(h) for h in set(hints)}
-    sol_count = {h: [] for h in set(hints)}
-    random.shuffle(solutions)
+    return draw_hints(bucket_solutions(solutions, target_word, avoid_common), hints, rng=rng)
+
+def bucket_solutions(solutions, target_word, avoid_common=False):
+    """Agrupa las soluciones por rareza, quitando las que no pueden ser pista de `target_word` (ver `is_valid_hint`).
+
+    Args
+    ----------
+    solutions: list of tuple
+        Lista de soluciones con rareza: [(palabra, definición, rareza)].
+    target_word: str
+        Palabra objetivo.
+    avoid_common: bool
+        Como en `pick_solutions`.
+
+    Returns
+    -------
+    dict
+        Diccionario donde las `keys` son las rarezas y los `values` tuplas de soluciones (en el orden de `solutions`).
+    """
+    res = {}
     for sol in solutions:
-        diff = sol[-1]
-        if diff in sol_count and len(sol_count[diff]) < count[diff] and sol[0] != target_word and (avoid_common and sol[0][:3] != target_word[:3]): # Si dificultad adecuada y límite no alcanzado y palabra no misma que la buscada e inicio de palabra no coincide
-            sol_count[diff].append(sol)
-    for h in sol_count:
-        if len(sol_count[h]) < count[h]: # Si no hay suficientes pistas
-            return False
-    res = []
-    for hint in hints:
-        res.append(sol_count[hint].pop(0)) # Añade solución a la vez que la elimina del diccionario
-    return res
+        if is_valid_hint(sol[0], target_word, avoid_common):
+            res.setdefault(sol[-1], []).append(sol)
+    return {h: tuple(sols) for h, sols in res.items()}
+
+def draw_hints(buckets, hints, rng=None):
+    """Saca (sin reemplazo) las pistas de cada rareza, en tiempo proporcional al número de pistas.
+
+    Args
+    ----------
+    buckets: dict
+        Soluciones por rareza (ver `bucket_solutions`).
+    hints: list
+        Rareza de las pistas.
+    rng : None or random.Random
+        Generador aleatorio (por defecto el del módulo `random`).
+
+    Returns
+    -------
+    bool or list of tuple
+        Soluciones en el orden de `hints`. `False` si alguna rareza no tiene suficientes (sin sacar nada).
+    """
+    rng = rng or random
+    count = {h: hints.count(h) for h in set(hints)}
+    if any(len(buckets.get(h, ())) < n for h, n in count.items()): # Imposible: se sabe por los tamaños
+        return False
+    drawn = {h: rng.sample(buckets[h], n) for h, n in sorted(count.items())}
+    return [drawn[h].pop() for h in hints]
+
+def _draw_combination(bucket, n, avoid, rng):
+    """Saca `n` soluciones de `bucket` (en orden aleatorio), distintas como conjunto de `avoid` si hay otra combinación posible."""
+    combo = rng.sample(bucket, n)
+    while avoid is not None and frozenset(combo) == avoid and math.comb(len(bucket), n) > 1:
+        combo = rng.sample(bucket, n)
+    return combo
+
+def iter_hint_sets(buckets, hints, rng=None, max_misses=8):
+    """Genera conjuntos de pistas distintos (p. ej. para cambiar las pistas de un mismo puzle) hasta agotarlos.
+
+    Mientras quede al menos la mitad de los conjuntos por sacar, cada uno se saca al azar con una combinación distinta de la anterior en cada rareza (si la hay), así que dos conjuntos seguidos cambian en todas las rarezas, y se vuelve a sacar si ya ha salido (como mucho la mitad de las veces). Los que quedan se sacan después en orden aleatorio, sin repetir ninguno.
+
+    Args
+    ----------
+    buckets: dict
+        Soluciones por rareza (ver `bucket_solutions`).
+    hints: list
+        Rareza de las pistas.
+    rng : None or random.Random
+        Generador aleatorio (por defecto el del módulo `random`).
+    max_misses : int
+        Repetidos seguidos tras los que se deja de exigir que cambien todas las rarezas (puede que ya no quede ningún conjunto así).
+
+    Returns
+    -------
+    generator
+        Listas de soluciones en el orden de `hints` (como `draw_hints`), cada una con un conjunto de pistas distinto.
+    """
+    rng = rng or random
+    count = {h: hints.count(h) for h in set(hints)}
+    if any(len(buckets.get(h, ())) < n for h, n in count.items()):
+        return
+    order = sorted(count)
+    total = math.prod(math.comb(len(buckets[h]), count[h]) for h in order)
+    seen, last, misses = set(), {}, 0
+    while 2 * len(seen) < total:
+        drawn = {h: _draw_combination(buckets[h], count[h], last.get(h) if misses < max_misses else None, rng) for h in order}
+        key = frozenset(sol for h in order for sol in drawn[h])
+        if key in seen:
+            misses += 1
+            continue
+        seen.add(key)
+        last, misses = {h: frozenset(drawn[h]) for h in order}, 0
+        yield [drawn[h].pop() for h in hints]
+    # El resto (menos de la mitad): se enumeran los que faltan y se barajan
+    rest = [combos for combos in itertools.product(*(itertools.combinations(buckets[h], count[h]) for h in order))
+            if frozenset(sol for combo in combos for sol in combo) not in seen]
+    rng.shuffle(rest)
+    for combos in rest:
+        drawn = {h: rng.sample(combo, len(combo)) for h, combo in zip(order, combos)}
+        yield [drawn[h].pop() for h in hints]
 
 def show_letter(word, index):
     """Muestra letra `index` de `word` (con texto de acompañamiento).
@@ -347,16 +912,17 @@ def show_words(solutions, df, interval=(0,-1)):
     ----------
     solutions : list of tuple
         Lista de tripletas `(palabra, acepción, rareza)`.
-    df: pd.DataFrame
-        DataFrame de palabras.
+    df: pd.DataFrame, dict or DictEngine
+        DataFrame de palabras, tabla de búsqueda (ver `build_word_lookup`) o motor.
     interval: tuple
         Pareja de índices de las soluciones a mostrar. Para cubrir todas ellas
     """
     start = interval[0]
     end = interval[-1] + (0 if interval[-1] > 0 else len(solutions)+1)
+    lookup = _as_lookup(df, ['simple_word'])
     for i, (word, definition, commonness) in enumerate(solutions):
         if start <= i and i < end:
-            print(f"Palabra {i+1}: {df[df['word'] == word]['simple_word'].iloc[0]} ({'★'*commonness if commonness > 0 else '💀'})")
+            print(f"Palabra {i+1}: {lookup[word]['simple_word']} ({'★'*commonness if commonness > 0 else '💀'})")
             
 def show_content(solutions, df):
     """Muestra las acepciones de las soluciones (con texto de acompañamiento).
@@ -365,14 +931,22 @@ def show_content(solutions, df):
     ----------
     solutions : list of tuple
         Lista de tripletas `(palabra, acepción, rareza)`.
+    df: pd.DataFrame, dict or DictEngine
+        DataFrame de palabras, tabla de búsqueda (ver `build_word_lookup`) o motor.
     """
+    lookup = _as_lookup(df, ['simple_word'])
     for i, (word, definition, commonness) in enumerate(solutions):
-        print(f"Palabra {i+1}: {df[df['word'] == word]['simple_word'].iloc[0]} ({'★'*commonness if commonness > 0 else '💀'})")
+        print(f"Palabra {i+1}: {lookup[word]['simple_word']} ({'★'*commonness if commonness > 0 else '💀'})")
         print(f" > {definition}\n")
 
+_ACCENTS = str.maketrans('áéíóú', 'aeiou') # Eliminar tildes
+
+@functools.lru_cache(maxsize=4096)
 def modify_def(target_word, definition, l=5):
     """Modifica la definición para ocultar target_word.
 
+    El resultado se guarda en caché para cada `(target_word, definition, l)`.
+
     Args
     ----------
     target_word : str
@@ -387,15 +961,11 @@ def modify_def(target_word, definition, l=5):
     str
         Definición modificada.
     """
-    modified_def = ''
     l = min(l, len(target_word) - 1) # Longitud de la comparación
-    words_in_def = definition.replace(',', ' ,').replace('.', ' .').replace(':', ' :').split(' ')
-    for w in words_in_def:
-        simplified_w = w.lower().replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u') # Eliminar tildes
-        if simplified_w[:l] == target_word.lower().replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')[:l]:
-            modified_def += '■' + ' '
-        else:
-            modified_def += w + ' '
+    prefix = target_word.lower().translate(_ACCENTS)[:l]
+    spaced = definition.replace(',', ' ,').replace('.', ' .').replace(':', ' :')
+    folded = spaced.lower().translate(_ACCENTS).split(' ') # Minúsculas y sin tildes, normalizado una sola vez (mismas palabras que `spaced`)
+    modified_def = ' '.join('■' if f[:l] == prefix else w for f, w in zip(folded, spaced.split(' '))) + ' '
     return modified_def.replace(' ,', ',').replace(' .', '.').replace(' :', ':')
             
 ABR_VERB = ['aux.', 'copulat.', 'impers.', 'intr.', 'prnl.', 'tr.', 'part.'] # Verbos
@@ -412,6 +982,12 @@ ABR_ELEM = ['elem.', 'pref.', 'suf.'] # Elementos compositivos
 ABR_EXPR = ['expr.'] # Expresiones
 
 ABREV = {'sust': ABR_SUST, 'verb': ABR_VERB, 'adj': ABR_ADJ, 'adv': ABR_ADV, 'prep': ABR_PREP, 'art': ABR_ART, 'pron': ABR_PRON, 'interj': ABR_INTERJ, 'conj': ABR_CONJ, 'onomat': ABR_ONOMAT, 'elem': ABR_ELEM, 'expr': ABR_EXPR}
+ABREV_KINDS = {abr: kind for kind in ABREV for abr in ABREV[kind]} # Abreviatura -> tipo
+
+# Parámetros de cada dificultad
+TARGET_COMMONNESS = {'easy': 4, 'normal': 3, 'hard': 2, 'extreme': 2, 'impossible': 1} # Rareza de la palabra objetivo
+ACEP_LIMIT = {'easy': 1, 'normal': 1, 'hard': 3, 'extreme': 5, 'impossible': None} # Límite de acepciones de la palabra objetivo (cuantas menos acepciones tenga menos variables sus usos)
+HINT_TYPES = {'easy': [4, 4, 3, 4], 'normal': [4, 4, 3, 4], 'hard': [4, 3, 2, 3], 'extreme': [2, 2, 1, 0, 3], 'impossible': [2, 1, 1, 0, 3]} # Rareza de las pistas
 
 ABECEDARIO = ['a1', 'be1', 'ce1', 'de1', 'e1', 'efe', 'ge1', 'hache', 'i', 'jota1', 'ka', 'ele1', 'eme1', 'ene', 'eñe', 'o1', 'pe', 'cu1', 'erre1', 'ese1', 'te1', 'u1', 'uve', 'equis', 'y', 'zeta1']
 
@@ -0,0 +1,117 @@
+import json, time
+
+# Comprobación de puzles con más de una respuesta válida.
+# Auditar un archivo de puzles (ver `generate.py`): python -m src.validate puzzles.jsonl
+
+_EMPTY = frozenset()
+
+class AmbiguityChecker:
+    """Detecta puzles ambiguos: otras palabras objetivo posibles que aparecen en todas las acepciones de las pistas.
+
+    Al crearse precalcula, para cada acepción del diccionario, el conjunto de `id` de palabras objetivo que contiene, de modo que comprobar un puzle sólo cuesta unas intersecciones de conjuntos pequeños.
+
+    No usa `graph.DefGraph.common_words`: el grafo guarda una arista por par de palabras (con la primera acepción que las une) y cruza todas las acepciones de cada palabra, mientras que un puzle muestra una acepción concreta de cada pista. Con el grafo, una palabra que aparece en otra acepción de la pista contaría como alternativa, y una que aparece en la acepción mostrada pero también en una anterior quedaría registrada con la acepción equivocada.
+
+    Args
+    ----------
+    drae : dict
+        Diccionario de la RAE (el mismo con el que se generan los puzles).
+    targets : iterable
+        Palabras objetivo posibles (p. ej. las `sust` de `DictEngine.df`).
+    lookup : None or dict
+        Tabla de búsqueda (ver `utils.build_word_lookup`). Si se da, no se cuentan como alternativas las palabras que se escriben igual que la objetivo (homónimos).
+    """
+
+    def __init__(self, drae, targets, lookup=None):
+        self.lookup = lookup
+        self.id_to_word = {drae[w]['id']: w for w in targets if w in drae}
+        self.acep_sets = {} # {palabra: {acepción: ids de palabras objetivo}}
+        for word in drae:
+            entry = drae[word]
+            sets = {}
+            for definition, rel_ids in zip(entry['defs'], entry['rel_ids']):
+                ids = frozenset(r for r in rel_ids if r in self.id_to_word)
+                sets[definition] = ids if ids else _EMPTY
+            self.acep_sets[word] = sets
+
+    @classmethod
+    def from_engine(cls, engine):
+        """Comprobador para los puzles de un `DictEngine`."""
+        return cls(engine.drae, engine.df['word'], lookup=engine.lookup)
+
+    def alternatives(self, puzzle):
+        """Otras respuestas válidas de un puzle.
+
+        Args
+        ----------
+        puzzle : dict
+            Puzle (ver `DictEngine.new_puzzle`), con `word` y `solutions`.
+
+        Returns
+        -------
+        list
+            Palabras objetivo (distintas de la del puzle) que aparecen en todas las acepciones de las pistas.
+        """
+        sets = sorted((self.acep_sets[word][acep] for word, acep, *_ in puzzle['solutions']), key=len)
+        if not sets:
+            return []
+        common = sets[0].intersection(*sets[1:])
+        target = puzzle['word']
+        show_word = self.lookup[target]['simple_word'] if self.lookup is not None and target in self.lookup else None
+        res = []
+        for r in common:
+            word = self.id_to_word[r]
+            if word != target and (show_word is None or self.lookup.get(word, {}).get('simple_word') != show_word): # Los homónimos de la objetivo son la misma respuesta
+                res.append(word)
+        return sorted(res)
+
+    def is_ambiguous(self, puzzle):
+        """`True` si el puzle tiene otras respuestas válidas."""
+        return bool(self.alternatives(puzzle))
+
+    def audit(self, puzzles):
+        """Comprueba muchos puzles.
+
+        Args
+        ----------
+        puzzles : iterable
+            Puzles.
+
+        Returns
+        -------
+        dict
+            `total`, `ambiguous`, `seconds`, `rate` (puzles por segundo) y `alternatives` (`{palabra objetivo: alternativas}` de los ambiguos).
+        """
+        start = time.perf_counter()
+        total, found = 0, {}
+        for puzzle in puzzles:
+            total += 1
+            alternatives = self.alternatives(puzzle)
+            if alternatives:
+                found[puzzle['word']] = alternatives
+        seconds = time.perf_counter() - start
+        return {'total': total, 'ambiguous': len(found), 'seconds': seconds, 'rate': total / seconds if seconds else float('inf'), 'alternatives': found}
+
+def read_puzzles(file):
+    """Lee puzles de un archivo JSONL."""
+    with open(file, encoding='utf-8') as fp:
+        for line in fp:
+            if line.strip():
+                yield json.loads(line)
+
+if __name__ == '__main__':
+    import argparse
+    from src.engine import DictEngine
+    parser = argparse.ArgumentParser(description='Audita puzles (JSONL) buscando respuestas alternativas.')
+    parser.add_argument('puzzles', nargs='+')
+    parser.add_argument('--json', default='data/diccionario.json')
+    parser.add_argument('--csv', default='data/diccionario_df.csv')
+    parser.add_argument('--compact', default='data/diccionario.bin')
+    parser.add_argument('--kind', default='sust')
+    args = parser.parse_args()
+    checker = AmbiguityChecker.from_engine(DictEngine.load(args.json, args.csv, compact_file=args.compact, kind=args.kind))
+    puzzles = [p for file in args.puzzles for p in read_puzzles(file)]
+    report = checker.audit(puzzles)
+    for word, alternatives in report['alternatives'].items():
+        print(f'{word}: {", ".join(alternatives)}')
+    print(f"{report['ambiguous']}/{report['total']} ambiguos ({report['rate']:.0f} puzles/s)")
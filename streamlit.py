@@ -1,7 +1,10 @@
 import streamlit as st
-import pandas as pd
-import copy, random, time
+import random, sys, time
 import src.utils as utils
+from src.engine import DictEngine
+from src.pool import PuzzlePool
+from src.delta import DeltaFeed
+from src import telemetry # Opt-in timings (set RAE_TELEMETRY_LOG and/or RAE_TELEMETRY_PROM)
 
 st.set_page_config(
     page_title="Denominador común",
@@ -36,41 +39,27 @@ with st.sidebar:
             - Para cambiar de dificultad a mitad de partida carga de nuevo la página. Tu progreso se perderá.""")
 
 # Load dictionaries
-@st.cache_data(show_spinner=False) # Cache data so it doesn't have to be loaded every time
-def load_dicts():
-    drae = utils.load_dict('data/diccionario.json')
-    df = pd.read_csv('data/diccionario_df.csv')
-    my_drae = copy.deepcopy(drae)
-    my_df = df.copy()    
-
-    ### Operate with the dictionary
-    # Remove all words that can have varios `kinds`
-    my_df = utils.leave_single_kind(my_df)
-    ########################## "muestra", "habla"??????????
-
-    # Remove extremely common words (they are like wildcard words)
-    # my_df = my_df[my_df['commonness'] != 4]
-    # Remove extremely uncommon words (they are unknown)
-    my_df = my_df[my_df['commonness'] != 0]
-
-    # Remove regional and other words
-    excl_group = dict()
-    excl_group.update(utils.ABR_REG) # Quitar regionalismos
-    excl_group.update(utils.ABR_TEMA) # Quitar temas
-    excl_group.update(utils.ABR_DESUS) # Quitar desusadas
-    my_drae = utils.exclude_group(my_drae, excl_group)
-
-    ### Apply decisions and work with df
-    # Restrict the df to the words in the dictionary
-    my_df = my_df[my_df['word'].isin(my_drae.keys())]
-
-    # Restrict the kind of words
-    kind = 'sust' # 'sust', 'verb', 'adj', 'adv', 'prep', 'art', 'pron', 'interj', 'conj', 'onomat', 'elem', 'expr'
-    my_df = my_df[my_df['kinds'] == kind] # TODO: 'la' me ha salido como palabra (y 'pesar')
-    return my_drae, my_df, df
+@st.cache_resource(show_spinner=False) # One shared read-only engine per process (no copies on rerun); restarts load the preprocessed snapshot from data/cache
+def load_engine():
+    return DictEngine.load('data/diccionario.json', 'data/diccionario_df.csv', compact_file='data/diccionario.bin', kind='sust')
+
+@st.cache_resource(show_spinner=False) # Ready puzzles for every difficulty, refilled in the background; puzzles with other valid answers are thrown away
+def load_pool(_engine):
+    return PuzzlePool(_engine, size=8, checker=True, reject_ambiguous=True).start()
+
+@st.cache_resource(show_spinner=False) # Corrections appended to this file are applied on the next rerun, without reloading (see src/delta.py)
+def load_feed():
+    return DeltaFeed('data/cambios.jsonl')
 
 with st.spinner("Leyendo el diccionario..."):
-    my_drae, my_df, df = load_dicts()
+    engine = load_engine()
+    pool = load_pool(engine)
+    changes = load_feed().poll()
+    if changes:
+        try:
+            pool.apply(changes, skip_invalid=True) # Only the affected queued puzzles are dropped; invalid ops are logged and skipped
+        except Exception as e: # Never break this user's round because of a dictionary update
+            print(f'Cambios del diccionario no aplicados: {e!r}', file=sys.stderr)
 
 ### Game
 if 'score' not in st.session_state:
@@ -90,9 +79,7 @@ difficulty_desc = {'easy': f"{difficulty_names['easy']} (rondas de {difficulty_m
                     'hard': f"{difficulty_names['hard']} (rondas de {difficulty_max_score['hard']} puntos)", 
                     'extreme': f"{difficulty_names['extreme']} (rondas de {difficulty_max_score['extreme']} puntos)",
                     'impossible': f"{difficulty_names['impossible']} (rondas de {difficulty_max_score['impossible']} puntos)"}
-target_commonness = {'easy': 4, 'normal': 3, 'hard': 2, 'extreme': 2, 'impossible': 1}
-acep_limit = {'easy': 1, 'normal': 1, 'hard': 3, 'extreme': 5, 'impossible': None} # Límite de acepciones de la palabra objetivo (cuantas menos acepciones tenga menos variables sus usos)
-hint_types = {'easy': [4, 4, 3, 4], 'normal': [4, 4, 3, 4], 'hard': [4, 3, 2, 3], 'extreme': [2, 2, 1, 0, 3], 'impossible': [2, 1, 1, 0, 3]}
+hint_types = utils.HINT_TYPES
 if not st.session_state.difficulty:
     difficulty = st.selectbox("Selecciona la dificultad:", list(difficulty_desc.keys()), index=None, format_func=lambda x: difficulty_desc[x], on_change=update_show_word) # On change generates a new word
     if difficulty: # When chosen, set as difficulty for the rest of the game
@@ -109,22 +96,16 @@ if 'show_word' not in st.session_state and not st.session_state.game_ended:
     st.session_state.hint2_checked = False
     st.session_state.hint3_checked = False
     st.session_state.temp_score = difficulty_max_score[difficulty]
-    with st.spinner("Buscando palabra objetivo..."):
-        show_solutions = False
-        common_word = ''
-        while not show_solutions: # Mientras no haya soluciones para las pistas requeridas sigue buscando
-            common_word = utils.get_random_word(my_df, commonness=target_commonness[difficulty], appear_lim=len(hint_types[difficulty]))
-            solutions = utils.words_with_word(my_drae, common_word) # Busco dentro de `my_drae` que es el diccionario restringido
-            solutions = utils.limit_defs(solutions, limit_acep=acep_limit[difficulty]) # Limita el número de acepciones que la palabra objetivo tiene (cuantas menos acepciones menos lioso)
-            solutions = utils.add_commonness(solutions, df) # Para añadir las rarezas uso `df` original, que incluye todas las palabras
-            show_solutions = utils.pick_solutions(solutions, common_word, hints=hint_types[difficulty], avoid_common=True) # Comprueba que se puedan dar todas las pistas previstas y las recoge
-    show_word = df[df['word'] == common_word]['simple_word'].iloc[0]
+    with st.spinner("Buscando palabra objetivo..."), telemetry.track('round', difficulty=difficulty, round=st.session_state.round + 1): # Word and timings go to the telemetry log (if enabled)
+        puzzle = pool.get(difficulty) # Ready puzzle from the queue (generated on the spot if the queue is empty)
+    show_word = puzzle['show_word']
+    show_solutions = puzzle['solutions']
     st.session_state.show_word = show_word
     st.session_state.show_solutions = show_solutions
+    st.session_state.show_defs = puzzle['masked_defs']
     st.session_state.round_finished = False # Initialize round_finished
     st.session_state.round += 1
     st.session_state.conceded = False
-    print(show_word)
     shuffled_letters = [l.upper() for l in show_word[1:-1]]
     random.shuffle(shuffled_letters)
     st.session_state.shuffled_letters = ' '.join([show_word[0].upper()] + shuffled_letters + [show_word[-1].upper()])
@@ -134,7 +115,7 @@ st.markdown("#### Primera pista")
 st.markdown(f"- Primera letra: **{st.session_state.show_word[0].upper()}**{' _'*(len(st.session_state.show_word) - 1)}")
 st.markdown('La palabra aparece en la definición de:\n')
 for i, (hint_word, hint_def, diff) in enumerate(st.session_state.show_solutions[:len(hint_types[difficulty]) - 1]):
-    hint_def = utils.modify_def(st.session_state.show_word, hint_def)
+    hint_def = st.session_state.show_defs[i] # Already masked with `utils.modify_def`
     with st.expander(f"**{hint_word}**"):
         st.write(f"{hint_def}")
 placeholder = st.session_state.show_word[0].upper() + ' _'*(len(st.session_state.show_word) - 1) # First letter and length
@@ -149,7 +130,7 @@ if st.checkbox(f"Mostrar segunda pista (_resta **{losing_points}** puntos_)", va
     st.markdown(f"- Última letra: {placeholder[:-1]}**{st.session_state.show_word[-1].upper()}**")
     st.markdown('También aparece en la definición de:\n')
     hint_word, hint_def, diff = st.session_state.show_solutions[len(hint_types[difficulty]) - 1]
-    hint_def = utils.modify_def(st.session_state.show_word, hint_def)
+    hint_def = st.session_state.show_defs[len(hint_types[difficulty]) - 1] # Already masked with `utils.modify_def`
     with st.expander(f"**{hint_word}**"):
         st.write(f"{hint_def}")
     placeholder = placeholder[:-1] + st.session_state.show_word[-1].upper() # Last letter
@@ -0,0 +1,53 @@
+import math, os, random
+import pandas as pd
+import pytest
+import src.utils as utils
+from src.synthetic import scale_dict
+
+CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'diccionario_df.csv')
+
+@pytest.fixture(scope='module')
+def dictionary():
+    drae, df = scale_dict(pd.read_csv(CSV), scale=0.1, seed=3)
+    drae['zzzmixta'] = {'id': 'ZZZ0000', 'defs': ['1. m. Cosa.', '2. adj. Que es cosa.', '3. f. Otra.', '4. m. Y otra.', '5. loc. adv. Así.'],
+                        'abrev': [['m.'], ['adj.'], ['f.'], ['m.'], ['loc.', 'adv.']], 'rel_ids': [[]] * 5} # Tipos repetidos y sin tipo
+    drae['zzzsintipo'] = {'id': 'ZZZ0001', 'defs': ['1. loc. Nada.'], 'abrev': [['loc.']], 'rel_ids': [[]]}
+    return drae, df
+
+def row_get_kinds(drae, word):
+    """`get_kinds` original: tabla de abreviaturas y `split` en cada acepción."""
+    kinds = {}
+    for kind in utils.ABREV:
+        for abr in utils.ABREV[kind]:
+            kinds[abr] = kind
+    res = []
+    for d in drae[word]['defs']:
+        start = d.split('. ')[1] + '.'
+        if start in kinds and kinds[start] not in res:
+            res.append(kinds[start])
+    return res
+
+def test_batch_kinds_matches_get_kinds(dictionary):
+    drae, _ = dictionary
+    kinds = utils.batch_kinds(drae)
+    assert list(kinds) == list(drae)
+    assert kinds == {word: row_get_kinds(drae, word) for word in drae}
+    assert kinds['zzzmixta'] == ['sust', 'adj'] and kinds['zzzsintipo'] == []
+    assert all(utils.get_kinds(drae, word) == kinds[word] for word in list(drae)[::50])
+
+def test_batch_kinds_of_some_words(dictionary):
+    drae, _ = dictionary
+    words = list(drae)[::7][::-1]
+    assert utils.batch_kinds(drae, words) == {word: row_get_kinds(drae, word) for word in words}
+
+def test_batch_commonness_matches_set_commonness(dictionary):
+    _, df = dictionary
+    rng = random.Random(0)
+    edges = [math.nan, 0, 29.9, 30, 49.9, 50, 79.9, 80, 94.9, 95, 100] # Los umbrales de `set_commonness` y valores vacíos
+    df = df.assign(**{c: [rng.choice(edges) if rng.random() < 0.5 else rng.uniform(0, 100) for _ in range(len(df))] for c in ('def_perc', 'crea_perc', 'ngram_perc')},
+                   def_freq=[rng.choice([0, 4, 5, 6, rng.randrange(50)]) for _ in range(len(df))])
+    df.index = df.index[::-1] # Se conserva el índice
+    expected = df.apply(utils.set_commonness, axis=1)
+    res = utils.batch_commonness(df)
+    assert res.index.equals(df.index)
+    assert res.tolist() == expected.tolist()
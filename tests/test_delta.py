@@ -0,0 +1,52 @@
+import copy, os
+import pandas as pd
+import pytest
+import src.utils as utils
+from src.engine import DictEngine
+from src.synthetic import scale_dict
+
+CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'diccionario_df.csv')
+
+@pytest.fixture(scope='module')
+def dictionary():
+    drae, df = scale_dict(pd.read_csv(CSV), scale=0.2, seed=0)
+    return drae, df, DictEngine.build(drae, df)
+
+def assert_same_engine(a, b):
+    assert set(a.drae) == set(b.drae)
+    assert all(dict(a.drae[word]) == dict(b.drae[word]) for word in b.drae)
+    assert list(a.df['word']) == list(b.df['word'])
+    assert {d: list(t) for d, t in a.target_tables.items()} == {d: list(t) for d, t in b.target_tables.items()}
+
+def test_remove_last_acepcion_matches_rebuild(dictionary):
+    drae, df, engine = dictionary
+    word = next(word for table in engine.target_tables.values() for word in table) # Una palabra objetivo: también cambia `df`
+    ops = [{'op': 'remove_acep', 'word': word, 'def': definition} for definition in engine.drae[word]['defs']]
+    patched, changed = engine.apply(ops)
+    raw = copy.deepcopy(drae)
+    for op in ops:
+        entry = raw[word]
+        i = entry['defs'].index(op['def'])
+        for key in ('defs', 'abrev', 'rel_ids'):
+            del entry[key][i]
+    rebuilt = DictEngine.build(raw, df)
+    assert word in changed and word not in patched.drae and word not in patched.df['word']
+    assert_same_engine(patched, rebuilt)
+
+def test_add_word_without_acepciones_matches_rebuild(dictionary):
+    drae, df, engine = dictionary
+    patched, _ = engine.apply([{'op': 'add_word', 'word': 'zzzvacía', 'id': 'ZZZ0', 'defs': [], 'abrev': [], 'rel_ids': []}])
+    rebuilt = DictEngine.build(dict(drae, zzzvacía={'id': 'ZZZ0', 'defs': [], 'abrev': [], 'rel_ids': []}), df)
+    assert 'zzzvacía' not in patched.drae
+    assert_same_engine(patched, rebuilt)
+
+def test_feed_skips_malformed_lines(tmp_path):
+    from src.delta import DeltaFeed
+    file = tmp_path / 'cambios.jsonl'
+    file.write_text('{"op": "remove_word", "word": "a"}\n{mal\n{"op": "remove_word", "word": "b"}\n{"op": "remo', encoding='utf-8')
+    feed = DeltaFeed(str(file))
+    assert [op['word'] for op in feed.poll()] == ['a', 'b']
+    with open(file, 'a', encoding='utf-8') as fp:
+        fp.write('ve_word", "word": "c"}\n')
+    assert [op['word'] for op in feed.poll()] == ['c']
+    assert feed.poll() == []
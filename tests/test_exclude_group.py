@@ -0,0 +1,76 @@
+import copy, os
+import pandas as pd
+import pytest
+import src.utils as utils
+from src.compact import compact_dict
+from src.synthetic import scale_dict
+
+CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'diccionario_df.csv')
+
+GROUPS = {'reg': list(utils.ABR_REG), 'desus': list(utils.ABR_DESUS), 'tema+desus': list(utils.ABR_TEMA) + list(utils.ABR_DESUS), 'empty': [], 'blank': ['']} # `'' in definition` quita todas
+
+@pytest.fixture(scope='module')
+def drae():
+    drae, _ = scale_dict(pd.read_csv(CSV), scale=0.1, seed=2)
+    drae['zzzvacía'] = {'id': 'ZZZ0000', 'defs': [], 'abrev': [], 'rel_ids': []} # Sin acepciones desde el principio
+    drae['zzzregional'] = {'id': 'ZZZ0001', 'defs': ['1. m. And. Cosa.', '2. f. Arg. Otra cosa.'], 'abrev': [['m.', 'And.'], ['f.', 'Arg.']], 'rel_ids': [[], []]} # Las pierde todas
+    return drae
+
+def loop_exclude_group(drae, group):
+    """`exclude_group` original: un término detrás de otro para cada acepción (modifica `drae`)."""
+    words_to_remove = []
+    for word in drae:
+        i = 0
+        j = 0
+        total_len = len(drae[word]['defs'])
+        while j < total_len:
+            definition = drae[word]['defs'][i]
+            deleted = False
+            for term in group:
+                if term in definition:
+                    del drae[word]['defs'][i]
+                    del drae[word]['abrev'][i]
+                    del drae[word]['rel_ids'][i]
+                    deleted = True
+                    break
+            if not deleted:
+                i += 1
+            j += 1
+        if len(drae[word]['defs']) == 0:
+            words_to_remove.append(word)
+    for word in words_to_remove:
+        del drae[word]
+    return drae
+
+def as_plain(drae):
+    return {word: (drae[word]['id'], list(drae[word]['defs']), [list(a) for a in drae[word]['abrev']], [list(r) for r in drae[word]['rel_ids']]) for word in drae}
+
+@pytest.mark.parametrize('name', GROUPS)
+def test_in_place_matches_loop(drae, name):
+    expected = loop_exclude_group(copy.deepcopy(drae), GROUPS[name])
+    patched = copy.deepcopy(drae)
+    res = utils.exclude_group(patched, GROUPS[name])
+    assert res is patched
+    assert as_plain(res) == as_plain(expected)
+    assert list(res) == list(expected)
+    assert 'zzzvacía' not in res
+
+@pytest.mark.parametrize('name', GROUPS)
+def test_rebuild_matches_loop_and_keeps_input(drae, name):
+    expected = loop_exclude_group(copy.deepcopy(drae), GROUPS[name])
+    before = as_plain(drae)
+    res = utils.exclude_group(drae, GROUPS[name], rebuild=True)
+    assert as_plain(res) == as_plain(expected)
+    assert list(res) == list(expected)
+    assert as_plain(drae) == before
+
+@pytest.mark.parametrize('name', GROUPS)
+def test_compact_matches_loop(drae, name):
+    expected = loop_exclude_group(copy.deepcopy(drae), GROUPS[name])
+    res = utils.exclude_group(compact_dict(drae), GROUPS[name])
+    assert as_plain(res) == as_plain(expected)
+    assert list(res) == list(expected)
+
+def test_small_batches_match_loop(drae):
+    expected = loop_exclude_group(copy.deepcopy(drae), GROUPS['reg'])
+    assert as_plain(utils.exclude_group(drae, GROUPS['reg'], rebuild=True, batch_size=7)) == as_plain(expected)
@@ -0,0 +1,46 @@
+import itertools, math, os, random
+import pandas as pd
+import pytest
+import src.utils as utils
+from src.engine import DictEngine
+from src.synthetic import scale_dict
+
+CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'diccionario_df.csv')
+
+@pytest.fixture(scope='module')
+def engine():
+    drae, df = scale_dict(pd.read_csv(CSV), scale=0.2, seed=0)
+    return DictEngine.build(drae, df)
+
+def make_buckets(sizes):
+    return {h: tuple((f'w{h}-{i}', f'def {i}', h) for i in range(n)) for h, n in sizes.items()}
+
+def changed_hints(a, b):
+    return len(set(a) - set(b))
+
+def test_iter_hint_sets_yields_every_set_once():
+    buckets, hints = make_buckets({1: 6, 2: 4, 3: 2}), [1, 2, 1, 3, 2, 1]
+    sets = list(utils.iter_hint_sets(buckets, hints, rng=random.Random(0)))
+    assert len(sets) == math.comb(6, 3) * math.comb(4, 2) * math.comb(2, 1)
+    assert len({frozenset(sols) for sols in sets}) == len(sets)
+    assert all([h for _, _, h in sols] == hints for sols in sets)
+
+def test_consecutive_hint_sets_change_every_rarity():
+    buckets, hints = make_buckets({1: 30, 2: 20}), [1, 1, 2, 1]
+    sets = list(itertools.islice(utils.iter_hint_sets(buckets, hints, rng=random.Random(0)), 50))
+    for a, b in zip(sets, sets[1:]):
+        for h in (1, 2):
+            assert {s for s in a if s[-1] == h} != {s for s in b if s[-1] == h}
+
+def test_consecutive_rerolls_differ_in_more_than_one_hint(engine):
+    rng = random.Random(0)
+    hints = utils.HINT_TYPES['easy']
+    while True: # Un puzle con más de una combinación posible en cada rareza (si no, esa rareza no puede cambiar)
+        puzzle = engine.new_puzzle('easy', rng=rng)
+        buckets = engine.hint_buckets(puzzle['word'], 'easy')
+        if all(math.comb(len(buckets[h]), hints.count(h)) > 1 for h in set(hints)):
+            break
+    rerolls = list(itertools.islice(engine.rerolls(puzzle, rng=rng), 10))
+    assert len(rerolls) == 10
+    for a, b in zip(rerolls, rerolls[1:]):
+        assert changed_hints(a['solutions'], b['solutions']) > 1
@@ -0,0 +1,50 @@
+import os
+import pandas as pd
+import pytest
+import src.utils as utils
+from src.compact import compact_dict
+from src.engine import DictEngine
+from src.synthetic import scale_dict
+
+CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'diccionario_df.csv')
+
+@pytest.fixture(scope='module')
+def dictionary():
+    drae, df = scale_dict(pd.read_csv(CSV), scale=0.1, seed=1)
+    return drae, df
+
+def scan_words_with_word(drae, target_word):
+    """`words_with_word` original: recorre todas las acepciones buscando el `id` en el texto de sus `rel_ids`."""
+    target_id = drae[target_word]['id']
+    res = []
+    for word in drae:
+        for i in range(len(drae[word]['defs'])):
+            if target_id in '|'.join(drae[word]['rel_ids'][i]):
+                res.append((word, drae[word]['defs'][i]))
+                break
+    return res
+
+def sample_words(drae, n=200):
+    words = list(drae)
+    return words[::max(1, len(words) // n)]
+
+def test_id_index_matches_scan(dictionary):
+    drae, _ = dictionary
+    assert {len(entry['id']) for entry in drae.values()} == {7} # Mismo largo: buscar en el texto equivale a buscar el `id` exacto
+    index = utils.build_id_index(drae)
+    for word in sample_words(drae):
+        assert utils.words_with_word(drae, word, index=index) == scan_words_with_word(drae, word)
+
+def test_words_with_word_without_index_matches_scan(dictionary):
+    drae, _ = dictionary
+    for word in sample_words(drae, 20):
+        assert utils.words_with_word(drae, word) == scan_words_with_word(drae, word)
+
+def test_engine_and_compact_match_scan(dictionary):
+    drae, df = dictionary
+    engine = DictEngine.build(drae, df)
+    compact = compact_dict(engine.drae)
+    for word in sample_words(engine.drae):
+        expected = scan_words_with_word(engine.drae, word)
+        assert utils.words_with_word(engine, word) == expected
+        assert utils.words_with_word(compact, word) == expected
@@ -0,0 +1,47 @@
+import os, random
+import pandas as pd
+import pytest
+import src.utils as utils
+from src.synthetic import scale_dict
+
+CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'diccionario_df.csv')
+
+@pytest.fixture(scope='module')
+def pairs():
+    drae, df = scale_dict(pd.read_csv(CSV), scale=0.1, seed=4)
+    rng = random.Random(0)
+    simple = df['simple_word'].tolist()
+    defs = [d for entry in drae.values() for d in entry['defs']]
+    res = [(rng.choice(simple), rng.choice(defs)) for _ in range(2000)]
+    for word in rng.sample(simple, 200): # La palabra (o su comienzo, con tildes o mayúsculas) aparece en la definición
+        shown = rng.choice([word, word.upper(), word.capitalize(), word[:5] + 'ción', word.replace('a', 'á')])
+        res.append((word, f'1. m. Algo, {shown}: de {shown}. Y {shown},otra.'))
+    res += [('ab', '1. m. Ab, abc. ab'), ('á', '1. f. a á. A'), ('camión', '1. m. CAMION camionero, cámara.'), ('sol', '')]
+    return res
+
+def loop_modify_def(target_word, definition, l=5):
+    """`modify_def` original: normaliza la palabra objetivo y cada palabra de la definición en cada comparación."""
+    modified_def = ''
+    l = min(l, len(target_word) - 1)
+    words_in_def = definition.replace(',', ' ,').replace('.', ' .').replace(':', ' :').split(' ')
+    for w in words_in_def:
+        simplified_w = w.lower().replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
+        if simplified_w[:l] == target_word.lower().replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')[:l]:
+            modified_def += '■' + ' '
+        else:
+            modified_def += w + ' '
+    return modified_def.replace(' ,', ',').replace(' .', '.').replace(' :', ':')
+
+@pytest.mark.parametrize('l', [5, 3, 1])
+def test_modify_def_matches_loop(pairs, l):
+    utils.modify_def.cache_clear()
+    for word, definition in pairs:
+        assert utils.modify_def(word, definition, l) == loop_modify_def(word, definition, l)
+
+def test_cached_result_is_the_same(pairs):
+    utils.modify_def.cache_clear()
+    first = [utils.modify_def(word, definition) for word, definition in pairs]
+    hits = utils.modify_def.cache_info().hits
+    assert [utils.modify_def(word, definition) for word, definition in pairs] == first
+    assert utils.modify_def.cache_info().hits - hits == len(pairs) # Todas salen de la caché (cabe entera)
+    assert first == [loop_modify_def(word, definition) for word, definition in pairs]
@@ -0,0 +1,37 @@
+import os
+import pandas as pd
+import pytest
+import src.utils as utils
+from src.engine import DictEngine
+from src.synthetic import scale_dict
+
+CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'diccionario_df.csv')
+
+@pytest.fixture(scope='module')
+def dictionary():
+    return scale_dict(pd.read_csv(CSV), scale=0.05, seed=5)
+
+def write_sources(directory, drae, df):
+    os.makedirs(directory, exist_ok=True)
+    json_file, csv_file = os.path.join(directory, 'dic.json'), os.path.join(directory, 'dic_df.csv')
+    utils.save_dict(drae, json_file)
+    df.to_csv(csv_file, index=False)
+    return {'json_file': json_file, 'csv_file': csv_file, 'compact_file': None}
+
+def snapshots(directory):
+    return sorted(f for f in os.listdir(directory) if f.endswith('.bin'))
+
+def test_snapshot_keeps_other_sources_and_filters(dictionary, tmp_path):
+    drae, df = dictionary
+    cache = str(tmp_path / 'cache')
+    a, b = write_sources(tmp_path / 'a', drae, df), write_sources(tmp_path / 'b', drae, df)
+    DictEngine.load(**a, snapshot_dir=cache)
+    DictEngine.load(**b, snapshot_dir=cache)
+    DictEngine.load(**a, kind='adj', snapshot_dir=cache)
+    first = snapshots(cache)
+    assert len(first) == 3 # Otros archivos y otro tipo: no se borran entre sí
+    write_sources(tmp_path / 'a', drae, df.iloc[:-1]) # Cambia el contenido de `a`
+    engine = DictEngine.load(**a, snapshot_dir=cache)
+    second = snapshots(cache)
+    assert len(second) == 3 and len(set(first) & set(second)) == 2 # Sólo se ha sustituido la de `a` (sust)
+    assert list(DictEngine.load(**a, snapshot_dir=cache).df['word']) == list(engine.df['word'])